@@ -19,24 +19,32 @@
 
 # Modified by: Nicole Ibrahim 
 
-import fnmatch
-import csv
 import sys
 import os
 import argparse
+import functools
+import collections
+import multiprocessing
+import cProfile
+import time
+import signal
+import re
+import logging
 from time import gmtime, strftime
-import datetime
 import io
-from ds_store_parser import ds_store_handler
-from ds_store_parser.ds_store.store import codes as type_codes
+from ds_store_parser import discovery
+from ds_store_parser import archive
+from ds_store_parser.manifest import Manifest
+from ds_store_parser.dedup import Deduplicator
+from ds_store_parser import sinks
+from ds_store_parser import api
+from ds_store_parser.context import ParseContext
+from ds_store_parser.records import RecordHandler, RowCollector
+from ds_store_parser.stats import Stats
+from ds_store_parser.ds_store.store import EntryFilter
 
 __VERSION__ = "0.2.1"
 
-folder_access_report = None
-other_info_report = None
-all_records_ds_store_report = None
-records_parsed = 0
-
 def get_arguments():
     """Get needed options for the cli parser interface"""
     usage = f"DSStoreParser CLI tool. v{__VERSION__}"
@@ -54,7 +62,8 @@ def get_arguments():
         action="store",
         type=str,
         required=True,
-        help='The source path to search recursively for .DS_Store files to parse. '
+        help='The source path to search recursively for .DS_Store files to parse. A tar '
+             '(optionally compressed) or zip archive is read in place, without extracting it.'
     )
     
     argument_parser.add_argument(
@@ -66,35 +75,262 @@ def get_arguments():
         required=True,
         help='The destination folder for generated reports.'
     )
+
+    argument_parser.add_argument(
+        '-f',
+        '--format',
+        dest='format',
+        action="store",
+        choices=['tsv', 'sqlite', 'jsonl'],
+        default='tsv',
+        help='Report format: three TSV reports, one SQLite database, or JSON Lines '
+             'with typed values. SQLite and JSON Lines carry the folder access/miscellaneous '
+             'classification as a column. (default: tsv)'
+    )
+
+    argument_parser.add_argument(
+        '-z',
+        '--gzip',
+        dest='gzip',
+        action="store_true",
+        help='Gzip compress the JSON Lines report.'
+    )
+
+    argument_parser.add_argument(
+        '-w',
+        '--workers',
+        dest='workers',
+        action="store",
+        type=int,
+        default=1,
+        help='Number of worker processes used to parse .DS_Store files. (default: 1)'
+    )
+
+    argument_parser.add_argument(
+        '--ordered',
+        dest='ordered',
+        action="store_true",
+        help='With --workers, write records in discovery order so reports match a serial run.'
+    )
+
+    argument_parser.add_argument(
+        '-x',
+        '--exclude',
+        dest='exclude',
+        action="append",
+        default=[],
+        metavar='GLOB',
+        help='Skip files and directories whose name or path matches GLOB. May be repeated.'
+    )
+
+    argument_parser.add_argument(
+        '--max-depth',
+        dest='max_depth',
+        action="store",
+        type=int,
+        default=None,
+        help='Do not descend more than this many directories below the source.'
+    )
+
+    argument_parser.add_argument(
+        '--one-file-system',
+        dest='one_file_system',
+        action="store_true",
+        help='Do not cross into directories on other file systems.'
+    )
+
+    argument_parser.add_argument(
+        '--skip-known-dirs',
+        dest='skip_known_dirs',
+        action="store_true",
+        help='Skip large directories that never hold Finder data (.git, node_modules, ...).'
+    )
+
+    argument_parser.add_argument(
+        '--tree-order',
+        dest='tree_order',
+        action="store_true",
+        help='Stream records of each store in B-tree order as they are read instead of sorting them.'
+    )
+
+    argument_parser.add_argument(
+        '--include-codes',
+        dest='include_codes',
+        action="store",
+        type=comma_list,
+        default=None,
+        metavar='CODES',
+        help='Comma separated record codes to report, e.g. vSrn,fwi0,ptbL. Other records are skipped unread.'
+    )
+
+    argument_parser.add_argument(
+        '--exclude-codes',
+        dest='exclude_codes',
+        action="store",
+        type=comma_list,
+        default=None,
+        metavar='CODES',
+        help='Comma separated record codes to skip unread.'
+    )
+
+    argument_parser.add_argument(
+        '--filename-regex',
+        dest='filename_regex',
+        action="store",
+        type=regex_arg,
+        default=None,
+        metavar='REGEX',
+        help='Only report records whose filename matches REGEX.'
+    )
+
+    argument_parser.add_argument(
+        '--check-exists',
+        dest='check_exists',
+        action="store_true",
+        help='Add a file_exists column: whether the file each record names still exists next '
+             'to the .DS_Store, with its stat details.'
+    )
+
+    argument_parser.add_argument(
+        '--plist-keys',
+        dest='plist_keys',
+        action="store",
+        type=comma_list,
+        metavar='KEYS',
+        help='Comma separated top-level keys to keep from plist records (bwsp, lsvp, icvp, '
+             'glvp, ...). By default whole plists are reported.'
+    )
+
+    argument_parser.add_argument(
+        '--carve-slack',
+        dest='carve_slack',
+        action="store_true",
+        help='Also recover records from unused space: the tail of every B-tree node and '
+             'the gaps between blocks. Recovered records are tagged "unallocated".'
+    )
+
+    argument_parser.add_argument(
+        '--free-blocks',
+        dest='free_blocks',
+        action="store_true",
+        help='Also recover records from freed B-tree nodes on the allocator free lists. '
+             'Recovered records are tagged with the free list and offset they came from.'
+    )
+
+    argument_parser.add_argument(
+        '--stats',
+        dest='stats',
+        action="store",
+        nargs='?',
+        type=int,
+        const=10,
+        default=None,
+        metavar='TOP',
+        help='Print time per phase, a per-file latency histogram, the TOP slowest stores '
+             '(default: 10) and records/sec at the end of the scan.'
+    )
+
+    argument_parser.add_argument(
+        '--profile',
+        dest='profile',
+        action="store",
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='Run the scan under cProfile and save the statistics to FILE. '
+             'With --workers only the report writing process is profiled.'
+    )
+
+    argument_parser.add_argument(
+        '-m',
+        '--manifest',
+        dest='manifest',
+        action="store",
+        type=str,
+        default=None,
+        help='SQLite manifest of parsed stores. Files unchanged since the last scan '
+             '(same inode, size and mtime) are reported from it without being parsed again.'
+    )
+
+    argument_parser.add_argument(
+        '--dedup',
+        dest='dedup',
+        action="store_true",
+        help='Hash each .DS_Store and parse byte-identical copies only once.'
+    )
+
+    argument_parser.add_argument(
+        '--watch',
+        dest='watch',
+        action="store",
+        nargs='?',
+        type=float,
+        const=10.0,
+        default=None,
+        metavar='SECONDS',
+        help='After the scan, keep polling the source every SECONDS (default: 10) and parse '
+             '.DS_Store files that are new or whose size or modification time changed, '
+             'appending their records to the reports. Stop with Ctrl+C.'
+    )
     
     return argument_parser
     
 def main():
-    global folder_access_report, other_info_report, all_records_ds_store_report, records_parsed
-
     arguments = get_arguments()
     options = arguments.parse_args()
+    configure_logging()
+
+    profiler = None
+    if options.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    stats = Stats(options.stats) if options.stats is not None else None
+    context = ParseContext()
 
-    s_name = '*.ds_store*'
-    
     opts_source = options.source
     opts_out = options.outdir
-    opts_check = False
+    opts_check = options.check_exists
+    opts_sort = not options.tree_order
+    opts_filter = None
+    if options.include_codes or options.exclude_codes or options.filename_regex or options.plist_keys:
+        opts_filter = EntryFilter(
+            include_codes=options.include_codes,
+            exclude_codes=options.exclude_codes,
+            filename_regex=options.filename_regex,
+            plist_keys=options.plist_keys
+        )
     timestr = strftime("%Y%m%d-%H%M%S")
+    sink = None
     
     try:
-        folder_access_report = open(
-            os.path.join(opts_out, f'DS_Store-Folder_Access_Report-{timestr}.tsv'),
-            'w', newline='', encoding='utf-8'
-        )
-        other_info_report = open(
-            os.path.join(opts_out, f'DS_Store-Miscellaneous_Info_Report-{timestr}.tsv'),
-            'w', newline='', encoding='utf-8'
-        )
-        all_records_ds_store_report = open(
-            os.path.join(opts_out, f'DS_Store-All_Parsed_Report-{timestr}.tsv'),
-            'w', newline='', encoding='utf-8'
-        )
+        if options.format == 'sqlite':
+            sink = functools.partial(
+                sinks.SqliteSink, os.path.join(opts_out, f'DS_Store-Report-{timestr}.sqlite')
+            )
+        elif options.format == 'jsonl':
+            extension = 'jsonl.gz' if options.gzip else 'jsonl'
+            sink = functools.partial(
+                sinks.JsonlSink, os.path.join(opts_out, f'DS_Store-Report-{timestr}.{extension}'),
+                compress=options.gzip
+            )
+        else:
+            folder_access_report = open(
+                os.path.join(opts_out, f'DS_Store-Folder_Access_Report-{timestr}.tsv'),
+                'w', newline='', encoding='utf-8'
+            )
+            other_info_report = open(
+                os.path.join(opts_out, f'DS_Store-Miscellaneous_Info_Report-{timestr}.tsv'),
+                'w', newline='', encoding='utf-8'
+            )
+            all_records_ds_store_report = open(
+                os.path.join(opts_out, f'DS_Store-All_Parsed_Report-{timestr}.tsv'),
+                'w', newline='', encoding='utf-8'
+            )
+            sink = functools.partial(
+                sinks.TsvSink, all_records=all_records_ds_store_report,
+                folder_access=folder_access_report, other_info=other_info_report
+            )
     except Exception as exp:
         print(f'Unable to proceed. Error creating reports. Exception: {exp}')
         sys.exit(0)
@@ -103,52 +339,379 @@ def main():
     if opts_source.endswith('"'):
         opts_source = opts_source[:-1]
     
-    record_handler = RecordHandler(opts_check)
-
-    for root, _, filenames in os.walk(opts_source):
-        for filename in filenames:
-            if fnmatch.fnmatch(filename.lower(), s_name):
-                ds_file = os.path.join(root, filename)
-                try:
-                    with open(ds_file, "rb") as file_io:
-                        try: 
-                            stat_dict = record_handler.get_stats(os.lstat(ds_file))
-                        except Exception as e:
-                            print(f"Error stat_dict {ds_file}: {e}")
-                        try:
-                            parse(ds_file, file_io, stat_dict, record_handler, opts_source, opts_check)
-                        except Exception as e:
-                            print(f"Error parse {ds_file}: {e}")
-                except Exception as e:
-                    print(f"Error opening {ds_file}: {e}")
-
-    print(f'Records Parsed: {records_parsed}')
-    print(f'Reports are located in {options.outdir}')
+    try:
+        record_handler = RecordHandler(opts_check, sink_factory=sink, stats=stats, context=context)
+    except Exception as exp:
+        print(f'Unable to proceed. Error creating reports. Exception: {exp}')
+        sys.exit(0)
 
-def parse(ds_file, file_io, stat_dict, record_handler, source, opts_check):
-    """Parses .DS_Store files and writes records"""
-    
-    ds_handler = None
-    record = {'code': '', 'value': '', 'type': '', 'filename': ''}
+    skip_dirs = discovery.KNOWN_SKIP_DIRS if options.skip_known_dirs else ()
+    watcher = None
+    if archive.is_archive(opts_source):
+        if options.watch is not None:
+            print('Unable to proceed. --watch needs a directory source, not an archive.')
+            sys.exit(0)
+        # Members are parsed straight from the archive stream
+        ds_stores = archive.find_ds_stores(
+            opts_source,
+            excludes=options.exclude,
+            max_depth=options.max_depth,
+            skip_dirs=skip_dirs
+        )
+    elif options.watch is not None:
+        try:
+            watcher = discovery.Watcher(
+                opts_source,
+                excludes=options.exclude,
+                max_depth=options.max_depth,
+                one_file_system=options.one_file_system,
+                skip_dirs=skip_dirs
+            )
+        except OSError as exp:
+            print(f'Unable to proceed. Error watching source. Exception: {exp}')
+            sys.exit(0)
+        # The first poll is a full scan
+        ds_stores = watcher.poll()
+    else:
+        ds_stores = discovery.find_ds_stores(
+            opts_source,
+            excludes=options.exclude,
+            max_depth=options.max_depth,
+            one_file_system=options.one_file_system,
+            skip_dirs=skip_dirs
+        )
+
+    manifest = None
+    if options.manifest:
+        try:
+            manifest = Manifest(
+                options.manifest, record_handler.fields,
+                settings={
+                    'filter': opts_filter.describe() if opts_filter else None,
+                    'carve_slack': options.carve_slack,
+                    'free_blocks': options.free_blocks
+                }
+            )
+        except Exception as exp:
+            print(f'Unable to proceed. Error opening manifest. Exception: {exp}')
+            sys.exit(0)
+
+    worker_options = dict(
+        source=opts_source, opts_check=opts_check, opts_sort=opts_sort, opts_filter=opts_filter,
+        opts_carve=options.carve_slack, opts_free=options.free_blocks
+    )
+    outcomes = collections.Counter()
+
+    # Parses a store straight into the reports
+    parse_file = functools.partial(
+        process_file, record_handler=record_handler, source=opts_source, opts_check=opts_check,
+        opts_sort=opts_sort, opts_filter=opts_filter, opts_carve=options.carve_slack,
+        opts_free=options.free_blocks
+    )
+    # One for the whole scan, however many workers parse
+    dedup = Deduplicator(opts_source, opts_check, options.manifest) if options.dedup else None
+
+    worker = None
+    worker_state = None
+    pool = None
+    if options.workers > 1:
+        initargs = (opts_check, options.manifest, stats is not None)
+        pool = multiprocessing.Pool(options.workers, initializer=init_worker, initargs=initargs)
+        worker = functools.partial(pool_worker, **worker_options)
+    elif manifest or dedup:
+        worker_state = WorkerState(opts_check, options.manifest, stats)
+        worker = functools.partial(parse_worker, state=worker_state, **worker_options)
 
     try:
-        if stat_dict['src_size'] != 0:
-            ds_handler = ds_store_handler.DsStoreHandler(file_io, ds_file)
-    except Exception as exp:
-        err_msg = f'ERROR: {exp} for file {ds_file}'
-        print(err_msg)
+        outcomes = scan_stores(
+            ds_stores, record_handler, opts_source, worker, pool, options.ordered, manifest, parse_file, dedup
+        )
 
-    if ds_handler:
-        print(f"DS_Store Found: {ds_file}")
+        if watcher:
+            print(f'Watching {opts_source} every {options.watch:g} s. Press Ctrl+C to stop.')
+            try:
+                while True:
+                    time.sleep(options.watch)
+                    changed = list(stats.timed(watcher.poll(), "discovery") if stats else watcher.poll())
+                    if not changed:
+                        continue
+
+                    before = context.records
+                    outcomes += scan_stores(
+                        changed, record_handler, opts_source, worker, pool, options.ordered, manifest, parse_file,
+                        dedup
+                    )
+                    record_handler.flush()
+                    print(f'{strftime("%Y-%m-%d %H:%M:%S")} Changed Stores: {len(changed)}, '
+                          f'Records Parsed: {context.records - before}')
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if pool:
+            pool.terminate()
+        if worker_state:
+            worker_state.close()
+
+    if manifest:
+        manifest.close()
+        print(f'Stores Reused From Manifest: {outcomes["manifest"]}')
+
+    if dedup:
+        hashed = outcomes["unique"] + outcomes["duplicate"]
+        hit_rate = 100 * outcomes["duplicate"] / hashed if hashed else 0
+        print(f'Stores Hashed: {hashed}, Unique: {outcomes["unique"]}, '
+              f'Duplicates: {outcomes["duplicate"]} ({hit_rate:.1f}% dedup hit rate)')
+
+    if stats:
+        stats.switch("write")
+    record_handler.close()
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(options.profile)
+
+    if stats:
+        stats.report(context.records)
+
+    print(f'Records Parsed: {context.records}')
+    print(f'Reports are located in {options.outdir}')
 
-        for rec in ds_handler:
+# Prints the library's log messages as the tool's own output
+log_handler = None
+
+def configure_logging():
+    """Sends ds_store_parser log messages to the current stdout"""
+    global log_handler
+    logger = logging.getLogger('ds_store_parser')
+    if log_handler:
+        logger.removeHandler(log_handler)
+    log_handler = logging.StreamHandler(sys.stdout)
+    log_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(log_handler)
+    logger.setLevel(logging.INFO)
+
+def process_file(ds_file, record_handler, source, opts_check, stat_result=None, data=None, opts_sort=True, opts_filter=None,
+                 opts_carve=False, opts_free=False):
+    """Opens and stats a single .DS_Store file and parses it. stat_result
+    is reused when discovery already has it, and data when the file's
+    contents have already been read. Failures are printed and counted in
+    record_handler.context.errors."""
+    stats = record_handler.stats
+    context = record_handler.context
+    if stats:
+        start = time.perf_counter()
+        previous = stats.switch("open")
+
+    try:
+        if data is None:
+            file_io = open(ds_file, "rb")
+        else:
+            file_io = io.BytesIO(data)
+
+        with file_io:
+            try: 
+                stat_dict = record_handler.get_stats(stat_result or os.lstat(ds_file))
+            except Exception as e:
+                context.errors += 1
+                print(f"Error stat_dict {ds_file}: {e}")
             try:
-                record_handler.write_record(rec, ds_file, source, stat_dict, opts_check)
+                parse(
+                    ds_file, file_io, stat_dict, record_handler, source, opts_check,
+                    opts_sort, opts_filter, opts_carve, opts_free
+                )
             except Exception as e:
-                print(f"Error record_handler {ds_file}: {e}")
+                context.errors += 1
+                print(f"Error parse {ds_file}: {e}")
+    except Exception as e:
+        context.errors += 1
+        print(f"Error opening {ds_file}: {e}")
+
+    if stats:
+        stats.switch(previous)
+        stats.add_file(ds_file, time.perf_counter() - start)
+
+def scan_stores(ds_stores, record_handler, source, worker, pool=None, ordered=False, manifest=None,
+                parse_file=None, dedup=None):
+    """Parses the stores found by discovery and writes their records.
+    Each store is parsed with worker (parse_worker with the scan's options
+    bound) in pool, or in process if there is no pool, else with
+    parse_file (process_file with the scan's options bound) when there is
+    no worker. With dedup, a Deduplicator, only the first copy of any
+    contents is handed to worker.
+
+    Returns:
+        Counter: Number of stores per outcome reported by parse_worker
+    """
+    stats = record_handler.stats
+    if stats:
+        # The pool feeds tasks from its own thread
+        ds_stores = (stats.counted if pool else stats.timed)(ds_stores, "discovery")
+
+    if worker is None:
+        for found in ds_stores:
+            ds_file, stat_result, data = split_found(found)
+            parse_file(ds_file, stat_result=stat_result, data=data)
+        return collections.Counter()
+
+    if dedup:
+        ds_stores = dedup.tasks(ds_stores)
+    if pool:
+        results = pool.imap if ordered else pool.imap_unordered
+        results = results(worker, ds_stores, chunksize=16)
+    else:
+        results = map(worker, ds_stores)
+    return write_results(results, record_handler, source, manifest, dedup, parse_file)
+
+def split_found(found):
+    """Returns (path, stat result, contents or None) for a file found by
+    discovery or an archive member, which comes with its contents"""
+    return found if len(found) == 3 else (found[0], found[1], None)
+
+def write_results(results, record_handler, source, manifest, dedup=None, parse_file=None):
+    """Writes rows produced by parse_worker to the reports, saving stores
+    parsed without errors to the manifest. With dedup, the copies of each
+    first copy are written too: with its rows if it parsed without
+    errors, else parsed on their own with parse_file.
+
+    Returns:
+        Counter: Number of stores per outcome: those reported by
+            parse_worker, with "unique" for first copies and "duplicate"
+            for the others when deduplicating
+    """
+    outcomes = collections.Counter()
+
+    stats = record_handler.stats
+
+    def write(found, rows, parsed, outcome):
+        for row, check_code in rows:
+            record_handler.write_row(row, check_code)
+        record_handler.context.records += parsed
+        outcomes[outcome] += 1
+
+        # A store that failed to open or parse is parsed again next scan
+        if manifest and outcome not in ("manifest", "error"):
+            manifest.store(source, found[0], found[1], rows, parsed)
+
+    def write_ready():
+        for found, rows, parsed in dedup.ready():
+            write(found, dedup.relocate(rows, found), parsed, "duplicate")
+
+    for found, rows, parsed, outcome, timings in results:
+        if stats:
+            stats.switch("write")
+            if timings:
+                stats.merge(timings)
+
+        copies = dedup.finished(found[0], rows, parsed, outcome != "error") if dedup else None
+        if copies is not None and outcome == "parsed":
+            outcome = "unique"
+        write(found, rows, parsed, outcome)
+
+        for copy in copies or ():
+            if outcome == "unique":
+                write(copy, dedup.relocate(rows, copy), parsed, "duplicate")
+            else:
+                errors = record_handler.context.errors
+                parse_file(copy[0], stat_result=copy[1], data=copy[2])
+                outcomes["error" if record_handler.context.errors > errors else "parsed"] += 1
+        if dedup:
+            write_ready()
+
+        if stats:
+            stats.switch("other")
+
+    if dedup:
+        # Copies of contents cached after the last result came in
+        write_ready()
+    return outcomes
+
+class WorkerState:
+    """Parsing state kept across the stores handed to parse_worker: the row
+    collector and read-only manifest. stats is True in
+    pool processes, which hand their timings back with each result, or the
+    report writer's own Stats (or None) when parsing in process."""
+    def __init__(self, opts_check, manifest_path=None, stats=None):
+        self.handler = RowCollector(opts_check)
+        self.drain_stats = stats is True
+        self.handler.stats = Stats() if stats is True else stats
+        self.manifest = Manifest(manifest_path, self.handler.fields, readonly=True) if manifest_path else None
+
+    def close(self):
+        if self.manifest:
+            self.manifest.close()
+
+# The WorkerState of a pool process, set by init_worker. The report
+# writer process never sets it.
+pool_state = None
+
+def init_worker(opts_check, manifest_path=None, stats=False):
+    """Pool initializer: builds the process's WorkerState. Pool processes
+    ignore Ctrl+C and are stopped by the report writer."""
+    global pool_state
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging()
+    pool_state = WorkerState(opts_check, manifest_path, stats)
+
+def pool_worker(found, **options):
+    """parse_worker with the pool process's WorkerState"""
+    return parse_worker(found, pool_state, **options)
+
+def parse_worker(found, state, source, opts_check, opts_sort=True, opts_filter=None, opts_carve=False,
+                 opts_free=False):
+    """Parses one (path, stat result) pair from discovery, or an archive
+    member with its contents. Rows are taken from the manifest if the file
+    is unchanged.
+
+    Returns:
+        tuple: (found, list of (row tuple, code) pairs, number of records
+            parsed, outcome: "parsed", "manifest" or "error" if the store
+            could not be read or parsed completely,
+            timings for Stats.merge when parsing in a worker process with
+            stats enabled, else None)
+    """
+    stats = state.handler.stats if state.drain_stats else None
+    if stats:
+        stats.resume()
+
+    result = collect_rows(found, state, source, opts_check, opts_sort, opts_filter, opts_carve, opts_free)
+    return result + (stats.drain() if stats else None,)
+
+def collect_rows(found, state, source, opts_check, opts_sort=True, opts_filter=None, opts_carve=False,
+                 opts_free=False):
+    """parse_worker without the timings"""
+    ds_file, stat_result, data = split_found(found)
+    # Only the path and stat result go back to the report writer
+    found = (ds_file, stat_result)
+    handler = state.handler
+
+    if state.manifest:
+        cached = state.manifest.lookup(source, ds_file, stat_result)
+        if cached:
+            rows, parsed = cached
+            return found, handler.relocate_rows(rows, ds_file, source, stat_result), parsed, "manifest"
+
+    handler.rows = []
+    # The caller accounts for these records when it writes the rows
+    context = handler.context = ParseContext()
+    process_file(
+        ds_file, handler, source, opts_check, stat_result, data,
+        opts_sort, opts_filter, opts_carve, opts_free
+    )
+
+    parsed = context.records
 
-    elif stat_dict['src_size'] == 0 and os.path.split(ds_file)[1] == '.DS_Store':
-        record_handler.write_record(record, ds_file, source, stat_dict, opts_check)
+    return found, handler.rows, parsed, "error" if context.errors else "parsed"
+
+def parse(ds_file, file_io, stat_dict, record_handler, source, opts_check, opts_sort=True, opts_filter=None,
+          opts_carve=False, opts_free=False):
+    """Parses .DS_Store files and writes records. Records are sorted by
+    filename and code unless opts_sort is False, and only records accepted
+    by opts_filter (an EntryFilter) are decoded. With opts_free, records of
+    freed nodes still on the allocator's free lists are reported as well,
+    and with opts_carve, records carved from unused space."""
+    api.write_store(
+        file_io, ds_file, stat_dict, record_handler, source, opts_sort, opts_filter, opts_carve, opts_free
+    )
 
 def directory_recurse(file_system_path_spec, parent_path, record_handler, opts_source, opts_check):
     """Recursively searches through directories for .DS_Store files using DFVFS."""
@@ -203,210 +766,18 @@ def commandline_arg(bytestring):
     """Convert command line argument bytes to a string"""
     return bytestring
 
-class RecordHandler:
-    def __init__(self, opts_check):
-        global folder_access_report, other_info_report, all_records_ds_store_report
-
-        if opts_check:
-            fields = [
-                "generated_path",
-                "record_filename",  # filename
-                "record_type",      # code
-                "record_format",    # type
-                "record_data",      # value
-                "file_exists",
-                "src_create_time",
-                "src_mod_time",
-                "src_acc_time",
-                "src_metadata_change_time",
-                "src_permissions",
-                "src_size",
-                "block",
-                "src_file"
-            ]
-        else:
-            fields = [
-                "generated_path",
-                "record_filename",  # filename
-                "record_type",      # code
-                "record_format",    # type
-                "record_data",      # value
-                "src_create_time",
-                "src_mod_time",
-                "src_acc_time",
-                "src_metadata_change_time",
-                "src_permissions",
-                "src_size",
-                "block",
-                "src_file"
-            ]
-
-        # Codes that do not always mean a folder was opened
-        self.other_info_codes = {
-            "Iloc", "dilc", "cmmt", "clip", "extn", "logS", "lg1S",
-            "modD", "moDD", "phyS", "ph1S", "ptbL", "ptbN"
-        }
-
-        # Codes indicating folder interactions
-        self.folder_interactions = {
-            "dscl", "fdsc", "vSrn", "BKGD", "ICVO", "LSVO", "bwsp",
-            "fwi0", "fwsw", "fwvh", "glvp", "GRP0", "icgo", "icsp",
-            "icvo", "icvp", "icvt", "info", "lssp", "lsvC", "lsvo",
-            "lsvt", "lsvp", "lsvP", "pict", "bRsV", "pBBk", "pBB0",
-            "vstl"
-        }
-
-        self.fa_writer = csv.DictWriter(
-            all_records_ds_store_report, delimiter="\t", lineterminator="\n",
-            fieldnames=fields
-        )
-        self.fa_writer.writeheader()
-
-        self.fc_writer = csv.DictWriter(
-            folder_access_report, delimiter="\t", lineterminator="\n",
-            fieldnames=fields
-        )
-        self.fc_writer.writeheader()
-
-        self.oi_writer = csv.DictWriter(
-            other_info_report, delimiter="\t", lineterminator="\n",
-            fieldnames=fields
-        )
-        self.oi_writer.writeheader()
-
-        # Rename fields for record parsing
-        fields[1:5] = ["filename", "code", "type", "value"]
-
-    def write_record(self, record, ds_file, source, stat_dict, opts_check):
-        global records_parsed
-
-        if isinstance(record, dict):
-            record_dict = record
-            record_dict["generated_path"] = f'EMPTY DS_STORE: {ds_file}'
-            record_dict["block"] = ""
-        else:
-            record_dict = record.as_dict()[0]
-            block = record.as_dict()[1]
-            record_dict["block"] = block
-            filename = record_dict["filename"]
-            record_dict["generated_path"] = self.generate_fullpath(source, ds_file, filename)
-
-            
-            if opts_check:
-                abs_path_to_rec_file = os.path.join(os.path.split(ds_file)[0], filename)
-                if os.path.lexists(abs_path_to_rec_file):
-                    record_dict["file_exists"] = "[EXISTS] NONE"
-                    stat_result = self.get_stats(os.lstat(abs_path_to_rec_file))
-                    if stat_result:
-                        record_dict["file_exists"] = str(stat_result)
-                else:
-                    record_dict["file_exists"] = "[NOT EXISTS]"
-
-
-            
-            if record_dict["code"] == "vstl":
-                record_dict["value"] = self.style_handler(record_dict)
-
-
-            records_parsed += 1
-
-        
-        for key in ["value", "generated_path", "filename"]:
-            try:
-                record_dict[key] = record_dict[key].replace('\r', '').replace('\n', '').replace('\t', '')
-            except Exception as e:
-                pass
-                # Error replace ./.DS_Store:11150179 'int' object has no attribute 'replace'
-                # Not sure this is important? No need to replace newline/tab if it's not a string right?
-                #print(f"Error replace {ds_file}:{record_dict[key]} {e}")
-        
-
-        
-        record_dict["src_file"] = f'{source}, {ds_file}' if os.path.isfile(source) else ds_file
-        record_dict.update({
-            "src_metadata_change_time": stat_dict["src_metadata_change_time"],
-            "src_acc_time": stat_dict["src_acc_time"],
-            "src_mod_time": stat_dict["src_mod_time"],
-            "src_create_time": stat_dict["src_birth_time"],
-            "src_size": stat_dict["src_size"],
-            "src_permissions": f'{stat_dict["src_perms"]}, User: {stat_dict["src_uid"]}, Group: {stat_dict["src_gid"]}'
-        })
-
-        try:
-            record_dict["type"] = record_dict["type"].decode("utf-8") if isinstance(record_dict["type"], bytes) else str(record_dict["type"])
-            
-            if "Codec" in record_dict["type"]:
-                record_dict["type"] = f'blob ({record_dict["type"]})'
-        except Exception as e:
-            gettype = type(record_dict["type"])
-            print(f"Error here {ds_file}: type({gettype}): value: {record_dict['type']} {e}")
-
-
-        check_code = record_dict["code"]
-        record_dict["code"] += f" ({self.update_descriptor(record_dict)})"
-
-        self.fa_writer.writerow(record_dict)
-
-        if check_code in self.other_info_codes:
-            self.oi_writer.writerow(record_dict)
-        elif check_code in self.folder_interactions:
-            self.fc_writer.writerow(record_dict)
-        else:
-            print(f'Code not accounted for: {record_dict["code"]}')
-
-        
-
-    def get_stats(self, stat_result):
-        stat_dict = {
-            "src_acc_time": self.convert_time(stat_result.st_atime) + " [UTC]",
-            "src_mod_time": self.convert_time(stat_result.st_mtime) + " [UTC]",
-            "src_perms": self.perm_to_text(stat_result.st_mode),
-            "src_size": stat_result.st_size,
-            "src_uid": stat_result.st_uid,
-            "src_gid": stat_result.st_gid,
-        }
-
-        if hasattr(stat_result, "st_birthtime"):
-            stat_dict["src_birth_time"] = self.convert_time(stat_result.st_birthtime) + " [UTC]"
-        else:
-            stat_dict["src_birth_time"] = self.convert_time(stat_result.st_ctime) + " [UTC]"
+def comma_list(text):
+    """Splits a comma separated argument, ignoring blanks around items"""
+    items = [item.strip() for item in text.split(',')]
+    return [item for item in items if item] or None
 
-        stat_dict["src_metadata_change_time"] = self.convert_time(stat_result.st_ctime) + " [UTC]"
-        return stat_dict
-
-    def convert_time(self, timestamp):
-        return str(datetime.datetime.fromtimestamp(timestamp, datetime.UTC))
-
-
-    def perm_to_text(self, perm):
-        """Converts permission mode to human-readable format."""
-        perms = {
-            "0": "---", "1": "--x", "2": "-w-", "3": "-wx",
-            "4": "r--", "5": "r-x", "6": "rw-", "7": "rwx"
-        }
-        perm_oct = oct(int(perm))[-3:]
-        return "Perms: {}/-{}".format(perm, "".join(perms.get(p, p) for p in perm_oct))
-
-    def generate_fullpath(self, source, ds_file, record_filename):
-        ds_store_rel_path = os.path.split(ds_file)[0] if os.path.isfile(source) else os.path.split(ds_file)[0][len(os.path.split(source)[0]):]
-        generated_path = os.path.join(ds_store_rel_path, record_filename).replace('\r', '').replace('\n', '').replace('\t', '')
-
-        if os.name == "nt":
-            generated_path = generated_path.replace("\\", "/")
-
-        return f"/{generated_path}" if not generated_path.startswith("/") else generated_path
-
-    def update_descriptor(self, record):
-        return type_codes.get(record["code"], f"Unknown Code: {record['code']}")
-
-    def style_handler(self, record):
-        styles_dict = {
-            '\x00\x00\x00\x00': "0x00000000: Null",
-            "none": "none: Unselected", "icnv": "icnv: Icon View",
-            "clmv": "clmv: Column View", "Nlsv": "Nlsv: List View",
-            "glyv": "glyv: Gallery View", "Flwv": "Flwv: CoverFlow View"
-        }
-        return styles_dict.get(record["value"], f"Unknown Code: {record['value']}")
+def regex_arg(pattern):
+    """Compiles a regular expression argument, or rejects it as a usage
+    error"""
+    try:
+        return re.compile(pattern)
+    except re.error as exp:
+        raise argparse.ArgumentTypeError(f'invalid regular expression {pattern!r}: {exp}')
 
 if __name__ == '__main__':
     main()
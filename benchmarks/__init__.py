@@ -0,0 +1,5 @@
+"""Performance benchmarks for the DSStoreParser reader and report writer.
+
+Run individual benchmarks as modules from the repository root, e.g.
+``python -m benchmarks.bench_decode``.
+"""
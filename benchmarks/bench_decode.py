@@ -0,0 +1,80 @@
+"""Micro-benchmark: format strings versus ``formats.*`` Structs in reads.
+
+Times ``Block.read`` and ``Allocator.read`` unpacking the fields of every
+entry in a leaf node, once passing format strings (``'>I'``, ``'>4s4s'``,
+...) and once passing the precompiled ``struct.Struct`` objects from
+``ds_store.formats``. Only the read calls are timed; each side runs
+``timeit.repeat`` and the fastest repeat is reported.
+"""
+import argparse
+import io
+import timeit
+
+from ds_store_parser.ds_store import formats, store
+from benchmarks import corpus
+
+FORMAT_STRINGS = ('>I', '>4s4s', '>Q')
+STRUCTS = (formats.UINT32, formats.CODE_TYPE, formats.UINT64)
+
+
+def leaf_node(records):
+    """Return the store and block number of a single leaf holding `records`."""
+    entries = corpus.make_entries(records)
+    file_io = io.BytesIO(corpus.build_store(entries, depth=1))
+    file_io.name = '<synthetic>'
+    ds_store = store.DSStore.open(file_io, 'rb', buffered=True)
+    return ds_store, ds_store._rootnode, len(entries)
+
+
+def block_reads(ds_store, node, count, fields):
+    """Return a function reading `count` rounds of `fields` from one block."""
+    uint32, code_type, uint64 = fields
+
+    def run():
+        with ds_store._get_block(node) as block:
+            for _ in range(count):
+                block._pos = 8
+                block.read(uint32)
+                block.read(code_type)
+                block.read(uint64)
+
+    return run
+
+
+def allocator_reads(ds_store, node, count, fields):
+    """Return a function reading `count` rounds of `fields` through the
+    allocator, at the same offsets as block_reads."""
+    uint32, code_type, uint64 = fields
+    allocator = ds_store._store
+    with ds_store._get_block(node) as block:
+        offset = block._offset + 8
+
+    def run():
+        for _ in range(count):
+            allocator.read(offset, uint32)
+            allocator.read(offset + 4, code_type)
+            allocator.read(offset + 12, uint64)
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=1000, help='Files per synthetic store.')
+    parser.add_argument('--repeat', type=int, default=50, help='timeit repeats; the minimum is reported.')
+    args = parser.parse_args()
+
+    ds_store, node, count = leaf_node(args.records)
+    reads = 3 * count
+
+    for target, factory in (('Block.read', block_reads), ('Allocator.read', allocator_reads)):
+        for name, fields in (('format strings', FORMAT_STRINGS), ('formats.* Struct', STRUCTS)):
+            func = factory(ds_store, node, count, fields)
+            best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(f'{target:>14} {name:>16}: {best / reads * 1e9:6.0f} ns/read ({reads} reads)')
+
+    ds_store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Micro-benchmark: report rows written per second by ``RecordHandler``.
+
+Compares the baseline ``write_record`` (copied below as it was: ``as_dict``
+twice, chained ``str.replace`` calls, per-record stat columns and path,
+and a ``DictWriter`` row into the all records report and the folder access
+or miscellaneous report) with the current tuple rows, per-file constants
+and batched ``writerows`` through ``TsvSink`` over the same decoded records.
+"""
+import argparse
+import csv
+import io
+import os
+import tempfile
+import timeit
+
+from ds_store_parser import ds_store_handler
+from ds_store_parser import sinks
+from ds_store_parser.ds_store.store import codes as type_codes
+from ds_store_parser.records import RecordHandler
+from benchmarks import corpus
+
+
+class LegacyRecordHandler:
+    """The baseline ``RecordHandler`` row path, writing to in-memory
+    reports instead of the module-level report files."""
+    def __init__(self, opts_check):
+        fields = [
+            "generated_path", "record_filename", "record_type", "record_format", "record_data",
+            "src_create_time", "src_mod_time", "src_acc_time", "src_metadata_change_time",
+            "src_permissions", "src_size", "block", "src_file"
+        ]
+
+        self.other_info_codes = {
+            "Iloc", "dilc", "cmmt", "clip", "extn", "logS", "lg1S",
+            "modD", "moDD", "phyS", "ph1S", "ptbL", "ptbN"
+        }
+        self.folder_interactions = {
+            "dscl", "fdsc", "vSrn", "BKGD", "ICVO", "LSVO", "bwsp",
+            "fwi0", "fwsw", "fwvh", "glvp", "GRP0", "icgo", "icsp",
+            "icvo", "icvp", "icvt", "info", "lssp", "lsvC", "lsvo",
+            "lsvt", "lsvp", "lsvP", "pict", "bRsV", "pBBk", "pBB0",
+            "vstl"
+        }
+
+        self.fa_writer = csv.DictWriter(io.StringIO(), delimiter="\t", lineterminator="\n", fieldnames=fields)
+        self.fa_writer.writeheader()
+        self.fc_writer = csv.DictWriter(io.StringIO(), delimiter="\t", lineterminator="\n", fieldnames=fields)
+        self.fc_writer.writeheader()
+        self.oi_writer = csv.DictWriter(io.StringIO(), delimiter="\t", lineterminator="\n", fieldnames=fields)
+        self.oi_writer.writeheader()
+
+        fields[1:5] = ["filename", "code", "type", "value"]
+
+    def write_record(self, record, ds_file, source, stat_dict, opts_check):
+        record_dict = record.as_dict()[0]
+        block = record.as_dict()[1]
+        record_dict["block"] = block
+        filename = record_dict["filename"]
+        record_dict["generated_path"] = self.generate_fullpath(source, ds_file, filename)
+
+        if record_dict["code"] == "vstl":
+            record_dict["value"] = self.style_handler(record_dict)
+
+        for key in ["value", "generated_path", "filename"]:
+            try:
+                record_dict[key] = record_dict[key].replace('\r', '').replace('\n', '').replace('\t', '')
+            except Exception:
+                pass
+
+        record_dict["src_file"] = f'{source}, {ds_file}' if os.path.isfile(source) else ds_file
+        record_dict.update({
+            "src_metadata_change_time": stat_dict["src_metadata_change_time"],
+            "src_acc_time": stat_dict["src_acc_time"],
+            "src_mod_time": stat_dict["src_mod_time"],
+            "src_create_time": stat_dict["src_birth_time"],
+            "src_size": stat_dict["src_size"],
+            "src_permissions": f'{stat_dict["src_perms"]}, User: {stat_dict["src_uid"]}, Group: {stat_dict["src_gid"]}'
+        })
+
+        record_dict["type"] = record_dict["type"].decode("utf-8") if isinstance(record_dict["type"], bytes) else str(record_dict["type"])
+        if "Codec" in record_dict["type"]:
+            record_dict["type"] = f'blob ({record_dict["type"]})'
+
+        check_code = record_dict["code"]
+        record_dict["code"] += f" ({type_codes.get(record_dict['code'], 'Unknown Code: ' + record_dict['code'])})"
+
+        self.fa_writer.writerow(record_dict)
+
+        if check_code in self.other_info_codes:
+            self.oi_writer.writerow(record_dict)
+        elif check_code in self.folder_interactions:
+            self.fc_writer.writerow(record_dict)
+
+    def generate_fullpath(self, source, ds_file, record_filename):
+        ds_store_rel_path = os.path.split(ds_file)[0] if os.path.isfile(source) else os.path.split(ds_file)[0][len(os.path.split(source)[0]):]
+        generated_path = os.path.join(ds_store_rel_path, record_filename).replace('\r', '').replace('\n', '').replace('\t', '')
+
+        if os.name == "nt":
+            generated_path = generated_path.replace("\\", "/")
+
+        return f"/{generated_path}" if not generated_path.startswith("/") else generated_path
+
+    def style_handler(self, record):
+        styles_dict = {
+            '\x00\x00\x00\x00': "0x00000000: Null",
+            "none": "none: Unselected", "icnv": "icnv: Icon View",
+            "clmv": "clmv: Column View", "Nlsv": "Nlsv: List View",
+            "glyv": "glyv: Gallery View", "Flwv": "Flwv: CoverFlow View"
+        }
+        return styles_dict.get(record["value"], f"Unknown Code: {record['value']}")
+
+
+def tsv_sink(header):
+    return sinks.TsvSink(header, io.StringIO(), io.StringIO(), io.StringIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=2000, help='Files per synthetic store.')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as source:
+        ds_file = os.path.join(source, '.DS_Store')
+        corpus.write_store(ds_file, corpus.make_entries(args.records))
+
+        handler = RecordHandler(False, write_reports=False)
+        stat_dict = handler.get_stats(os.lstat(ds_file))
+        with open(ds_file, 'rb') as file_io:
+            records = list(ds_store_handler.DsStoreHandler(file_io, ds_file))
+            # Decode every value up front so both sides measure row building
+            for record in records:
+                record.as_tuple()
+
+            def before():
+                legacy = LegacyRecordHandler(False)
+                for record in records:
+                    legacy.write_record(record, ds_file, source, stat_dict, False)
+
+            def after():
+                current = RecordHandler(False, sink_factory=tsv_sink)
+                for record in records:
+                    current.write_record(record, ds_file, source, stat_dict, False)
+                current.sink.flush()
+
+            count = len(records)
+            for name, func in (('baseline', before), ('tuple rows', after)):
+                best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+                print(f'{name:>12}: {count / best:10.0f} rows/s ({count} rows)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Synthetic ``.DS_Store`` generator used by the benchmarks.
+
+Writes valid buddy-allocated stores: a root allocator block, a ``DSDB``
+superblock and a B-tree of record nodes laid out the way Finder does it.
+"""
+import os
+import plistlib
+import random
+import struct
+
+PAGE_SIZE = 0x1000
+
+
+def encode_entry(filename, code, typecode, value):
+    """Serialise one record exactly as it appears inside a B-tree node."""
+    name = filename.encode('utf-16be')
+    data = struct.pack('>I', len(name) // 2) + name + code.encode() + typecode.encode()
+
+    if typecode == 'bool':
+        data += struct.pack('>?', value)
+    elif typecode in ('long', 'shor'):
+        data += struct.pack('>I', value)
+    elif typecode == 'blob':
+        data += struct.pack('>I', len(value)) + value
+    elif typecode == 'ustr':
+        text = value.encode('utf-16be')
+        data += struct.pack('>I', len(text) // 2) + text
+    elif typecode == 'type':
+        data += value.encode()
+    elif typecode in ('comp', 'dutc'):
+        data += struct.pack('>Q', value)
+    else:
+        raise ValueError(f'Unknown type code "{typecode}"')
+
+    return data
+
+
+# Generators for the per-file records, by code: (type, value(rnd, i, blob_size))
+RECORD_KINDS = {
+    'Iloc': ('blob', lambda rnd, i, blob_size: struct.pack(
+        '>IIII', rnd.randrange(1000), rnd.randrange(1000), 0xffffffff, 0xffff0000)),
+    'cmmt': ('ustr', lambda rnd, i, blob_size: f'comment {i}\twith tab'),
+    'logS': ('comp', lambda rnd, i, blob_size: rnd.randrange(1 << 40)),
+    'lg1S': ('comp', lambda rnd, i, blob_size: rnd.randrange(1 << 40)),
+    'ph1S': ('comp', lambda rnd, i, blob_size: rnd.randrange(1 << 40)),
+    # dutc: 1/65536 seconds since 1904
+    'modD': ('dutc', lambda rnd, i, blob_size: rnd.randrange(3_000_000_000, 3_900_000_000) << 16),
+    'dilc': ('blob', lambda rnd, i, blob_size: struct.pack(
+        '>8I', *(rnd.randrange(1 << 32) for _ in range(8)))),
+    'vSrn': ('long', lambda rnd, i, blob_size: 1),
+    'extn': ('ustr', lambda rnd, i, blob_size: 'txt'),
+    'ptbL': ('ustr', lambda rnd, i, blob_size: f'Users/someone/Documents/folder{i}/'),
+    # Opaque blobs of the requested size, e.g. bookmarks
+    'pBBk': ('blob', lambda rnd, i, blob_size: rnd.randbytes(blob_size)),
+}
+
+# The records Finder typically keeps for a file in icon view
+DEFAULT_CODES = ('Iloc', 'cmmt', 'logS', 'modD', 'dilc')
+
+
+def make_entries(count, seed=0, codes=DEFAULT_CODES, blob_size=64):
+    """Return `count` files worth of records plus the folder's own view
+    settings, sorted in B-tree key order.  Every file gets one record per
+    code in `codes` (see RECORD_KINDS); `blob_size` sets the size of the
+    opaque blob records."""
+    rnd = random.Random(seed)
+    entries = []
+
+    for i in range(count):
+        filename = f'file{i:05d}.txt'
+        for code in codes:
+            typecode, value = RECORD_KINDS[code]
+            entries.append((filename, code, typecode, value(rnd, i, blob_size)))
+
+    entries.append(('.', 'vstl', 'type', 'icnv'))
+    entries.append(('.', 'fwi0', 'blob', struct.pack('>HHHH4sI', 10, 20, 300, 400, b'icnv', 0)))
+    entries.append(('.', 'icvo', 'blob', b'icv4' + struct.pack('>H', 64) + b'none' + b'botm' + b'\0' * 12))
+    entries.append(('.', 'bwsp', 'blob', plistlib.dumps(
+        {'ShowSidebar': True, 'WindowBounds': '{{1, 2}, {3, 4}}'}, fmt=plistlib.FMT_BINARY)))
+    entries.append(('.', 'dscl', 'bool', True))
+
+    entries.sort(key=lambda e: (e[0].lower(), e[1]))
+    return entries
+
+
+def _build_tree(entries, depth, fanout, nodes):
+    """Append the nodes for `entries` to `nodes` and return the root's block
+    number.  Block numbers start at 2; 0 and 1 are the allocator root and
+    the DSDB superblock."""
+    number = len(nodes) + 2
+    nodes.append(None)
+
+    if depth <= 1 or len(entries) < 2 * fanout:
+        nodes[number - 2] = struct.pack('>II', 0, len(entries)) + \
+            b''.join(encode_entry(*e) for e in entries)
+        return number
+
+    per_child = (len(entries) - (fanout - 1)) // fanout
+    children, separators, pos = [], [], 0
+    for i in range(fanout):
+        end = pos + per_child if i < fanout - 1 else len(entries)
+        children.append(_build_tree(entries[pos:end], depth - 1, fanout, nodes))
+        if i < fanout - 1:
+            separators.append(entries[end])
+            pos = end + 1
+
+    # Internal nodes store the rightmost child up front and a pointer before
+    # every separator record.
+    data = struct.pack('>II', children[-1], len(separators))
+    for child, entry in zip(children, separators):
+        data += struct.pack('>I', child) + encode_entry(*entry)
+    nodes[number - 2] = data
+    return number
+
+
+def _block_size(length):
+    size = 32
+    while size < length:
+        size <<= 1
+    return size
+
+
+def build_store(entries, depth=2, fanout=4):
+    """Return the bytes of a ``.DS_Store`` holding `entries`."""
+    nodes = []
+    root = _build_tree(entries, depth, fanout, nodes)
+    levels = max(depth, 1)
+    blocks = [b'', struct.pack('>IIIII', root, levels - 1, len(entries), len(nodes), PAGE_SIZE)] + nodes
+
+    count = len(blocks)
+    padded = (count + 255) & ~255
+    toc = struct.pack('>I', 1) + bytes([4]) + b'DSDB' + struct.pack('>I', 1)
+    free_lists = struct.pack('>I', 0) * 32
+    root_size = 8 + 4 * padded + len(toc) + len(free_lists)
+    blocks[0] = b'\0' * root_size
+
+    # Buddy blocks are power-of-two sized and aligned to their size; the
+    # first 32 bytes hold the allocator header.
+    layout = []
+    cursor = 32
+    for data in blocks:
+        size = _block_size(len(data))
+        cursor = (cursor + size - 1) // size * size
+        layout.append((cursor, size))
+        cursor += size
+
+    addresses = [offset | (size.bit_length() - 1) for offset, size in layout]
+    blocks[0] = struct.pack('>II', count, 0) + \
+        struct.pack(f'>{padded}I', *(addresses + [0] * (padded - count))) + toc + free_lists
+
+    data = bytearray(cursor + 4)
+    root_offset, root_len = layout[0]
+    data[0:36] = struct.pack('>I4sIII16s', 1, b'Bud1', root_offset, root_len, root_offset, b'\0' * 16)
+    for block, (offset, _) in zip(blocks, layout):
+        data[offset + 4:offset + 4 + len(block)] = block
+
+    return bytes(data)
+
+
+def write_store(path, entries, depth=2, fanout=4):
+    """Write a ``.DS_Store`` holding `entries` to `path`."""
+    with open(path, 'wb') as file_io:
+        file_io.write(build_store(entries, depth, fanout))
+
+
+def write_tree(root, stores, records, dir_fanout=4, seed=0, **entry_options):
+    """Write `stores` ``.DS_Store`` files of `records` files each into a
+    directory tree under `root`, `dir_fanout` subdirectories per level,
+    and return their paths.  Extra keyword arguments go to make_entries."""
+    paths = []
+    for n in range(stores):
+        # Directory n's parent is directory (n - 1) // dir_fanout, as in a heap
+        parts = []
+        while n:
+            parts.append(f'd{n:05d}')
+            n = (n - 1) // dir_fanout
+        directory = os.path.join(root, *reversed(parts))
+        os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, '.DS_Store')
+        write_store(path, make_entries(records, seed=seed + len(paths), **entry_options))
+        paths.append(path)
+    return paths
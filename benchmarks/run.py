@@ -0,0 +1,168 @@
+"""Benchmark suite: parser throughput from allocator open to full reports.
+
+Generates a synthetic corpus and times each stage on it:
+
+    allocator_open   Allocator.open of one store (buffered)
+    traversal        DSStore iteration, blob values left undecoded
+    codecs           decoding every blob value of an already read store
+    record_handler   RecordHandler rows written to in-memory TSV reports
+    main             DSStoreParser.main() over a directory tree
+
+Each stage reports the best of ``--repeat`` runs.  ``--json`` writes the
+results in machine-readable form, so runs can be compared across versions:
+
+    python -m benchmarks.run --json results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import timeit
+
+import DSStoreParser
+from ds_store_parser import ds_store_handler
+from ds_store_parser.ds_store import buddy
+from ds_store_parser.ds_store import store
+from benchmarks import corpus
+from benchmarks.bench_rows import tsv_sink
+
+
+def best_of(func, repeat):
+    """Best wall time of `repeat` calls to func"""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def open_store(data):
+    file_io = io.BytesIO(data)
+    return store.DSStore.open(file_io, 'rb', buffered=True)
+
+
+def bench_allocator_open(data, repeat):
+    def run():
+        for _ in range(100):
+            buddy.Allocator.open(io.BytesIO(data), buffered=True)
+    return best_of(run, repeat), 100, 'opens'
+
+
+def bench_traversal(data, repeat):
+    count = sum(1 for _ in open_store(data))
+
+    def run():
+        for _ in open_store(data):
+            pass
+    return best_of(run, repeat), count, 'entries'
+
+
+def bench_codecs(data, repeat):
+    # Values are cached once decoded, so every run gets freshly read entries.
+    # Fixed-layout values are formatted by str(), as the sinks do
+    best = None
+    for _ in range(repeat):
+        blobs = [e for e in open_store(data) if e.raw is not None]
+        start = timeit.default_timer()
+        for e in blobs:
+            str(e.value)
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(blobs), 'blobs'
+
+
+def bench_record_handler(path, repeat):
+    source = os.path.dirname(path)
+    handler = DSStoreParser.RecordHandler(False, write_reports=False)
+    stat_dict = handler.get_stats(os.lstat(path))
+    with open(path, 'rb') as file_io:
+        records = list(ds_store_handler.DsStoreHandler(file_io, path))
+        for record in records:
+            record.as_tuple()
+
+    def run():
+        current = DSStoreParser.RecordHandler(False, sink_factory=tsv_sink)
+        for record in records:
+            current.write_record(record, path, source, stat_dict, False)
+        current.sink.flush()
+    return best_of(run, repeat), len(records), 'rows'
+
+
+def bench_main(tree, outdir, repeat, extra_args=()):
+    argv = ['DSStoreParser.py', '-s', tree, '-o', outdir, *extra_args]
+
+    output = io.StringIO()
+
+    def run():
+        output.seek(0)
+        output.truncate()
+        saved, sys.argv = sys.argv, argv
+        try:
+            with contextlib.redirect_stdout(output):
+                DSStoreParser.main()
+        finally:
+            sys.argv = saved
+    seconds = best_of(run, repeat)
+    records = re.search(r'^Records Parsed: (\d+)$', output.getvalue(), re.MULTILINE)
+    return seconds, int(records.group(1)), 'records'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=2000, help='Files per store. (default: 2000)')
+    parser.add_argument('--depth', type=int, default=2, help='B-tree depth of each store. (default: 2)')
+    parser.add_argument('--fanout', type=int, default=8, help='Children per internal node. (default: 8)')
+    parser.add_argument('--codes', default=','.join(corpus.DEFAULT_CODES),
+                        help=f'Comma separated record codes per file, from {", ".join(corpus.RECORD_KINDS)}.')
+    parser.add_argument('--blob-size', type=int, default=64, help='Size of opaque blob records. (default: 64)')
+    parser.add_argument('--stores', type=int, default=200, help='Stores in the tree used for main(). (default: 200)')
+    parser.add_argument('--tree-records', type=int, default=50, help='Files per store in the tree. (default: 50)')
+    parser.add_argument('--workers', type=int, default=1, help='Workers used for main(). (default: 1)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', dest='json_path', default=None, help='Write results to this file as JSON.')
+    args = parser.parse_args()
+
+    entry_options = {'codes': args.codes.split(','), 'blob_size': args.blob_size}
+    entries = corpus.make_entries(args.records, **entry_options)
+    data = corpus.build_store(entries, depth=args.depth, fanout=args.fanout)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'single', '.DS_Store')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as file_io:
+            file_io.write(data)
+
+        tree = os.path.join(workdir, 'tree')
+        outdir = os.path.join(workdir, 'out')
+        os.makedirs(outdir)
+        corpus.write_tree(tree, args.stores, args.tree_records, **entry_options)
+
+        stages = (
+            ('allocator_open', lambda: bench_allocator_open(data, args.repeat)),
+            ('traversal', lambda: bench_traversal(data, args.repeat)),
+            ('codecs', lambda: bench_codecs(data, args.repeat)),
+            ('record_handler', lambda: bench_record_handler(path, args.repeat)),
+            ('main', lambda: bench_main(tree, outdir, args.repeat, ('-w', str(args.workers)))),
+        )
+        for name, stage in stages:
+            seconds, items, unit = stage()
+            rate = items / seconds if seconds else 0.0
+            results.append({'name': name, 'seconds': seconds, 'items': items, 'unit': unit, 'per_second': rate})
+            print(f'{name:>15}: {seconds * 1e3:9.2f} ms  {rate:12.0f} {unit}/s ({items} {unit})')
+
+    if args.json_path:
+        report = {
+            'version': DSStoreParser.__VERSION__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': vars(args),
+            'results': results,
+        }
+        with open(args.json_path, 'w', encoding='utf-8') as file_io:
+            json.dump(report, file_io, indent=2)
+
+
+if __name__ == '__main__':
+    main()
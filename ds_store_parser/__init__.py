@@ -1 +1,9 @@
+from .api import Record, parse_store, report_store
+from .context import ParseContext
+from .records import RecordHandler, RowCollector
+from .sinks import Sink, ListSink, TsvSink, SqliteSink, JsonlSink
 
+__all__ = [
+    "Record", "parse_store", "report_store", "ParseContext", "RecordHandler", "RowCollector",
+    "Sink", "ListSink", "TsvSink", "SqliteSink", "JsonlSink",
+]
@@ -0,0 +1,164 @@
+"""Library interface for parsing .DS_Store files without the command line
+tool. Nothing here keeps module state, so separate parses may run side by
+side in threads or interleaved generators:
+
+    from ds_store_parser import parse_store
+
+    for record in parse_store('/Volumes/evidence/Users/a/Desktop/.DS_Store'):
+        print(record.filename, record.code, record.value)
+
+Report rows, as written by the command line tool, are produced by a
+RecordHandler and its sink (see sinks.Sink):
+
+    handler = RecordHandler(False, sink_factory=sinks.ListSink)
+    report_store(path, handler)
+    rows = handler.sink.rows
+"""
+import collections
+import contextlib
+import io
+import logging
+import os
+
+from .context import ParseContext
+from .ds_store_handler import DsStoreHandler
+
+logger = logging.getLogger(__name__)
+
+# One decoded record: value is decoded by its codec, blobs are hex and
+# timestamps are datetimes. Fixed-layout blobs such as Iloc and dilc are
+# store.FixedValue objects: as_dict() gives their fields, str() the text.
+# block is the B-tree node, or where a recovered record was found.
+Record = collections.namedtuple('Record', 'filename code type value block')
+
+# Stat columns of a store read from bytes or a file object
+BLANK_STATS = {
+    "src_acc_time": "", "src_mod_time": "", "src_perms": "", "src_size": "",
+    "src_uid": "", "src_gid": "", "src_birth_time": "", "src_metadata_change_time": "",
+}
+
+
+@contextlib.contextmanager
+def open_source(source, name=None):
+    """Opens a path, bytes-like object or binary file object. File objects
+    are used as they are and left open.
+
+    Yields:
+        tuple: (binary file object, name used in messages and reports)
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source), name or '<bytes>'
+    elif isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        with open(path, 'rb') as file_io:
+            yield file_io, name or path
+    else:
+        yield source, name or getattr(source, 'name', '<file object>')
+
+
+def parse_store(source, context=None, name=None, sort=True, entry_filter=None, carve_slack=False,
+                free_blocks=False):
+    """Yields the records of one .DS_Store.
+
+    Args:
+        source: A path, bytes-like object or binary file object.
+        context: ParseContext whose counters are updated, if given.
+        name: Name used for the store in place of its path.
+        sort: Sort records by filename and code, else stream them in B-tree
+            key order.
+        entry_filter: EntryFilter; only accepted records are decoded.
+        carve_slack: Also yield records carved from unused space.
+        free_blocks: Also yield records of freed nodes still on the
+            allocator's free lists.
+
+    Yields:
+        Record: Each decoded record.
+
+    Raises:
+        BuddyError, ValueError: The store's headers cannot be read.
+    """
+    context = context if context is not None else ParseContext()
+
+    with open_source(source, name) as (file_io, name):
+        try:
+            handler = DsStoreHandler(file_io, name, sort, entry_filter, carve_slack, free_blocks)
+        except Exception:
+            context.errors += 1
+            raise
+        context.stores += 1
+
+        for record in handler:
+            yield Record(*record.as_tuple())
+            context.records += 1
+
+
+def report_store(source, handler, name=None, stat_result=None, root=None, sort=True, entry_filter=None,
+                 carve_slack=False, free_blocks=False):
+    """Writes the report rows of one .DS_Store through handler, a
+    RecordHandler, counting them in handler.context. Errors are logged and
+    counted rather than raised, as in a scan.
+
+    Args:
+        source: A path, bytes-like object or binary file object.
+        handler: RecordHandler the rows are written to.
+        name: Path reported for the store, by default its path.
+        stat_result: os.stat_result for the source columns. Paths are
+            lstat'ed if it is not given; other sources get blank columns.
+        root: Scan root that generated paths are relative to, by default
+            the store's directory.
+        sort, entry_filter, carve_slack, free_blocks: As for parse_store.
+    """
+    with open_source(source, name) as (file_io, name):
+        if stat_result is None and isinstance(source, (str, os.PathLike)):
+            stat_result = os.lstat(source)
+
+        if stat_result is not None:
+            stat_dict = handler.get_stats(stat_result)
+        else:
+            stat_dict = dict(BLANK_STATS)
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                stat_dict["src_size"] = len(source)
+
+        write_store(
+            file_io, name, stat_dict, handler, root if root is not None else os.path.dirname(name),
+            sort, entry_filter, carve_slack, free_blocks
+        )
+
+
+def write_store(file_io, ds_file, stat_dict, handler, source, sort=True, entry_filter=None, carve_slack=False,
+                free_blocks=False):
+    """Parses an open .DS_Store and writes its records through handler.
+    ds_file is the path reported for it, stat_dict its stat columns from
+    handler.get_stats and source the scan root. An empty .DS_Store gets a
+    single row saying so."""
+    context = handler.context
+    stats = handler.stats
+    ds_handler = None
+    if stats:
+        stats.switch("header")
+
+    try:
+        if stat_dict['src_size'] != 0:
+            ds_handler = DsStoreHandler(file_io, ds_file, sort, entry_filter, carve_slack, free_blocks)
+    except Exception as exp:
+        context.errors += 1
+        logger.error(f'ERROR: {exp} for file {ds_file}')
+
+    if stats:
+        stats.switch("write")
+
+    if ds_handler:
+        context.stores += 1
+        logger.info(f"DS_Store Found: {ds_file}")
+
+        for rec in (stats.timed(ds_handler, "traversal") if stats else ds_handler):
+            try:
+                handler.write_record(rec, ds_file, source, stat_dict, handler.opts_check)
+            except Exception as e:
+                context.errors += 1
+                logger.error(f"Error record_handler {ds_file}: {e}")
+
+    elif stat_dict['src_size'] == 0 and os.path.split(ds_file)[1] == '.DS_Store':
+        context.stores += 1
+        record = {'code': '', 'value': '', 'type': '', 'filename': ''}
+        handler.write_record(record, ds_file, source, stat_dict, handler.opts_check)
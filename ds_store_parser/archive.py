@@ -0,0 +1,88 @@
+import calendar
+import fnmatch
+import os
+import posixpath
+import stat
+import tarfile
+import zipfile
+
+from .discovery import is_ds_store_name
+
+
+def is_archive(path):
+    """True if path is a tar (optionally compressed) or zip file"""
+    if not os.path.isfile(path):
+        return False
+    try:
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+
+def member_stat(mode, size, mtime, uid=0, gid=0):
+    """An os.stat_result for an archive member. Archives only keep the
+    modification time, so it stands in for the other timestamps too."""
+    mtime_ns = int(mtime * 1e9)
+    return os.stat_result(
+        (mode, 0, 0, 1, uid, gid, size, int(mtime), int(mtime), int(mtime)),
+        {
+            'st_atime': mtime, 'st_mtime': mtime, 'st_ctime': mtime,
+            'st_atime_ns': mtime_ns, 'st_mtime_ns': mtime_ns, 'st_ctime_ns': mtime_ns,
+        }
+    )
+
+
+def find_ds_stores(path, excludes=(), max_depth=None, skip_dirs=()):
+    """Yields every .DS_Store member of the tar or zip archive at path,
+    read straight from the archive without extracting anything to disk.
+    Tar archives, compressed or not, are read as a stream in one pass.
+
+    Args:
+        path: The archive to search.
+        excludes: Glob patterns; members are skipped if the pattern matches
+            their full path or any of its parts.
+        max_depth: Maximum directory depth of a member, the archive root
+            being 0.
+        skip_dirs: Directory names whose contents are skipped.
+
+    Yields:
+        tuple: (member path, stat result built from the member's metadata,
+            member contents)
+    """
+    def wanted(name):
+        name = posixpath.normpath(name.lstrip('/'))
+        parts = name.split('/')
+        if not is_ds_store_name(parts[-1]):
+            return None
+        if max_depth is not None and len(parts) - 1 > max_depth:
+            return None
+        if skip_dirs and any(part in skip_dirs for part in parts[:-1]):
+            return None
+        if excludes and any(
+            fnmatch.fnmatch(name, pattern) or any(fnmatch.fnmatch(part, pattern) for part in parts)
+            for pattern in excludes
+        ):
+            return None
+        return name
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = None if info.is_dir() else wanted(info.filename)
+                if name is None:
+                    continue
+                mode = info.external_attr >> 16 or (stat.S_IFREG | 0o644)
+                # Zip timestamps carry no time zone; they are taken as UTC
+                mtime = calendar.timegm(info.date_time + (0, 0, 0))
+                yield name, member_stat(mode, info.file_size, mtime), archive.read(info)
+        return
+
+    with tarfile.open(path, mode='r|*') as archive:
+        for member in archive:
+            name = wanted(member.name) if member.isfile() else None
+            if name is None:
+                continue
+            with archive.extractfile(member) as file_io:
+                data = file_io.read()
+            mode = stat.S_IFREG | stat.S_IMODE(member.mode)
+            yield name, member_stat(mode, member.size, member.mtime, member.uid, member.gid), data
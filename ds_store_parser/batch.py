@@ -0,0 +1,119 @@
+"""Batch decoding of fixed-layout blobs into columns, for analytics over
+many records, such as icon positions (Iloc, dilc) or window geometry
+(fwi0). Raw blobs are collected per code and decoded in one vectorized
+numpy.frombuffer call with a big-endian structured dtype built from the
+codec's layout:
+
+    batch = BlobBatch()
+    for path in paths:
+        batch.add(path)
+    iloc = batch.columns()['Iloc']
+    x, y = iloc.fields['horizontal'], iloc.fields['vertical']
+
+Without NumPy the per-record codecs are used and each field is a list.
+"""
+import collections
+import re
+
+from .api import open_source
+from .ds_store_handler import DsStoreHandler
+from .ds_store import store
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Codes batched by default; their blobs have a fixed size
+BATCH_CODES = ('Iloc', 'dilc', 'fwi0')
+
+# struct format characters to NumPy type codes, sizes as in '>' layouts
+_NUMPY_TYPES = {
+    'B': 'u1', 'b': 'i1', 'H': 'u2', 'h': 'i2', 'I': 'u4', 'i': 'i4', 'Q': 'u8', 'q': 'i8',
+}
+
+# Decoded records of one code. fields maps each layout field to a column,
+# a structured NumPy array or a dict of lists without NumPy. filenames and
+# sources are per record, sources indexing BlobBatch.sources.
+FixedColumns = collections.namedtuple('FixedColumns', 'fields filenames sources')
+
+
+def layout_dtype(codec):
+    """Big-endian NumPy structured dtype equivalent to codec.LAYOUT"""
+    layout = codec.LAYOUT.format
+    types = []
+    for count, char in re.findall(r'(\d*)([a-zA-Z?])', layout.lstrip('<>!=@')):
+        if char == 's':
+            types.append(f'S{count or 1}')
+        else:
+            types.extend([f'>{_NUMPY_TYPES[char]}'] * int(count or 1))
+
+    dtype = numpy.dtype(list(zip(codec.FIELDS, types)))
+    if dtype.itemsize != codec.LAYOUT.size:
+        raise ValueError(f'No NumPy equivalent for layout {layout!r}')
+    return dtype
+
+
+class BlobBatch:
+    """Collects the raw blobs of fixed-layout records from many stores,
+    per code, for decoding into columns in one pass. Blobs shorter than
+    their layout are left out; bytes past it are ignored."""
+    def __init__(self, codes=BATCH_CODES):
+        self.codecs = {}
+        for code in codes:
+            codec = store.codecs.get(code.encode('latin-1'))
+            if codec is None or not issubclass(codec, store.FixedCodec) or codec.TAIL:
+                raise ValueError(f'{code} blobs do not have a fixed layout')
+            self.codecs[code] = codec
+
+        self.sources = []
+        self._blobs = {code: bytearray() for code in self.codecs}
+        self._filenames = {code: [] for code in self.codecs}
+        self._sources = {code: [] for code in self.codecs}
+
+    def add(self, source, name=None):
+        """Collects the blobs of one .DS_Store, a path, bytes-like object or
+        binary file object. Other records are skipped unread.
+
+        Raises:
+            BuddyError, ValueError: The store's headers cannot be read.
+        """
+        entry_filter = store.EntryFilter(include_codes=list(self.codecs))
+        with open_source(source, name) as (file_io, name):
+            self.add_store(DsStoreHandler(file_io, name, sort=False, entry_filter=entry_filter), name)
+
+    def add_store(self, ds_store, name=None):
+        """Collects the blobs of an open DSStore or DsStoreHandler"""
+        index = len(self.sources)
+        self.sources.append(name if name is not None else getattr(ds_store, 'location', None))
+
+        codecs = self.codecs
+        for code, filename, raw in ds_store.fixed_blobs(codecs):
+            size = codecs[code].LAYOUT.size
+            if len(raw) < size:
+                continue
+            self._blobs[code] += raw[:size]
+            self._filenames[code].append(filename)
+            self._sources[code].append(index)
+
+    def columns(self):
+        """Decodes everything collected so far.
+
+        Returns:
+            dict: Code to FixedColumns
+        """
+        return {code: self._decode(code) for code in self.codecs}
+
+    def _decode(self, code):
+        codec = self.codecs[code]
+        blobs = self._blobs[code]
+        filenames = list(self._filenames[code])
+
+        if numpy is not None:
+            fields = numpy.frombuffer(bytes(blobs), dtype=layout_dtype(codec))
+            return FixedColumns(fields, filenames, numpy.array(self._sources[code], dtype=numpy.uint32))
+
+        size = codec.LAYOUT.size
+        values = [codec.decode(blobs[pos:pos + size]).values for pos in range(0, len(blobs), size)]
+        fields = {name: [value[i] for value in values] for i, name in enumerate(codec.FIELDS)}
+        return FixedColumns(fields, filenames, list(self._sources[code]))
@@ -0,0 +1,13 @@
+class ParseContext:
+    """Counters for one parsing run. Every parse_store call or
+    RecordHandler given the same context adds to it, so separate runs in
+    one process, or in separate threads, each keep their own totals."""
+    __slots__ = ('stores', 'records', 'errors')
+
+    def __init__(self):
+        self.stores = 0
+        self.records = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return f'ParseContext(stores={self.stores}, records={self.records}, errors={self.errors})'
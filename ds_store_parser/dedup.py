@@ -0,0 +1,107 @@
+import threading
+
+from .ds_store.cache import LruCache
+from .manifest import Manifest
+from .records import RowCollector
+
+
+class DedupCache(LruCache):
+    """Parse results keyed by a digest of the file contents, so
+    byte-identical .DS_Store copies are only parsed once."""
+    def __init__(self, max_entries=4096):
+        super().__init__(max_entries)
+
+
+class Deduplicator:
+    """Content dedup for one scan, shared by every worker, so each distinct
+    .DS_Store is parsed once however many processes parse.
+
+    tasks() hashes stores as they are handed out, in the pool's task
+    thread or in turn with the parsing when there is no pool, and holds
+    back copies of contents that are parsed or being parsed. The report
+    writer passes each result to finished() and writes the copies it gets
+    back from it and from ready().
+    """
+    def __init__(self, source, opts_check, manifest_path=None, max_entries=4096):
+        self.source = source
+        self.manifest_path = manifest_path
+        self.cache = DedupCache(max_entries)
+        self.collector = RowCollector(opts_check)
+        self._lock = threading.Lock()
+        # Digest of a first copy being parsed -> copies found meanwhile
+        self._waiting = {}
+        # Path of a first copy being parsed -> its digest
+        self._parsing = {}
+        # (found, rows, records parsed) of copies of cached contents
+        self._ready = []
+
+    def tasks(self, ds_stores):
+        """Yields the stores of ds_stores that need parsing: those that are
+        empty, unreadable or unchanged in the manifest as they are, and the
+        first copy of any contents with the data read"""
+        manifest = None
+        if self.manifest_path:
+            # Opened here, since the task thread cannot share the writer's
+            manifest = Manifest(self.manifest_path, self.collector.fields, readonly=True)
+        try:
+            for found in ds_stores:
+                task = self._hash(found, manifest)
+                if task is not None:
+                    yield task
+        finally:
+            if manifest:
+                manifest.close()
+
+    def _hash(self, found, manifest):
+        ds_file, stat_result = found[0], found[1]
+        data = found[2] if len(found) == 3 else None
+        if not (stat_result and stat_result.st_size):
+            return found
+        if manifest and manifest.unchanged(self.source, ds_file, stat_result):
+            return found
+
+        if data is None:
+            try:
+                with open(ds_file, "rb") as file_io:
+                    data = file_io.read()
+            except OSError:
+                # Parsed as usual, which reports the error
+                return found
+
+        digest = self.cache.digest(data)
+        with self._lock:
+            if digest in self._waiting:
+                self._waiting[digest].append((ds_file, stat_result, data))
+                return None
+            cached = self.cache.get(digest)
+            if cached is not None:
+                self._ready.append(((ds_file, stat_result),) + cached)
+                return None
+            self._waiting[digest] = []
+            self._parsing[ds_file] = digest
+        return ds_file, stat_result, data
+
+    def finished(self, ds_file, rows, parsed, complete):
+        """Takes the result of parsing ds_file, complete if it had no
+        errors. Returns None if ds_file was not the first copy of its
+        contents, else the (path, stat result, data) of the copies that
+        waited for it: their rows come from relocate() when complete, else
+        they are to be parsed on their own."""
+        with self._lock:
+            digest = self._parsing.pop(ds_file, None)
+            if digest is None:
+                return None
+            if complete:
+                self.cache.put(digest, (rows, parsed))
+            return self._waiting.pop(digest)
+
+    def ready(self):
+        """Returns and forgets the (found, rows, records parsed) of copies
+        whose contents were already cached when they were found"""
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return ready
+
+    def relocate(self, rows, found):
+        """The rows of a first copy rebuilt for the copy found"""
+        return self.collector.relocate_rows(rows, found[0], self.source, found[1])
@@ -0,0 +1,197 @@
+import fnmatch
+import os
+
+# Directories that are large, common and practically never hold Finder data
+KNOWN_SKIP_DIRS = frozenset({
+    '.git', '.hg', '.svn', 'node_modules', '__pycache__', '.Spotlight-V100',
+    '.fseventsd', '.DocumentRevisions-V100', '.MobileBackups'
+})
+
+
+def is_ds_store_name(name):
+    """Same match as fnmatch(name.lower(), '*.ds_store*') without the regex"""
+    return '.ds_store' in name.lower()
+
+
+def find_ds_stores(source, excludes=(), max_depth=None, one_file_system=False, skip_dirs=()):
+    """Walks source with os.scandir and yields every .DS_Store file found.
+
+    Directories are visited in the same order as os.walk, symlinked
+    directories are not followed and unreadable directories are skipped.
+
+    Args:
+        source: The directory to search.
+        excludes: Glob patterns; matching files and directories are skipped.
+            Patterns are checked against the entry name and its full path.
+        max_depth: Maximum directory depth to descend to, source being 0.
+        one_file_system: Do not cross into directories on other devices.
+        skip_dirs: Directory names that are never descended into.
+
+    Yields:
+        tuple: (path, lstat result or None if the entry could not be stat'ed)
+    """
+    root_dev = None
+    if one_file_system:
+        try:
+            root_dev = os.stat(source).st_dev
+        except OSError:
+            return
+
+    stack = [(source, 0)]
+    while stack:
+        path, depth = stack.pop()
+        listed = list_directory(path, depth, excludes, max_depth, root_dev, skip_dirs)
+        if listed is None:
+            continue
+
+        subdirs, stores = listed
+        yield from stores
+        stack.extend((subdir, depth + 1) for subdir in reversed(subdirs))
+
+
+def list_directory(path, depth, excludes=(), max_depth=None, root_dev=None, skip_dirs=()):
+    """Lists one directory for find_ds_stores.
+
+    Returns:
+        tuple: (subdirectories to descend into, list of (path, lstat result
+            or None) for the .DS_Store files in it), or None if path cannot
+            be listed
+    """
+    def excluded(entry):
+        return any(
+            fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(entry.path, pattern)
+            for pattern in excludes
+        )
+
+    subdirs = []
+    stores = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if (entry.is_symlink() or entry.name in skip_dirs
+                            or (max_depth is not None and depth >= max_depth)
+                            or (excludes and excluded(entry))):
+                        continue
+                    if root_dev is not None:
+                        try:
+                            if entry.stat(follow_symlinks=False).st_dev != root_dev:
+                                continue
+                        except OSError:
+                            continue
+                    subdirs.append(entry.path)
+
+                elif is_ds_store_name(entry.name) and not (excludes and excluded(entry)):
+                    try:
+                        stat_result = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        stat_result = None
+                    stores.append((entry.path, stat_result))
+    except OSError:
+        return None
+
+    return subdirs, stores
+
+
+class Watcher:
+    """Polls a directory tree for new and changed .DS_Store files, for
+    file systems without change notifications.
+
+    The first poll walks the whole tree like find_ds_stores. Later polls
+    lstat every known directory; only directories whose modification time
+    changed, because entries were added, removed or renamed, are listed
+    again, and their .DS_Store files are reported when new or when their
+    size or modification time changed. A .DS_Store rewritten in place
+    leaves its directory alone, so every full_every-th poll also lstats
+    every known .DS_Store (0 never does). Directories are stat'ed before
+    they are listed, so a change made while listing is picked up by the
+    next poll.
+    """
+    def __init__(self, source, excludes=(), max_depth=None, one_file_system=False, skip_dirs=(), full_every=6):
+        self.source = source
+        self.excludes = excludes
+        self.max_depth = max_depth
+        self.skip_dirs = skip_dirs
+        self.full_every = full_every
+        self.root_dev = os.stat(source).st_dev if one_file_system else None
+        self.polls = 0
+        # Directory path: (st_mtime_ns, depth)
+        self.directories = {}
+        # Directory path: {.DS_Store path: (st_size, st_mtime_ns)}
+        self.stores = {}
+
+    def poll(self):
+        """Yields (path, lstat result) for every .DS_Store that is new or
+        changed since the previous poll, or every one on the first poll"""
+        self.polls += 1
+        if not self.directories:
+            stack = [(self.source, 0)]
+        else:
+            stack = []
+            for path, (mtime_ns, depth) in list(self.directories.items()):
+                try:
+                    changed = os.lstat(path).st_mtime_ns != mtime_ns
+                except OSError:
+                    del self.directories[path]
+                    self.stores.pop(path, None)
+                    continue
+                if changed:
+                    stack.append((path, depth))
+
+            if self.full_every and self.polls % self.full_every == 0:
+                yield from self._restat_stores({path for path, _ in stack})
+
+        while stack:
+            path, depth = stack.pop()
+            try:
+                mtime_ns = os.lstat(path).st_mtime_ns
+            except OSError:
+                self.directories.pop(path, None)
+                self.stores.pop(path, None)
+                continue
+
+            listed = list_directory(path, depth, self.excludes, self.max_depth, self.root_dev, self.skip_dirs)
+            if listed is None:
+                self.directories.pop(path, None)
+                self.stores.pop(path, None)
+                continue
+            self.directories[path] = (mtime_ns, depth)
+
+            subdirs, stores = listed
+            # Stores that could not be stat'ed are left out, to be tried
+            # again when the directory next changes
+            known = self.stores.get(path, {})
+            current = {}
+            changed = []
+            for store, stat_result in stores:
+                if stat_result is None:
+                    continue
+                current[store] = (stat_result.st_size, stat_result.st_mtime_ns)
+                if known.get(store) != current[store]:
+                    changed.append((store, stat_result))
+            self.stores[path] = current
+            yield from changed
+
+            stack.extend((subdir, depth + 1) for subdir in reversed(subdirs) if subdir not in self.directories)
+
+    def _restat_stores(self, skip):
+        """Yields the known .DS_Store files whose size or modification time
+        changed, except those in the directories in skip, which are about to
+        be listed again"""
+        for directory, stores in self.stores.items():
+            if directory in skip:
+                continue
+            for path, key in list(stores.items()):
+                try:
+                    stat_result = os.lstat(path)
+                except OSError:
+                    del stores[path]
+                    continue
+                if (stat_result.st_size, stat_result.st_mtime_ns) != key:
+                    stores[path] = (stat_result.st_size, stat_result.st_mtime_ns)
+                    yield path, stat_result
@@ -0,0 +1,220 @@
+"""Lazy reader for Apple bookmarks, the data behind NSURL bookmarks that
+Finder keeps in pBBk/pBB0 records for folder background images.
+
+Only the header and the tables of contents are read when a bookmark is
+opened; items are decoded when first asked for, and only the path, volume
+and date items are ever looked at."""
+import datetime
+import struct
+
+from . import formats
+
+# Item types (high bits) and subtypes
+BMK_TYPE_MASK = 0xffffff00
+BMK_SUBTYPE_MASK = 0x000000ff
+BMK_STRING = 0x0100
+BMK_DATA = 0x0200
+BMK_NUMBER = 0x0300
+BMK_DATE = 0x0400
+BMK_BOOLEAN = 0x0500
+BMK_ARRAY = 0x0600
+BMK_UUID = 0x0800
+BMK_URL = 0x0900
+BMK_NULL = 0x0a00
+
+BMK_URL_ABSOLUTE = 0x0001
+
+# CFNumber subtypes
+_NUMBERS = {
+    1: struct.Struct('<b'), 2: struct.Struct('<h'), 3: struct.Struct('<i'), 4: struct.Struct('<q'),
+    5: struct.Struct('<f'), 6: struct.Struct('<d'), 7: struct.Struct('<b'), 8: struct.Struct('<h'),
+    9: struct.Struct('<i'), 10: struct.Struct('<q'), 11: struct.Struct('<q'), 12: struct.Struct('<f'),
+    13: struct.Struct('<d'),
+}
+_DATE = struct.Struct('>d')
+
+# Keys of the items that are decoded
+kBookmarkPath = 0x1004
+kBookmarkFileCreationDate = 0x1040
+kBookmarkVolumePath = 0x2002
+kBookmarkVolumeURL = 0x2005
+kBookmarkVolumeName = 0x2010
+kBookmarkVolumeCreationDate = 0x2013
+
+TOC_MAGIC = 0xfffffffe
+MAC_EPOCH = datetime.datetime(2001, 1, 1)
+
+# Characters removed from the report text, so it stays on one line
+_CONTROL = str.maketrans('', '', '\r\n\t')
+
+# Arrays of arrays are not followed deeper than this
+_MAX_DEPTH = 4
+
+
+class Bookmark(object):
+    """A bookmark read from bytes.  Properties decode their item on first
+    access and are None when it is missing or malformed."""
+    __slots__ = ('_data', '_base', '_toc', '_items')
+
+    def __init__(self, data, base, toc):
+        self._data = data
+        self._base = base
+        self._toc = toc
+        self._items = {}
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Read the header and tables of contents of `data'.
+
+        Raises:
+            ValueError: `data' is not a well-formed bookmark.
+        """
+        data = bytes(data)
+        if len(data) < formats.BOOKMARK_HEADER.size:
+            raise ValueError('Bookmark too short')
+
+        magic, size, _, base = formats.BOOKMARK_HEADER.unpack_from(data)
+        if magic not in (b'book', b'alis'):
+            raise ValueError(f'Not a bookmark (magic {magic!r})')
+        if size > len(data) or base < formats.BOOKMARK_HEADER.size or base + 4 > size:
+            raise ValueError('Bookmark header out of range')
+        data = data[:size]
+
+        # Keys of later tables do not replace those of the first
+        toc = {}
+        offset = formats.UINT32_LE.unpack_from(data, base)[0]
+        seen = set()
+        while offset and offset not in seen:
+            seen.add(offset)
+            start = base + offset
+            if start + formats.BOOKMARK_TOC.size > size:
+                raise ValueError('Bookmark TOC out of range')
+
+            _, magic, _, next_offset, count = formats.BOOKMARK_TOC.unpack_from(data, start)
+            if magic != TOC_MAGIC:
+                break
+            start += formats.BOOKMARK_TOC.size
+            if start + count * formats.BOOKMARK_TOC_ENTRY.size > size:
+                raise ValueError('Bookmark TOC entries out of range')
+
+            for key, item_offset, _ in formats.BOOKMARK_TOC_ENTRY.iter_unpack(
+                    data[start:start + count * formats.BOOKMARK_TOC_ENTRY.size]):
+                # String keys are never among the items looked at
+                if not key & 0x80000000:
+                    toc.setdefault(key, item_offset)
+            offset = next_offset
+
+        return cls(data, base, toc)
+
+    def get(self, key):
+        """The decoded item for `key', or None"""
+        try:
+            return self._items[key]
+        except KeyError:
+            pass
+
+        offset = self._toc.get(key)
+        try:
+            value = self._item(offset, 0) if offset is not None else None
+        except (ValueError, struct.error, UnicodeDecodeError, OverflowError):
+            value = None
+        self._items[key] = value
+        return value
+
+    def _item(self, offset, depth):
+        data = self._data
+        start = self._base + offset
+        if start + formats.BOOKMARK_ITEM.size > len(data):
+            raise ValueError('Bookmark item out of range')
+        length, typecode = formats.BOOKMARK_ITEM.unpack_from(data, start)
+        start += formats.BOOKMARK_ITEM.size
+        if start + length > len(data):
+            raise ValueError('Bookmark item out of range')
+        payload = data[start:start + length]
+
+        kind = typecode & BMK_TYPE_MASK
+        subtype = typecode & BMK_SUBTYPE_MASK
+        if kind == BMK_STRING:
+            return payload.decode('utf-8')
+        if kind == BMK_DATE:
+            return MAC_EPOCH + datetime.timedelta(seconds=_DATE.unpack(payload)[0])
+        if kind == BMK_ARRAY:
+            if depth >= _MAX_DEPTH:
+                raise ValueError('Bookmark arrays nested too deep')
+            offsets = formats.uint32_le_array(length // 4).unpack(payload[:length // 4 * 4])
+            return [self._item(item, depth + 1) for item in offsets]
+        if kind == BMK_URL:
+            if subtype == BMK_URL_ABSOLUTE:
+                return payload.decode('utf-8')
+            _, relative = formats.BOOKMARK_ITEM.unpack(payload)
+            return self._item(relative, depth + 1)
+        if kind == BMK_NUMBER:
+            number = _NUMBERS.get(subtype)
+            return number.unpack(payload)[0] if number else payload
+        if kind == BMK_BOOLEAN:
+            return bool(subtype)
+        if kind == BMK_NULL:
+            return None
+        return payload
+
+    @property
+    def path_components(self):
+        components = self.get(kBookmarkPath)
+        if not isinstance(components, list) or not all(isinstance(c, str) for c in components):
+            return None
+        return components
+
+    @property
+    def path(self):
+        components = self.path_components
+        return '/' + '/'.join(components) if components is not None else None
+
+    @property
+    def volume_name(self):
+        return self._typed(kBookmarkVolumeName, str)
+
+    @property
+    def volume_path(self):
+        return self._typed(kBookmarkVolumePath, str)
+
+    @property
+    def volume_url(self):
+        return self._typed(kBookmarkVolumeURL, str)
+
+    @property
+    def creation_date(self):
+        return self._typed(kBookmarkFileCreationDate, datetime.datetime)
+
+    @property
+    def volume_creation_date(self):
+        return self._typed(kBookmarkVolumeCreationDate, datetime.datetime)
+
+    def _typed(self, key, kind):
+        value = self.get(key)
+        return value if isinstance(value, kind) else None
+
+    def as_dict(self):
+        return {
+            'path': self.path,
+            'volume_name': self.volume_name,
+            'volume_path': self.volume_path,
+            'volume_url': self.volume_url,
+            'creation_date': self.creation_date,
+            'volume_creation_date': self.volume_creation_date,
+        }
+
+    def __bytes__(self):
+        """The bookmark as it was read, up to the size in its header"""
+        return self._data
+
+    def __str__(self):
+        labels = (
+            ('Path', self.path), ('Volume', self.volume_name), ('VolumePath', self.volume_path),
+            ('VolumeURL', self.volume_url), ('Created', self.creation_date),
+            ('VolumeCreated', self.volume_creation_date),
+        )
+        text = ', '.join(f'{label}: {value}' for label, value in labels if value is not None)
+        return text.translate(_CONTROL) or 'Bookmark: no path'
+
+    def __repr__(self):
+        return f'Bookmark({self.as_dict()!r})'
@@ -1,8 +1,15 @@
 import os
+import io
+import mmap
 import bisect
 import struct
 import binascii
 
+from . import formats
+
+# Files at least this large are memory-mapped; smaller ones are read in one go
+MMAP_THRESHOLD = 1 << 20
+
 class BuddyError(Exception):
     pass
 
@@ -11,7 +18,13 @@ class Block:
         self._allocator = allocator
         self._offset = offset
         self._size = size
-        self._value = bytearray(allocator.read(offset, size))
+        self._value = allocator.view(offset, size)
+        self._zero_copy = isinstance(self._value, memoryview)
+        if self._zero_copy:
+            # Raw reads slice the underlying bytes/mmap directly, which is
+            # cheaper than copying out of a memoryview slice
+            self._data = self._value.obj
+            self._base = offset + 4
         self._pos = 0
         self._dirty = False
         
@@ -27,6 +40,10 @@ class Block:
     def close(self):
         if self._dirty:
             self.flush()
+        # Give up the window so the allocator can release its buffer;
+        # views already read from the block stay valid
+        if self._zero_copy:
+            self._value.release()
 
     def flush(self):
         if self._dirty:
@@ -51,9 +68,14 @@ class Block:
         self._pos = pos
 
     def read(self, size_or_format):
-        if isinstance(size_or_format, str):
-            size = struct.calcsize(size_or_format)
+        """Read a byte count, or unpack a ``struct.Struct`` (or a format
+           string, which is looked up in the shared cache)."""
+        if isinstance(size_or_format, struct.Struct):
             fmt = size_or_format
+            size = fmt.size
+        elif isinstance(size_or_format, str):
+            fmt = formats.get(size_or_format)
+            size = fmt.size
         else:
             size = size_or_format
             fmt = None
@@ -61,26 +83,47 @@ class Block:
         if self._size - self._pos < size:
             raise BuddyError(f'Unable to read {size} bytes in block')
 
-        data = self._value[self._pos:self._pos + size]
+        pos = self._pos
         self._pos += size
-        
+
         if fmt is not None:
-            return struct.unpack(fmt, bytes(data))
-        else:
-            return data
+            return fmt.unpack_from(self._value, pos)
+
+        if self._zero_copy:
+            return self._data[self._base + pos:self._base + pos + size]
+        return self._value[pos:pos + size]
         
+    def read_view(self, size):
+        """Read `size' bytes without copying them where possible.  Returns
+           a read-only memoryview in zero-copy mode and bytes otherwise, so
+           the result is always hashable."""
+        if self._size - self._pos < size:
+            raise BuddyError(f'Unable to read {size} bytes in block')
+
+        pos = self._pos
+        self._pos += size
+
+        if self._zero_copy:
+            return self._value[pos:pos + size]
+        return bytes(self._value[pos:pos + size])
+
     def __str__(self):
         return binascii.b2a_hex(self._value).decode('ascii')
         
 class Allocator:
-    def __init__(self, the_file):
+    def __init__(self, the_file, buffered=False):
         self._file = the_file
         self._dirty = False
+        self._mmap = None
+        self._buffer = None
 
         self._file.seek(0)
+
+        if buffered:
+            self._load_buffer()
         
         # Read the header
-        magic1, magic2, offset, size, offset2, self._unknown1 = self.read(-4, '>I4sIII16s')
+        magic1, magic2, offset, size, offset2, self._unknown1 = self.read(-4, formats.BUDDY_HEADER)
         
         if magic2 != b'Bud1' or magic1 != 1:
             raise BuddyError('Not a buddy file')
@@ -91,34 +134,34 @@ class Allocator:
         self._root = Block(self, offset, size)
 
         # Read the block offsets
-        count, self._unknown2 = self._root.read('>II')
+        count, self._unknown2 = self._root.read(formats.UINT32_PAIR)
         
         self._offsets = []
         c = (count + 255) & ~255
         while c:
-            self._offsets += self._root.read('>256I')
+            self._offsets += self._root.read(formats.OFFSET_PAGE)
             c -= 256
         
         self._offsets = self._offsets[:count]
         
         # Read the TOC
         self._toc = {}
-        count = self._root.read('>I')[0]
+        count = self._root.read(formats.UINT32)[0]
 
         for _ in range(count):
-            nlen = self._root.read('B')[0]
+            nlen = self._root.read(formats.UINT8)[0]
             name = bytes(self._root.read(nlen)).decode('latin-1')
-            value = self._root.read('>I')[0]
+            value = self._root.read(formats.UINT32)[0]
             self._toc[name] = value
         
         # Read the free lists
         self._free = []
         for _ in range(32):
-            count = self._root.read('>I')[0]
-            self._free.append(list(self._root.read(f'>{count}I')))
+            count = self._root.read(formats.UINT32)[0]
+            self._free.append(list(self._root.read(formats.uint32_array(count))))
         
     @classmethod
-    def open(cls, file_or_name, mode='r+'):
+    def open(cls, file_or_name, mode='r+', buffered=False):
         if isinstance(file_or_name, str):
             if 'b' not in mode:
                 mode = mode[:1] + 'b' + mode[1:]
@@ -126,7 +169,23 @@ class Allocator:
         else:
             f = file_or_name
 
-        return Allocator(f)
+        return Allocator(f, buffered)
+
+    def _load_buffer(self):
+        """Load the whole file into a single read-only buffer.  Large files
+           are memory-mapped, everything else (including file objects
+           without a descriptor) is read with a single call."""
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            self._mmap = None
+
+        if self._mmap is not None:
+            self._buffer = memoryview(self._mmap)
+        else:
+            self._buffer = memoryview(self._file.read())
 
     def __enter__(self):
         return self
@@ -135,33 +194,119 @@ class Allocator:
         self.close()
     
     def close(self):
+        """Flush and close the file, unmapping it if it was mapped.  Raises
+           BufferError while views into the map are still held, such as
+           blobs of entries that were never decoded."""
         self.flush()
+        self._root.close()
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
         self._file.close()
-            
+
+    def flush(self):
+        if self._dirty:
+            self._dirty = False
+            self._file.flush()
+
+    def write(self, offset, data):
+        """Write `data' at `offset'.  Buffered allocators are a read-only
+           view of the file and cannot be written to."""
+        if self._buffer is not None:
+            raise BuddyError('Cannot write to a buffered allocator')
+
+        # N.B. There is a fixed offset of four bytes(!)
+        self._file.seek(offset + 4, os.SEEK_SET)
+        self._file.write(data)
+        self._dirty = True
+
     def read(self, offset, size_or_format):
         """Read data at `offset', or raise an exception.  `size_or_format'
            may either be a byte count, in which case we return raw data,
            or a format string for `struct.unpack', in which case we
-           work out the size and unpack the data before returning it."""
-        # N.B. There is a fixed offset of four bytes(!)
-        self._file.seek(offset + 4, os.SEEK_SET)
-
-        if isinstance(size_or_format, str):
-            size = struct.calcsize(size_or_format)
+           work out the size and unpack the data before returning it.
+           A precompiled ``struct.Struct'' is accepted as well."""
+        if isinstance(size_or_format, struct.Struct):
             fmt = size_or_format
+            size = fmt.size
+        elif isinstance(size_or_format, str):
+            fmt = formats.get(size_or_format)
+            size = fmt.size
         else:
             size = size_or_format
             fmt = None
-            
-        ret = self._file.read(size)
+
+        # N.B. There is a fixed offset of four bytes(!)
+        if self._buffer is not None:
+            start = offset + 4
+            if fmt is not None and 0 <= start and start + size <= len(self._buffer):
+                return fmt.unpack_from(self._buffer, start)
+            ret = bytes(self._buffer[max(start, 0):start + size])
+        else:
+            self._file.seek(offset + 4, os.SEEK_SET)
+            ret = self._file.read(size)
+
         if len(ret) < size:
             ret += b'\0' * (size - len(ret))
 
         if fmt is not None:
-            return struct.unpack(fmt, ret)
+            return fmt.unpack(ret)
         
         return ret
 
+    def view(self, offset, size):
+        """Return the contents of the block at `offset'.  In buffered mode
+           this is a zero-copy memoryview window; otherwise (or if the block
+           runs past the end of the file) it is a zero-padded bytearray."""
+        if self._buffer is not None:
+            start = offset + 4
+            if 0 <= start and start + size <= len(self._buffer):
+                return self._buffer[start:start + size]
+        return bytearray(self.read(offset, size))
+
+    def contents(self):
+        """Return the whole file as a read-only buffer, loading it first if
+           the allocator was opened unbuffered.  Buffer offsets are file
+           offsets, i.e. allocator offsets plus four."""
+        if self._buffer is None:
+            self._file.seek(0)
+            self._load_buffer()
+        return self._buffer
+
+    def unallocated_ranges(self):
+        """Yield (start, end) buffer ranges covered by neither the header
+           nor an allocated block; freed blocks are part of these gaps."""
+        end = len(self.contents())
+        blocks = [((addr & ~0x1F) + 4, 1 << (addr & 0x1F)) for addr in self._offsets if addr]
+        blocks.append((self._root._offset + 4, self._root._size))
+        blocks.sort()
+
+        # The header, including the leading magic number
+        pos = formats.BUDDY_HEADER.size
+        for start, size in blocks:
+            if start > pos:
+                yield pos, min(start, end)
+            pos = max(pos, start + size)
+            if pos >= end:
+                return
+
+        if pos < end:
+            yield pos, end
+
+    def free_blocks(self):
+        """Yield (free list, Block) for every block on the buddy free lists
+           that lies within the file.  Free list `n' holds blocks of 2**n
+           bytes."""
+        end = len(self.contents())
+        for width, offsets in enumerate(self._free):
+            size = 1 << width
+            for offset in offsets:
+                if offset + 4 + size <= end:
+                    yield width, Block(self, offset, size)
+
     def get_block(self, block):
         try:
             addr = self._offsets[block]
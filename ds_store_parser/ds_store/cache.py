@@ -0,0 +1,31 @@
+import collections
+import hashlib
+import threading
+
+
+class LruCache(object):
+    """Bounded, thread-safe LRU cache keyed by a digest of the bytes a
+    value was made from, so repeated blobs or files are only decoded once
+    and large ones are not kept as keys."""
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, digest, default=None):
+        """Returns the cached value for digest, or default"""
+        with self._lock:
+            value = self._entries.get(digest, default)
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+            return value
+
+    def put(self, digest, value):
+        with self._lock:
+            self._entries[digest] = value
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,43 @@
+"""Precompiled ``struct.Struct`` objects shared by the buddy allocator and
+the store reader, so that hot read paths never re-parse format strings."""
+import functools
+import struct
+
+UINT8 = struct.Struct('B')
+UINT32 = struct.Struct('>I')
+UINT32_PAIR = struct.Struct('>II')
+UINT64 = struct.Struct('>Q')
+BOOL = struct.Struct('>?')
+FOURCC = struct.Struct('>4s')
+CODE_TYPE = struct.Struct('>4s4s')
+
+# Buddy allocator header and root block
+BUDDY_HEADER = struct.Struct('>I4sIII16s')
+OFFSET_PAGE = struct.Struct('>256I')
+
+# DSDB superblock: root node, levels, records, nodes, page size
+SUPERBLOCK = struct.Struct('>IIIII')
+
+# Bookmarks (little-endian): header, table of contents and its entries,
+# item length and type
+UINT32_LE = struct.Struct('<I')
+BOOKMARK_HEADER = struct.Struct('<4sIII')
+BOOKMARK_TOC = struct.Struct('<IIIII')
+BOOKMARK_TOC_ENTRY = struct.Struct('<III')
+BOOKMARK_ITEM = struct.Struct('<II')
+
+
+@functools.lru_cache(maxsize=256)
+def get(fmt):
+    """Return a cached ``struct.Struct`` for the format string `fmt`."""
+    return struct.Struct(fmt)
+
+
+def uint32_array(count):
+    """Return a cached ``struct.Struct`` for `count` big-endian uint32s."""
+    return get(f'>{count}I')
+
+
+def uint32_le_array(count):
+    """Return a cached ``struct.Struct`` for `count` little-endian uint32s."""
+    return get(f'<{count}I')
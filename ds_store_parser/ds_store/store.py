@@ -4,95 +4,187 @@ import struct
 import re
 import io
 from io import BytesIO
-import hashlib
+import enum
+import os
+import functools
+import plistlib
 
+from . import bookmark
 from . import buddy
+from . import formats
+from .cache import LruCache
 
+# Characters removed from text fields of fixed-layout values, so the
+# formatted value stays on one line
+_CONTROL = str.maketrans('', '', '\r\n\t')
 
-class IlocCodec(object):
-    @staticmethod
-    def decode(bytesData):
-        x, y, z, a = struct.unpack_from(b'>IIII', bytesData[:16])
-        h_str = binascii.hexlify(bytesData).decode()
+# Unset Iloc coordinate
+_NULL = 0xFFFFFFFF
+
+
+def _fourcc(data):
+    text = data.decode(errors="ignore")
+    return text if text.isprintable() else text.translate(_CONTROL)
+
+
+class FixedValue(object):
+    """The fields of a fixed-layout blob, unpacked but not yet formatted.
+    ``str()`` gives the report text, so it is only built by the sink that
+    writes it."""
+    __slots__ = ('codec', 'values')
+
+    def __init__(self, codec, values):
+        self.codec = codec
+        self.values = values
+
+    def as_dict(self):
+        """Field name to unpacked value, in layout order"""
+        return dict(zip(self.codec.FIELDS, self.values))
+
+    def __str__(self):
+        return self.codec.format(*self.values)
+
+    def __repr__(self):
+        return f'{self.codec.__name__[:-5]}({self.as_dict()!r})'
 
-        r_value_hor = x if x != 4294967295 else "Null"
-        r_value_ver = y if y != 4294967295 else "Null"
-        r_value_idx = z if z != 4294967295 else "Null"
+    def __eq__(self, other):
+        if not isinstance(other, FixedValue):
+            return NotImplemented
+        return self.codec is other.codec and self.values == other.values
 
-        return f"Location: ({r_value_hor}, {r_value_ver}), Selected Index: {r_value_idx}, Unknown: {h_str[24:32]}"
+    def __hash__(self):
+        return hash((self.codec, self.values))
 
 
-class IcvoCodec(object):
+class FixedCodec(object):
+    """Decoder for a blob with a fixed layout, declared once as a
+    precompiled struct and the names of the fields it unpacks.  With TAIL,
+    bytes past the layout are kept as a last field.  Blobs too short for
+    the layout are returned as hex."""
+    LAYOUT = None
+    FIELDS = ()
+    TAIL = False
+
+    @classmethod
+    def decode(cls, bytesData):
+        layout = cls.LAYOUT
+        if len(bytesData) < layout.size:
+            return binascii.hexlify(bytesData).decode()
+
+        values = layout.unpack_from(bytesData)
+        if cls.TAIL:
+            values += (bytes(bytesData[layout.size:]),)
+        return FixedValue(cls, values)
+
     @staticmethod
-    def decode(bytesData):
-        h_str = binascii.hexlify(bytesData).decode()
-        i_type = bytes.fromhex(h_str[:8]).decode(errors="ignore")
-        p_size = str(int(h_str[8:12], 16))
-        g_align = bytes.fromhex(h_str[12:20]).decode(errors="ignore")
-        g_align_loc = bytes.fromhex(h_str[20:28]).decode(errors="ignore")
-        unknown = str(h_str[28:])
+    def format(*values):
+        """Report text for the unpacked field values"""
+        raise NotImplementedError
 
-        return f"Type: {i_type}, IconPixelSize: {p_size}, GridAlign: {g_align}, GridAlignTo: {g_align_loc}, Unknown: {unknown}"
 
+class IlocCodec(FixedCodec):
+    LAYOUT = struct.Struct('>IIII')
+    FIELDS = ('horizontal', 'vertical', 'index', 'unknown')
 
-class Fwi0Codec(object):
     @staticmethod
-    def decode(bytesData):
-        w, x, y, z = struct.unpack_from(b'>HHHH', bytesData[:16])
-        h_str = binascii.hexlify(bytesData).decode()
+    def format(horizontal, vertical, index, unknown):
+        horizontal = horizontal if horizontal != _NULL else "Null"
+        vertical = vertical if vertical != _NULL else "Null"
+        index = index if index != _NULL else "Null"
+        return f"Location: ({horizontal}, {vertical}), Selected Index: {index}, Unknown: {unknown:08x}"
+
 
-        h_array = (
-            f'top: {w}',
-            f'left: {x}',
-            f'bottom: {y}',
-            f'right: {z}',
-            f'view_type: {bytes.fromhex(h_str[16:24]).decode(errors="ignore")}',
-            f'Unknown: {h_str[24:32]}'
-        )
+class IcvoCodec(FixedCodec):
+    LAYOUT = struct.Struct('>4sH4s4s')
+    FIELDS = ('type', 'icon_pixel_size', 'grid_align', 'grid_align_to', 'unknown')
+    TAIL = True
+
+    @staticmethod
+    def format(i_type, p_size, g_align, g_align_loc, unknown):
+        return (f"Type: {_fourcc(i_type)}, IconPixelSize: {p_size}, GridAlign: {_fourcc(g_align)}, "
+                f"GridAlignTo: {_fourcc(g_align_loc)}, Unknown: {unknown.hex()}")
 
-        return ", ".join(h_array)
 
+class Fwi0Codec(FixedCodec):
+    LAYOUT = struct.Struct('>HHHH4sI')
+    FIELDS = ('top', 'left', 'bottom', 'right', 'view_type', 'unknown')
 
-class DilcCodec(object):
     @staticmethod
-    def decode(bytesData):
-        u, v, w, x, y, z, a, b = struct.unpack_from(b'>IIIIIIII', bytesData[:32])
-        h_str = binascii.hexlify(bytesData).decode()
+    def format(top, left, bottom, right, view_type, unknown):
+        return (f'top: {top}, left: {left}, bottom: {bottom}, right: {right}, '
+                f'view_type: {_fourcc(view_type)}, Unknown: {unknown:08x}')
+
 
-        h_pos = f"IconPosFromRight: {4294967295 - int(h_str[16:24], 16)}" if int(h_str[16:24], 16) > 65535 else f"IconPosFromLeft: {int(h_str[16:24], 16)}"
-        v_pos = f"IconPosFromBottom: {4294967295 - int(h_str[24:32], 16)}" if int(h_str[24:32], 16) > 65535 else f"IconPosFromTop: {int(h_str[24:32], 16)}"
+class DilcCodec(FixedCodec):
+    LAYOUT = struct.Struct('>IHHIIIIII')
+    FIELDS = (
+        'unknown1', 'grid_quadrant', 'unknown2', 'icon_pos_horizontal', 'icon_pos_vertical',
+        'grid_icon_pos_from_left', 'grid_icon_pos_from_top', 'unknown3', 'unknown4'
+    )
+
+    @staticmethod
+    def format(unk1, quadrant, unk2, h_pos, v_pos, grid_left, grid_top, unk3, unk4):
+        # Positions past 65535 are offsets from the right or bottom edge
+        h_pos = f"IconPosFromRight: {_NULL - h_pos}" if h_pos > 65535 else f"IconPosFromLeft: {h_pos}"
+        v_pos = f"IconPosFromBottom: {_NULL - v_pos}" if v_pos > 65535 else f"IconPosFromTop: {v_pos}"
+        return (f"Unk1: {unk1:08x}, GridQuadrant: {quadrant}, Unk2: {unk2:04x}, {h_pos}, {v_pos}, "
+                f"GridIconPosFromLeft: {grid_left}, GridIconPosFromTop: {grid_top}, "
+                f"Unk3: {unk3:08x}, Unk4: {unk4:08x}")
 
-        h_array = (
-            f"Unk1: {h_str[:8]}",
-            f"GridQuadrant: {int(h_str[8:12], 16)}",
-            f"Unk2: {h_str[12:16]}",
-            h_pos,
-            v_pos,
-            f"GridIconPosFromLeft: {int(h_str[32:40], 16)}",
-            f"GridIconPosFromTop: {int(h_str[40:48], 16)}",
-            f"Unk3: {h_str[48:56]}",
-            f"Unk4: {h_str[56:64]}"
-        )
 
-        return ", ".join(h_array)
+_MISSING = object()
 
 
 class PlistCodec(object):
+    """Binary or XML property list, parsed with plistlib.  Finder writes
+    the same bwsp and lsvp plists in many folders, so parsed values are
+    cached by digest and shared between records: treat them as read-only.
+    Subclasses made by selecting() keep only some top-level keys."""
+    cache = LruCache()
+    KEYS = None
+
+    @classmethod
+    def decode(cls, bytesData):
+        cache = cls.cache
+        digest = cache.digest(bytesData)
+        value = cache.get(digest, _MISSING)
+        if value is _MISSING:
+            try:
+                value = plistlib.loads(bytesData)
+            except Exception as exp:
+                value = f"{exp}: {binascii.hexlify(bytesData).decode()}"
+            cache.put(digest, value)
+
+        if cls.KEYS is not None and isinstance(value, dict):
+            return {key: value[key] for key in cls.KEYS if key in value}
+        return value
+
     @staticmethod
-    def decode(bytesData):
-        try:
-            return biplist.readPlistFromBytes(bytesData)
-        except Exception as exp:
-            return f"{exp}: {binascii.hexlify(bytesData).decode()}"
+    @functools.lru_cache(maxsize=None)
+    def selecting(keys):
+        """A PlistCodec that keeps only the top-level `keys' (a tuple) of
+        dictionaries, sharing the parse cache"""
+        return type('PlistCodec', (PlistCodec,), {'KEYS': tuple(keys)})
 
 
 class BookmarkCodec(object):
-    @staticmethod
-    def decode(bytesData):
-        try:
-            return mac_alias.Bookmark.from_bytes(bytesData)
-        except Exception as exp:
-            return f"{exp}: {binascii.hexlify(bytesData).decode()}"
+    """Bookmark, read lazily by bookmark.Bookmark.  Background image
+    bookmarks repeat across folders, so they are cached by digest and
+    shared between records."""
+    cache = LruCache(256)
+
+    @classmethod
+    def decode(cls, bytesData):
+        cache = cls.cache
+        digest = cache.digest(bytesData)
+        value = cache.get(digest)
+        if value is None:
+            try:
+                value = bookmark.Bookmark.from_bytes(bytesData)
+            except (ValueError, struct.error) as exp:
+                value = f"{exp}: {binascii.hexlify(bytesData).decode()}"
+            cache.put(digest, value)
+        return value
 
 
 codecs = {
@@ -110,6 +202,9 @@ codecs = {
     b'pBB0': BookmarkCodec
 }
 
+# Fixed-layout codecs by class name, for values saved outside the process
+fixed_codecs = {c.__name__: c for c in codecs.values() if issubclass(c, FixedCodec)}
+
 codes = {
     "BKGD": u"Finder Folder Background Picture",
     "ICVO": u"Icon View Options",
@@ -167,48 +262,230 @@ types = (
 )
     
 
+# Known code and type pairs.  Carving searches unused space for these and
+# then looks backwards for the record's name length
+_CARVE_PATTERN = re.compile(
+    b'(?:' + b'|'.join(re.escape(c.encode('latin-1')) for c in codes) + b')'
+    b'(?:' + b'|'.join(t.encode('latin-1') for t in types) + b')'
+)
+
+# Longest record filename looked for in front of a carved code (HFS+ limit)
+_CARVE_MAX_NAME = 255
+
+
+class EntryState(enum.Enum):
+    """Where the first copy of an entry was found"""
+    ALLOCATED = 1
+    UNALLOCATED = 2
+
+
+# Payload sizes of the fixed-width value types, used to skip values
+_FIXED_SIZES = {
+    b'bool': formats.BOOL.size,
+    b'long': formats.UINT32.size,
+    b'shor': formats.UINT32.size,
+    b'type': formats.FOURCC.size,
+    b'comp': formats.UINT64.size,
+    b'dutc': formats.UINT64.size,
+}
+
+
+class EntryFilter(object):
+    """Selects records by code and filename while the B-tree is read.
+    Rejected records have their values skipped by length, unread and
+    undecoded."""
+    def __init__(self, include_codes=None, exclude_codes=None, filename_regex=None, plist_keys=None):
+        self.include_codes = self._code_set(include_codes)
+        self.exclude_codes = self._code_set(exclude_codes) or frozenset()
+        if isinstance(filename_regex, str):
+            filename_regex = re.compile(filename_regex)
+        self.filename_regex = filename_regex
+        # Only these top-level keys are kept from plist records
+        self.plist_keys = tuple(plist_keys) if plist_keys else None
+
+    @staticmethod
+    def _code_set(codes):
+        if not codes:
+            return None
+        return frozenset(c.encode('latin-1') if isinstance(c, str) else bytes(c) for c in codes)
+
+    def accepts_code(self, code):
+        if self.include_codes is not None and code not in self.include_codes:
+            return False
+        return code not in self.exclude_codes
+
+    def accepts_filename(self, filename):
+        return self.filename_regex is None or self.filename_regex.search(filename) is not None
+
+    def codec(self, code):
+        """The codec that decodes blobs of `code', or None"""
+        codec = codecs.get(code)
+        if codec is PlistCodec and self.plist_keys:
+            # Made here rather than kept, so filters can be pickled
+            return PlistCodec.selecting(self.plist_keys)
+        return codec
+
+    def describe(self):
+        """A JSON-friendly summary, for caches whose rows depend on it"""
+        return {
+            'include_codes': sorted(c.decode('latin-1') for c in self.include_codes or ()),
+            'exclude_codes': sorted(c.decode('latin-1') for c in self.exclude_codes),
+            'filename_regex': self.filename_regex.pattern if self.filename_regex else None,
+            'plist_keys': list(self.plist_keys) if self.plist_keys else None,
+        }
+
+
+_UNDECODED = object()
+
+
 class DSStoreEntry(object):
-    def __init__(self, filename, code, typecode, value=None, node=None):
+    """A single record.  Blob values may be given undecoded as `raw`, in
+    which case the codec only runs when ``value`` is first accessed."""
+    __slots__ = ('filename', 'code', 'type', 'node', '_value', '_raw', '_codec')
+
+    def __init__(self, filename, code, typecode, value=None, node=None, raw=None, codec=None):
         if isinstance(filename, bytes):
             filename = filename.decode('utf-8', errors="ignore")
         self.filename = filename
         self.code = code.decode() if isinstance(code, bytes) else code
         self.type = typecode
-        self.value = value
         self.node = node
+        self._raw = raw
+        self._codec = codec
+        self._value = value if raw is None else _UNDECODED
+
+    @property
+    def value(self):
+        if self._value is _UNDECODED:
+            # Keep a copy rather than a view, so decoded entries do not pin
+            # the store's buffer
+            raw = self._raw = bytes(self._raw)
+            self._value = self._codec.decode(raw) if self._codec else raw
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self._raw = None
+
+    @property
+    def raw(self):
+        """The undecoded blob (bytes or a read-only memoryview), or None"""
+        return self._raw
 
     def __repr__(self):
         return repr((self.filename, self.code, self.type, self.value, self.node))
 
     @classmethod
-    def read(cls, block, node):
-        nlen = struct.unpack('>I', block.read(4))[0]
-        filename = block.read(2 * nlen).decode('utf-16be', errors="ignore")
-
-        code, typecode = struct.unpack('>4s4s', block.read(8))
+    def read(cls, block, node, entry_filter=None):
+        """Read the record at the block's position.  Returns None, with the
+        value skipped, if `entry_filter' rejects it."""
+        nlen = block.read(formats.UINT32)[0]
+        filename = block.read(2 * nlen)
+
+        code, typecode = block.read(formats.CODE_TYPE)
+
+        if entry_filter is not None:
+            if not entry_filter.accepts_code(code):
+                cls.skip_value(block, typecode)
+                return None
+            filename = filename.decode('utf-16be', errors="ignore")
+            if not entry_filter.accepts_filename(filename):
+                cls.skip_value(block, typecode)
+                return None
+        else:
+            filename = filename.decode('utf-16be', errors="ignore")
 
         if typecode == b'bool':
-            value = struct.unpack('>?', block.read(1))[0]
+            value = block.read(formats.BOOL)[0]
         elif typecode in [b'long', b'shor']:
-            value = struct.unpack('>I', block.read(4))[0]
+            value = block.read(formats.UINT32)[0]
         elif typecode == b'blob':
-            vlen = struct.unpack('>I', block.read(4))[0]
-            value = block.read(vlen)
-            if code in codecs:
-                value = codecs[code].decode(value)
-                typecode = codecs[code]
+            vlen = block.read(formats.UINT32)[0]
+            codec = entry_filter.codec(code) if entry_filter is not None else codecs.get(code)
+            return DSStoreEntry(filename, code, codec or typecode, node=node,
+                                raw=block.read_view(vlen), codec=codec)
         elif typecode == b'ustr':
-            vlen = struct.unpack('>I', block.read(4))[0]
+            vlen = block.read(formats.UINT32)[0]
             value = block.read(2 * vlen).decode('utf-16be', errors="ignore")
         elif typecode == b'type':
-            value = struct.unpack('>4s', block.read(4))[0].decode(errors="ignore")
+            value = block.read(formats.FOURCC)[0].decode(errors="ignore")
         elif typecode in [b'comp', b'dutc']:
-            value = struct.unpack('>Q', block.read(8))[0]
+            value = block.read(formats.UINT64)[0]
         else:
             raise ValueError(f'Unknown type code "{typecode}"')
 
         return DSStoreEntry(filename, code, typecode, value, node)
 
+    @classmethod
+    def carve(cls, buffer, pos, start, end, entry_filter=None):
+        """Try to parse a record whose code and type sit at `pos' in
+        `buffer', with the whole record inside [start, end).  Returns
+        (entry, end of record), or None if the bytes do not hold one."""
+        name_end = pos
+        for nlen in range(1, min(_CARVE_MAX_NAME, (pos - start - 4) // 2) + 1):
+            if formats.UINT32.unpack_from(buffer, name_end - 2 * nlen - 4)[0] == nlen:
+                break
+        else:
+            return None
+
+        code, typecode = formats.CODE_TYPE.unpack_from(buffer, pos)
+        if entry_filter is not None and not entry_filter.accepts_code(code):
+            return None
+
+        try:
+            filename = bytes(buffer[name_end - 2 * nlen:name_end]).decode('utf-16be')
+        except UnicodeDecodeError:
+            return None
+        if entry_filter is not None and not entry_filter.accepts_filename(filename):
+            return None
+
+        pos += formats.CODE_TYPE.size
+        size = _FIXED_SIZES.get(typecode)
+        if size is not None:
+            if pos + size > end:
+                return None
+            if typecode == b'bool':
+                value = formats.BOOL.unpack_from(buffer, pos)[0]
+            elif typecode == b'type':
+                value = formats.FOURCC.unpack_from(buffer, pos)[0].decode(errors="ignore")
+            elif size == formats.UINT32.size:
+                value = formats.UINT32.unpack_from(buffer, pos)[0]
+            else:
+                value = formats.UINT64.unpack_from(buffer, pos)[0]
+            return DSStoreEntry(filename, code, typecode, value), pos + size
+
+        if pos + formats.UINT32.size > end:
+            return None
+        vlen = formats.UINT32.unpack_from(buffer, pos)[0]
+        pos += formats.UINT32.size
+
+        if typecode == b'blob':
+            if pos + vlen > end:
+                return None
+            codec = entry_filter.codec(code) if entry_filter is not None else codecs.get(code)
+            raw = buffer[pos:pos + vlen]
+            return DSStoreEntry(filename, code, codec or typecode, raw=raw, codec=codec), pos + vlen
+
+        # ustr
+        if pos + 2 * vlen > end:
+            return None
+        value = bytes(buffer[pos:pos + 2 * vlen]).decode('utf-16be', errors="ignore")
+        return DSStoreEntry(filename, code, typecode, value), pos + 2 * vlen
+
+    @staticmethod
+    def skip_value(block, typecode):
+        """Advance past a value of type `typecode' without reading it"""
+        size = _FIXED_SIZES.get(typecode)
+        if size is None:
+            if typecode == b'blob':
+                size = block.read(formats.UINT32)[0]
+            elif typecode == b'ustr':
+                size = 2 * block.read(formats.UINT32)[0]
+            else:
+                raise ValueError(f'Unknown type code "{typecode}"')
+        block.seek(size, os.SEEK_CUR)
+
     def __lt__(self, other):
         return (self.filename.lower(), self.code) < (other.filename.lower(), other.code)
 
@@ -218,135 +495,211 @@ class DSStoreEntry(object):
 class DSStore:
     """Python 3 interface to a ``.DS_Store`` file."""
     
-    def __init__(self, store):
+    def __init__(self, store, entry_filter=None, carve_slack=False, free_blocks=False):
         self._store = store
+        self.entry_filter = entry_filter
+        self.carve_slack = carve_slack
+        self.free_blocks = free_blocks
         self.entries = {}
         self.dict_list = {}
         self._superblk = self._store['DSDB']
         
         with self._get_block(self._superblk) as s:
             self._rootnode, self._levels, self._records, \
-                self._nodes, self._page_size = s.read('>IIIII')
+                self._nodes, self._page_size = s.read(formats.SUPERBLOCK)
         
         self._min_usage = 2 * self._page_size // 3
         self._dirty = False
-        self.src_name = self._store._file.name
+        # File objects such as archive members or BytesIO may have no name
+        self.src_name = getattr(self._store._file, 'name', '<file object>')
     
     @classmethod
-    def open(cls, file_or_name, mode='r+', initial_entries=None):
-        store = buddy.Allocator.open(file_or_name, mode)
-        return DSStore(store)
+    def open(cls, file_or_name, mode='r+', initial_entries=None, buffered=False, entry_filter=None,
+             carve_slack=False, free_blocks=False):
+        store = buddy.Allocator.open(file_or_name, mode, buffered)
+        return DSStore(store, entry_filter, carve_slack, free_blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the underlying file (see buddy.Allocator.close)"""
+        self._store.close()
     
     def _get_block(self, number):
         return self._store.get_block(number)
     
     def _traverse(self, node):
+        """Yield the entries of the tree rooted at `node' in B-tree key
+        order as they are read.  Uses an explicit stack rather than
+        recursion, and never visits a node twice, so deep or cyclic
+        (crafted) trees cannot exhaust the interpreter stack.
+
+        Nodes are read one at a time, but duplicate detection keeps one
+        small key per entry (see _entry_key) and the set of visited node
+        numbers until the traversal ends, so memory grows with the number
+        of entries in the store."""
         if node is None:
             node = self._rootnode
-        
-        with self._get_block(node) as block:
-            next_node, count = block.read('>II')
-            
-            if next_node:
-                for _ in range(count):
-                    ptr = block.read('>I')[0]
-                    yield from self._traverse(ptr)
-                    
-                    e = DSStoreEntry.read(block, node)
-                    e_hash = self._generate_hash(e)
-                    
-                    if e_hash not in self.dict_list:
-                        self.entries[e_hash] = e
-                        self.entries[e_hash].node = f'allocated {node}'
-                        self.dict_list[e_hash] = f'{e_hash} allocated {node}'
-                    elif 'unallocated' in self.dict_list[e_hash]:
-                        self.entries[e_hash] = e
-                        self.entries[e_hash].node = f"{self.dict_list[e_hash].split('unallocated')[1]} reallocated in {node}"
-                        self.dict_list[e_hash] += f', reallocated in {node}'
-                
-                yield from self._traverse(next_node)
-                yield from self.entries.values()
-                self.entries.clear()
-            else:
-                for _ in range(count):
-                    e = DSStoreEntry.read(block, node)
-                    e_hash = self._generate_hash(e)
-                    
-                    if e_hash not in self.dict_list:
-                        self.entries[e_hash] = e
-                        self.entries[e_hash].node = f'allocated {node}'
-                        self.dict_list[e_hash] = f'{e_hash} allocated {node}'
-                    elif 'unallocated' in self.dict_list[e_hash]:
-                        self.entries[e_hash] = e
-                        self.entries[e_hash].node = f"{self.dict_list[e_hash].split('unallocated')[1]} reallocated in {node}"
-                        self.dict_list[e_hash] += f', reallocated in {node}'
-                
-                yield from self.entries.values()
-                self.entries.clear()
-    
+        self.dict_list = {}
+
+        # The stack holds node numbers still to visit and separator entries
+        # still to emit, in reverse key order
+        stack = [node]
+        visited = set()
+        # Unused space after the live records of each node, for carving
+        tails = []
+
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, DSStoreEntry):
+                if self._add_allocated(item, item.node):
+                    yield item
+                continue
+
+            if item in visited:
+                continue
+            visited.add(item)
+
+            with self._get_block(item) as block:
+                next_node, count = block.read(formats.UINT32_PAIR)
+
+                if next_node:
+                    pending = []
+                    for _ in range(count):
+                        pending.append(block.read(formats.UINT32)[0])
+                        e = DSStoreEntry.read(block, item, self.entry_filter)
+                        if e is not None:
+                            pending.append(e)
+                    pending.append(next_node)
+                    stack.extend(reversed(pending))
+                else:
+                    for _ in range(count):
+                        e = DSStoreEntry.read(block, item, self.entry_filter)
+                        if e is not None and self._add_allocated(e, item):
+                            yield e
+
+                if self.carve_slack:
+                    tails.append((block._offset + 4 + block.tell(), block._offset + 4 + len(block)))
+
+        # Whole freed nodes first, so their records keep the free list tag
+        if self.free_blocks:
+            self.read_free_blocks()
+
+        if self.carve_slack:
+            self.carve(tails + list(self._store.unallocated_ranges()))
+
+        # Records recovered from slack or free lists that the tree does not hold
+        yield from self.entries.values()
+        self.entries.clear()
+        self.dict_list = {}
+
     def __iter__(self):
         return self._traverse(self._rootnode)
+
+    def fixed_blobs(self, codes):
+        """Yield (code, filename, raw blob) for the blob records whose code
+        is in `codes', without decoding them"""
+        for e in self:
+            if e.raw is not None and e.code in codes:
+                yield e.code, e.filename, e.raw
     
-    def _generate_hash(self, entry):
-        hash_input = f"{entry.filename}{entry.type}{entry.code}{self.src_name}{entry.value}".encode('utf-8')
-        return hashlib.md5(hash_input).hexdigest()
+    @staticmethod
+    def _entry_key(entry):
+        """Identity of an entry within this store, used to drop duplicates.
+        Blobs are keyed by a digest of their undecoded bytes, so keys never
+        hold views into the store buffer; only unhashable values are
+        stringified."""
+        if entry.raw is not None:
+            value = LruCache.digest(entry.raw)
+        else:
+            value = entry.value
+            try:
+                hash(value)
+            except TypeError:
+                value = str(value)
+        return (entry.filename, entry.code, entry.type, value)
+
+    def _add_allocated(self, e, node):
+        """Tag an entry read from B-tree node `node' and return True if it
+        should be emitted, i.e. it was not seen before.  The whole tree is
+        read before any space is carved or free list recovered, so a
+        recovered copy of the entry can only come later and is dropped."""
+        key = self._entry_key(e)
+        if key in self.dict_list:
+            return False
+
+        e.node = f'allocated {node}'
+        self.dict_list[key] = EntryState.ALLOCATED
+        return True
     
-    def read_slack(self, slack, node):
-        slack = bytes.fromhex(slack)
-        search_exp = '(' + '|'.join(k + t for k in codes.keys() for t in types) + ')'
-        p = re.compile(rb'\x00\x00\x00[\x01-\xff](\x00[\x01-\xff]){1,}' + search_exp.encode())
-        s_offset = p.search(slack)
-        if s_offset:
-            s_offset = s_offset.span()[0]
-        
-        for match in re.finditer(rb'\x00\x00\x00[\x01-\xff](\x00[\x01-\xff]){1,}' + search_exp.encode(), slack):
-            if match.start() == s_offset:
-                prev = s_offset
-                s_offset = None
-            else:
-                e_off = match.start()
-                s_off = prev
-                prev = e_off
-                
-                hex_str = slack[s_off:].hex()
-                block = BytesIO(bytes.fromhex(hex_str))
-                
-                try:
-                    nlen = struct.unpack('>I', block.read(4))[0]
-                    filename = block.read(2 * nlen).decode('utf-16be')
-                    code, typecode = struct.unpack('>4s4s', block.read(8))
-                    
-                    if typecode == b'bool':
-                        value = struct.unpack('>?', block.read(4))[0]
-                    elif typecode in [b'long', b'shor']:
-                        value = struct.unpack('>I', block.read(4))[0]
-                    elif typecode == b'blob':
-                        vlen = struct.unpack('>I', block.read(4))[0]
-                        value = block.read(vlen)
-                        codec = codecs.get(code, None)
-                        if codec:
-                            value = codec.decode(value)
-                            typecode = codec
-                    elif typecode == b'ustr':
-                        vlen = struct.unpack('>I', block.read(4))[0]
-                        value = block.read(2 * vlen).decode('utf-16be')
-                    elif typecode == b'type':
-                        value = struct.unpack('>4s', block.read(4))[0]
-                    elif typecode in [b'comp', b'dutc']:
-                        value = struct.unpack('>Q', block.read(8))[0]
-                    else:
-                        raise ValueError(f'Unknown type code "{typecode}"')
-                except Exception as e:
-                    print(f'File: {self.src_name}. unable to parse entry. Error: {str(e)}')
+    def carve(self, ranges):
+        """Recover records from unused space: the `ranges' are (start, end)
+        offsets into the raw file buffer, such as node tails and the gaps
+        between blocks.  Records not already read from the tree are kept
+        in self.entries, tagged 'unallocated'."""
+        buffer = self._store.contents()
+
+        for start, end in ranges:
+            pos = start
+            while True:
+                match = _CARVE_PATTERN.search(buffer, pos, end)
+                if match is None:
+                    break
+
+                carved = DSStoreEntry.carve(buffer, match.start(), start, end, self.entry_filter)
+                if carved is None:
+                    pos = match.start() + 1
                     continue
-                
-                e = DSStoreEntry(filename, code, typecode, value, 'unallocated')
-                e_hash = self._generate_hash(e)
-                
-                if e_hash not in self.dict_list:
-                    self.entries[e_hash] = e
-                    self.dict_list[e_hash] = f'{e_hash} unallocated'
-                elif 'unallocated' not in self.dict_list[e_hash]:
-                    self.entries[e_hash] = e
-                    self.entries[e_hash].node += f', reallocated in {node}'
-                    self.dict_list[e_hash] = f'{e_hash} reallocated'
+
+                e, pos = carved
+                self._add_unallocated(e)
+
+    def read_free_blocks(self):
+        """Recover the records of freed B-tree nodes.  Every block on the
+        allocator's free lists that still parses as a complete node has
+        its records kept in self.entries, tagged with the free list and
+        offset they were found at."""
+        for width, block in self._store.free_blocks():
+            entries = self._read_node(block)
+            if not entries:
+                continue
+
+            origin = f'free list {width}, offset {block._offset:#x}'
+            for e in entries:
+                self._add_unallocated(e, origin)
+
+    def _read_node(self, block):
+        """Return the records of `block' if it holds a well-formed leaf or
+        internal node, else None"""
+        try:
+            next_node, count = block.read(formats.UINT32_PAIR)
+            # Each record takes at least a name length, a one character
+            # name, a code, a type and a one byte value
+            if not count or count * 15 > len(block):
+                return None
+
+            entries = []
+            for _ in range(count):
+                if next_node:
+                    block.read(formats.UINT32)
+                e = DSStoreEntry.read(block, None, self.entry_filter)
+                if e is not None:
+                    entries.append(e)
+            return entries
+        except (buddy.BuddyError, ValueError):
+            return None
+
+    def _add_unallocated(self, e, origin='unallocated'):
+        """Keep a recovered entry unless the same record was already seen"""
+        key = self._entry_key(e)
+        if key in self.dict_list:
+            return
+
+        e.node = origin
+        self.entries[key] = e
+        self.dict_list[key] = EntryState.UNALLOCATED
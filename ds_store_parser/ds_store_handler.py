@@ -6,23 +6,42 @@ from time import gmtime, strftime
 
 class DsStoreHandler:
     """Wrapper class for handling the DS Store artifact."""
-    def __init__(self, file_io, location):
+    def __init__(self, file_io, location, sort=True, entry_filter=None, carve_slack=False, free_blocks=False):
         self._file_io = file_io
         self.location = location
-        self.ds_store = ds_store.DSStore.open(self._file_io, "rb")
+        self.sort = sort
+        self.ds_store = ds_store.DSStore.open(
+            self._file_io, "rb", buffered=True, entry_filter=entry_filter,
+            carve_slack=carve_slack, free_blocks=free_blocks
+        )
 
     def __iter__(self):
         """Iterate the entries within the store.
 
+        Entries are sorted by filename and code unless sort is False, in
+        which case they are streamed in B-tree key order as they are read.
+
         Yields:
             <DsStoreRecord>: The ds store entry record
         """
-        for ds_store_entry in sorted(self.ds_store):
+        entries = sorted(self.ds_store) if self.sort else self.ds_store
+        for ds_store_entry in entries:
             yield DsStoreRecord(ds_store_entry)
 
+    def fixed_blobs(self, codes):
+        """Undecoded blobs of the records with the given codes, in B-tree
+        order, for batch decoding (see batch.BlobBatch).
+
+        Yields:
+            tuple: (code, filename, raw blob)
+        """
+        return self.ds_store.fixed_blobs(codes)
+
 
 class DsStoreRecord:
     """A wrapper class for the DSStoreEntry."""
+    __slots__ = ('ds_store_entry',)
+
     def __init__(self, ds_store_entry):
         self.ds_store_entry = ds_store_entry
 
@@ -32,31 +51,52 @@ class DsStoreRecord:
         Returns:
             tuple: (dictionary representation of DSStoreEntry, node value)
         """
+        filename, code, entry_type, value, node = self.as_tuple()
         record_dict = {
-            "filename": self.ds_store_entry.filename,
-            "type": self.ds_store_entry.type.__name__ if hasattr(self.ds_store_entry.type, "__name__") else self.ds_store_entry.type,
-            "code": self.ds_store_entry.code,
-            "value": self.ds_store_entry.value
+            "filename": filename,
+            "type": entry_type,
+            "code": code,
+            "value": value
         }
+        return record_dict, node
+
+    def as_tuple(self):
+        """Decode the internal DSStoreEntry without building a dictionary.
+
+        Returns:
+            tuple: (filename, code, type, value, node value)
+        """
+        entry = self.ds_store_entry
+        entry_type = entry.type.__name__ if hasattr(entry.type, "__name__") else entry.type
+        if isinstance(entry_type, bytes):
+            entry_type = entry_type.decode("utf-8", errors="ignore")
+
+        code = entry.code
+        value = entry.value
 
         # If type is "blob" and code is "modD" (Modified Date)
-        if record_dict["type"] == "blob" and record_dict["code"].lower() == "modd":
-            record_dict["value"] = binascii.hexlify(record_dict["value"]).decode("utf-8")
+        if entry_type == "blob" and code.lower() == "modd":
+            value = binascii.hexlify(value).decode("utf-8")
 
-            a = record_dict["value"][:16]
+            a = value[:16]
             a = a[14:16] + a[12:14] + a[10:12] + a[8:10] + a[6:8] + a[4:6] + a[2:4] + a[:2]
 
             # Convert hex to float
-            timestamp = struct.unpack(">d", bytes.fromhex(a))[0]
-            parsed_dt = datetime.datetime.utcfromtimestamp(timestamp + 978307200)
-            record_dict["value"] = parsed_dt
+            try:
+                timestamp = struct.unpack(">d", bytes.fromhex(a))[0]
+                value = datetime.datetime.utcfromtimestamp(timestamp + 978307200)
+            except (struct.error, ValueError, OverflowError, OSError):
+                # Not a valid timestamp, keep the hex
+                pass
 
-        elif record_dict["type"] == "blob":
-            record_dict["value"] = binascii.hexlify(record_dict["value"]).decode("utf-8")
+        elif entry_type == "blob":
+            value = binascii.hexlify(value).decode("utf-8")
 
-        elif record_dict["type"] == "dutc":
+        elif entry_type == "dutc":
             epoch_dt = datetime.datetime(1904, 1, 1)
-            parsed_dt = epoch_dt + datetime.timedelta(seconds=int(self.ds_store_entry.value) / 65536)
-            record_dict["value"] = parsed_dt
+            try:
+                value = epoch_dt + datetime.timedelta(seconds=int(value) / 65536)
+            except OverflowError:
+                pass
 
-        return record_dict, self.ds_store_entry.node
+        return entry.filename, code, entry_type, value, entry.node
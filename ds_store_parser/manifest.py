@@ -0,0 +1,135 @@
+import datetime
+import json
+import sqlite3
+
+from .ds_store import bookmark
+from .ds_store import store
+
+# Version of the decoded values kept in saved rows. Bump it whenever a
+# codec's output or its JSON encoding changes, so older manifests are
+# cleared rather than serving stale rows.
+FORMAT_VERSION = 2
+
+
+def _encode(value):
+    # Keep timestamps, plist data, fixed-layout values and bookmarks typed
+    # so reused rows match freshly parsed ones
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': value.hex()}
+    if isinstance(value, store.FixedValue):
+        return {'__fixed__': value.codec.__name__, 'values': list(value.values)}
+    if isinstance(value, bookmark.Bookmark):
+        return {'__bookmark__': bytes(value).hex()}
+    return str(value)
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if '__bytes__' in obj:
+        return bytes.fromhex(obj['__bytes__'])
+    if '__fixed__' in obj:
+        return store.FixedValue(store.fixed_codecs[obj['__fixed__']], tuple(obj['values']))
+    if '__bookmark__' in obj:
+        return store.BookmarkCodec.decode(bytes.fromhex(obj['__bookmark__']))
+    return obj
+
+
+class Manifest:
+    """Persistent record of already parsed .DS_Store files.
+
+    Rows are keyed by scan source and path and are only reused while the
+    file's inode, size and modification time are unchanged, so an
+    incremental rescan can emit them without opening the file again.
+    """
+    COMMIT_INTERVAL = 500
+
+    def __init__(self, path, fields, settings=None, readonly=False):
+        self.path = path
+        self.fields = list(fields)
+        self._pending = 0
+
+        if readonly:
+            self._conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            return
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stores ('
+            'source TEXT, path TEXT, inode INTEGER, size INTEGER, mtime_ns INTEGER, '
+            'parsed INTEGER, rows TEXT, PRIMARY KEY (source, path))'
+        )
+
+        # Rows are stored positionally and depend on the record filter and
+        # the decoders, so a different report layout, filter or format
+        # version invalidates everything
+        layout = json.dumps(
+            {'version': FORMAT_VERSION, 'fields': self.fields, 'settings': settings}, sort_keys=True
+        )
+        stored = self._conn.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if stored is None or stored[0] != layout:
+            self._conn.execute('DELETE FROM stores')
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('layout', ?)", (layout,))
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _select(self, columns, source, ds_file, stat_result):
+        return self._conn.execute(
+            f'SELECT {columns} FROM stores WHERE source = ? AND path = ? '
+            'AND inode = ? AND size = ? AND mtime_ns = ?',
+            (source, ds_file, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+        ).fetchone()
+
+    def unchanged(self, source, ds_file, stat_result):
+        """True if the file's rows are saved and it has not changed since"""
+        return stat_result is not None and self._select('1', source, ds_file, stat_result) is not None
+
+    def lookup(self, source, ds_file, stat_result):
+        """Returns (rows, records parsed) for an unchanged file, else None"""
+        if stat_result is None:
+            return None
+
+        found = self._select('parsed, rows', source, ds_file, stat_result)
+
+        if found is None:
+            return None
+
+        parsed, rows = found
+        return [(tuple(row), check_code) for row, check_code in json.loads(rows, object_hook=_decode)], parsed
+
+    def store(self, source, ds_file, stat_result, rows, parsed):
+        """Saves the finished rows of a freshly parsed file"""
+        if stat_result is None:
+            return
+
+        self._conn.execute(
+            'INSERT OR REPLACE INTO stores VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                source, ds_file, stat_result.st_ino, stat_result.st_size,
+                stat_result.st_mtime_ns, parsed, json.dumps(rows, default=_encode)
+            )
+        )
+
+        self._pending += 1
+        if self._pending >= self.COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self._conn.close()
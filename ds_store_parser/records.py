@@ -0,0 +1,356 @@
+import datetime
+import logging
+import os
+
+from . import sinks
+from .context import ParseContext
+from .ds_store.store import codes as type_codes
+
+logger = logging.getLogger(__name__)
+
+# Characters removed from report fields so every record stays on one line
+SANITIZE = str.maketrans('', '', '\r\n\t')
+
+def sanitize(text):
+    """Strips carriage returns, newlines and tabs from text. Printable
+    strings, by far the common case, cannot contain them."""
+    return text if text.isprintable() else text.translate(SANITIZE)
+
+
+class RecordHandler:
+    def __init__(self, opts_check, write_reports=True, sink_factory=None, stats=None, context=None):
+        """Rows go to the sink returned by sink_factory(header), such as a
+        sinks.Sink subclass. Records written are counted in context (a
+        ParseContext, one is created if not given) and time spent is charged
+        to stats (a Stats) if given."""
+        if opts_check:
+            fields = [
+                "generated_path",
+                "record_filename",  # filename
+                "record_type",      # code
+                "record_format",    # type
+                "record_data",      # value
+                "file_exists",
+                "src_create_time",
+                "src_mod_time",
+                "src_acc_time",
+                "src_metadata_change_time",
+                "src_permissions",
+                "src_size",
+                "block",
+                "src_file"
+            ]
+        else:
+            fields = [
+                "generated_path",
+                "record_filename",  # filename
+                "record_type",      # code
+                "record_format",    # type
+                "record_data",      # value
+                "src_create_time",
+                "src_mod_time",
+                "src_acc_time",
+                "src_metadata_change_time",
+                "src_permissions",
+                "src_size",
+                "block",
+                "src_file"
+            ]
+
+        # Codes that do not always mean a folder was opened
+        self.other_info_codes = {
+            "Iloc", "dilc", "cmmt", "clip", "extn", "logS", "lg1S",
+            "modD", "moDD", "phyS", "ph1S", "ptbL", "ptbN"
+        }
+
+        # Codes indicating folder interactions
+        self.folder_interactions = {
+            "dscl", "fdsc", "vSrn", "BKGD", "ICVO", "LSVO", "bwsp",
+            "fwi0", "fwsw", "fwvh", "glvp", "GRP0", "icgo", "icsp",
+            "icvo", "icvp", "icvt", "info", "lssp", "lsvC", "lsvo",
+            "lsvt", "lsvp", "lsvP", "pict", "bRsV", "pBBk", "pBB0",
+            "vstl"
+        }
+
+        # Field names used for finished rows, in report column order
+        self.fields = fields[:1] + ["filename", "code", "type", "value"] + fields[5:]
+        self.opts_check = opts_check
+        self.stats = stats
+        self.context = context if context is not None else ParseContext()
+        self._shared = None
+        self._directory = None
+        self._listing = None
+        self._exact_case = False
+        self._exists = {}
+
+        if write_reports and sink_factory is None:
+            raise ValueError("write_reports needs a sink_factory")
+        self.sink = sink_factory(fields) if write_reports else None
+
+    def file_context(self, ds_file, source, stat_dict):
+        """Columns shared by every record of ds_file, computed once per file.
+
+        Returns:
+            tuple: (path prefix, stat column values, src_file)
+        """
+        cached = self._shared
+        if cached is not None and cached[0] == ds_file and cached[1] == source and cached[2] is stat_dict:
+            return cached[3]
+
+        columns = self.stat_columns(stat_dict)
+        values = (
+            columns["src_create_time"],
+            columns["src_mod_time"],
+            columns["src_acc_time"],
+            columns["src_metadata_change_time"],
+            columns["src_permissions"],
+            columns["src_size"],
+        )
+        is_file = os.path.isfile(source)
+        src_file = f'{source}, {ds_file}' if is_file else ds_file
+        shared = (self.path_prefix(source, ds_file, is_file), values, src_file)
+
+        self._shared = (ds_file, source, stat_dict, shared)
+        return shared
+
+    def write_record(self, record, ds_file, source, stat_dict, opts_check):
+        prefix, stat_values, src_file = self.file_context(ds_file, source, stat_dict)
+
+        if isinstance(record, dict):
+            generated_path = sanitize(f'EMPTY DS_STORE: {ds_file}')
+            filename, code, record_type, value, block = record["filename"], record["code"], record["type"], record["value"], ""
+            file_exists = record.get("file_exists")
+        else:
+            stats = self.stats
+            if stats:
+                stats.switch("decode")
+            filename, code, record_type, value, block = record.as_tuple()
+            if stats:
+                stats.switch("write")
+            generated_path = self.join_path(prefix, filename)
+            file_exists = None
+
+            if opts_check:
+                file_exists = self.file_exists(ds_file, filename)
+
+            if code == "vstl":
+                value = self.style_handler(value)
+
+            self.context.records += 1
+
+        # Keep reports one record per line
+        if value.__class__ is str:
+            value = sanitize(value)
+        filename = sanitize(filename)
+
+        if "Codec" in record_type:
+            record_type = f'blob ({record_type})'
+
+        described = f"{code} ({self.update_descriptor(code)})"
+
+        if self.opts_check:
+            row = (generated_path, filename, described, record_type, value, file_exists) + stat_values + (block, src_file)
+        else:
+            row = (generated_path, filename, described, record_type, value) + stat_values + (block, src_file)
+
+        self.write_row(row, code)
+
+    def file_exists(self, ds_file, filename):
+        """Existence and stat column for a record's file. The .DS_Store's
+        directory is listed once with os.scandir and kept until a store in
+        another directory is parsed, so lookups are dictionary hits and each
+        file is stat'ed at most once. Names not listed are lstat'ed unless the
+        directory's file system is known to tell names apart by case."""
+        directory = os.path.split(ds_file)[0]
+        if directory != self._directory:
+            self._directory = directory
+            self._listing = self.scan_directory(directory)
+            self._exists = {}
+            # A name missing from the listing only means a missing file where
+            # names must match case, which depends on the scanned file system
+            self._exact_case = self._listing is not None and self.case_sensitive(
+                directory, os.path.split(ds_file)[1], self._listing
+            )
+
+        file_exists = self._exists.get(filename)
+        if file_exists is not None:
+            return file_exists
+
+        entry = self._listing.get(filename) if self._listing is not None else None
+        if entry is not None:
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except OSError:
+                stat_result = None
+        elif self._exact_case and os.sep not in filename and filename not in (".", ".."):
+            stat_result = None
+        else:
+            # Not a plain directory entry, or the name may match another case
+            abs_path_to_rec_file = os.path.join(directory, filename)
+            stat_result = os.lstat(abs_path_to_rec_file) if os.path.lexists(abs_path_to_rec_file) else None
+
+        if stat_result is None:
+            file_exists = "[NOT EXISTS]"
+        else:
+            file_exists = "[EXISTS] NONE"
+            stat_dict = self.get_stats(stat_result)
+            if stat_dict:
+                file_exists = str(stat_dict)
+
+        self._exists[filename] = file_exists
+        return file_exists
+
+    @staticmethod
+    def case_sensitive(directory, name, listing):
+        """True if the file system of directory, listed in listing, tells
+        names apart by case: name, an entry of directory, cannot be found
+        with its case swapped unless that is an entry of its own"""
+        swapped = name.swapcase()
+        if swapped == name or name not in listing:
+            return False
+        return swapped in listing or not os.path.lexists(os.path.join(directory, swapped))
+
+    @staticmethod
+    def scan_directory(directory):
+        """Maps names in directory to their os.DirEntry, or None if it
+        cannot be listed"""
+        try:
+            with os.scandir(directory or ".") as entries:
+                return {entry.name: entry for entry in entries}
+        except OSError:
+            return None
+
+    def write_row(self, row, check_code):
+        """Classifies a finished row (a tuple in self.fields order) as
+        folder access or miscellaneous by its code and hands it to the sink"""
+        if check_code in self.other_info_codes:
+            category = sinks.MISC
+        elif check_code in self.folder_interactions:
+            category = sinks.FOLDER_ACCESS
+        else:
+            category = None
+            logger.warning(f'Code not accounted for: {row[2]}')
+
+        self.sink.write(row, check_code, category)
+
+    def flush(self):
+        if self.sink:
+            self.sink.flush()
+
+    def close(self):
+        if self.sink:
+            self.sink.close()
+
+    def stat_columns(self, stat_dict):
+        """Report columns describing the source .DS_Store file, blank if
+        it was parsed from memory without a stat result"""
+        permissions = ""
+        if stat_dict["src_perms"]:
+            permissions = f'{stat_dict["src_perms"]}, User: {stat_dict["src_uid"]}, Group: {stat_dict["src_gid"]}'
+        return {
+            "src_metadata_change_time": stat_dict["src_metadata_change_time"],
+            "src_acc_time": stat_dict["src_acc_time"],
+            "src_mod_time": stat_dict["src_mod_time"],
+            "src_create_time": stat_dict["src_birth_time"],
+            "src_size": stat_dict["src_size"],
+            "src_permissions": permissions
+        }
+
+    def get_stats(self, stat_result):
+        stat_dict = {
+            "src_acc_time": self.convert_time(stat_result.st_atime) + " [UTC]",
+            "src_mod_time": self.convert_time(stat_result.st_mtime) + " [UTC]",
+            "src_perms": self.perm_to_text(stat_result.st_mode),
+            "src_size": stat_result.st_size,
+            "src_uid": stat_result.st_uid,
+            "src_gid": stat_result.st_gid,
+        }
+
+        if hasattr(stat_result, "st_birthtime"):
+            stat_dict["src_birth_time"] = self.convert_time(stat_result.st_birthtime) + " [UTC]"
+        else:
+            stat_dict["src_birth_time"] = self.convert_time(stat_result.st_ctime) + " [UTC]"
+
+        stat_dict["src_metadata_change_time"] = self.convert_time(stat_result.st_ctime) + " [UTC]"
+        return stat_dict
+
+    def convert_time(self, timestamp):
+        return str(datetime.datetime.fromtimestamp(timestamp, datetime.UTC))
+
+
+    def perm_to_text(self, perm):
+        """Converts permission mode to human-readable format."""
+        perms = {
+            "0": "---", "1": "--x", "2": "-w-", "3": "-wx",
+            "4": "r--", "5": "r-x", "6": "rw-", "7": "rwx"
+        }
+        perm_oct = oct(int(perm))[-3:]
+        return "Perms: {}/-{}".format(perm, "".join(perms.get(p, p) for p in perm_oct))
+
+    def path_prefix(self, source, ds_file, source_is_file=None):
+        """Directory of ds_file as reported in generated paths"""
+        if source_is_file is None:
+            source_is_file = os.path.isfile(source)
+        ds_dir = os.path.split(ds_file)[0]
+        return ds_dir if source_is_file else ds_dir[len(os.path.split(source)[0]):]
+
+    def join_path(self, prefix, record_filename):
+        generated_path = sanitize(os.path.join(prefix, record_filename))
+
+        if os.name == "nt":
+            generated_path = generated_path.replace("\\", "/")
+
+        return f"/{generated_path}" if not generated_path.startswith("/") else generated_path
+
+    def generate_fullpath(self, source, ds_file, record_filename):
+        return self.join_path(self.path_prefix(source, ds_file), record_filename)
+
+    def update_descriptor(self, code):
+        return type_codes.get(code, f"Unknown Code: {code}")
+
+    def style_handler(self, value):
+        styles_dict = {
+            '\x00\x00\x00\x00': "0x00000000: Null",
+            "none": "none: Unselected", "icnv": "icnv: Icon View",
+            "clmv": "clmv: Column View", "Nlsv": "Nlsv: List View",
+            "glyv": "glyv: Gallery View", "Flwv": "Flwv: CoverFlow View"
+        }
+        return styles_dict.get(value, f"Unknown Code: {value}")
+
+class RowCollector(RecordHandler):
+    """RecordHandler that keeps finished rows as tuples instead of writing
+    them, used by worker processes to hand rows to the report writer"""
+    def __init__(self, opts_check):
+        super().__init__(opts_check, write_reports=False)
+        self.rows = []
+
+    def write_row(self, row, check_code):
+        self.rows.append((row, check_code))
+
+    def relocate_rows(self, rows, ds_file, source, stat_result):
+        """Rebuilds the path, source file and, when checking, file exists
+        columns of previously built rows for ds_file, so they can be reused
+        for an unchanged or byte-identical store"""
+        columns = self.stat_columns(self.get_stats(stat_result))
+        columns["src_file"] = f'{source}, {ds_file}' if os.path.isfile(source) else ds_file
+        updates = [(self.fields.index(field), value) for field, value in columns.items()]
+        prefix = self.path_prefix(source, ds_file)
+
+        path_index = self.fields.index("generated_path")
+        filename_index = self.fields.index("filename")
+        exists_index = self.fields.index("file_exists") if self.opts_check else None
+
+        relocated = []
+        for row, check_code in rows:
+            row = list(row)
+            for index, value in updates:
+                row[index] = value
+            if not check_code:
+                # The placeholder row of an empty store has no record
+                row[path_index] = sanitize(f'EMPTY DS_STORE: {ds_file}')
+            else:
+                row[path_index] = self.join_path(prefix, row[filename_index])
+                if exists_index is not None:
+                    row[exists_index] = self.file_exists(ds_file, row[filename_index])
+            relocated.append((tuple(row), check_code))
+        return relocated
@@ -0,0 +1,182 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import sqlite3
+
+from .ds_store.bookmark import Bookmark
+from .ds_store.store import FixedValue
+
+# Record categories, decided by RecordHandler from the record code
+FOLDER_ACCESS = "folder_access"
+MISC = "misc"
+
+SQLITE_MAX_INT = (1 << 63) - 1
+
+
+class Sink:
+    """Destination for finished report rows. RecordHandler calls the sink
+    factory it is given with the report header, so a subclass can be the
+    factory itself, or be wrapped in functools.partial to bind its other
+    arguments."""
+    def __init__(self, header):
+        self.header = list(header)
+
+    def write(self, row, code, category):
+        """Store one row, a tuple in header order. code is the record's four
+        character code and category is FOLDER_ACCESS, MISC or None."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write out buffered rows, so the report is complete so far"""
+        pass
+
+    def close(self):
+        pass
+
+
+class ListSink(Sink):
+    """Keeps every row in memory as (row, code, category)"""
+    def __init__(self, header):
+        super().__init__(header)
+        self.rows = []
+
+    def write(self, row, code, category):
+        self.rows.append((row, code, category))
+
+
+class TsvSink(Sink):
+    """Writes the three tab separated reports. Every row goes to the all
+    records report, and to the folder access or miscellaneous report
+    according to its category. Rows are buffered and written in batches."""
+    BATCH_SIZE = 1000
+
+    def __init__(self, header, all_records, folder_access, other_info):
+        super().__init__(header)
+        self._files = (all_records, folder_access, other_info)
+        self._writers = tuple(self._writer(report, header) for report in self._files)
+        self._all, self._folder_access, self._misc = self._batches = ([], [], [])
+
+    @staticmethod
+    def _writer(report, header):
+        writer = csv.writer(report, delimiter="\t", lineterminator="\n")
+        writer.writerow(header)
+        return writer
+
+    def write(self, row, code, category):
+        self._all.append(row)
+
+        if category == MISC:
+            self._misc.append(row)
+        elif category == FOLDER_ACCESS:
+            self._folder_access.append(row)
+
+        if len(self._all) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        for writer, batch in zip(self._writers, self._batches):
+            if batch:
+                writer.writerows(batch)
+                batch.clear()
+        for report in self._files:
+            report.flush()
+
+    def close(self):
+        self.flush()
+        for report in self._files:
+            report.close()
+
+
+class SqliteSink(Sink):
+    """Writes all records to a single SQLite table, with the folder access
+    or miscellaneous classification as a column. Rows are inserted in
+    batched transactions and the query indexes are built after the load."""
+    BATCH_SIZE = 5000
+
+    def __init__(self, path, header):
+        super().__init__(header)
+        self.path = path
+        columns = ["code"] + list(header) + ["category"]
+
+        self._conn = sqlite3.connect(path)
+        # A fresh report file: trade durability for bulk load speed
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        # Untyped columns keep integers as integers and text as text
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS records ({", ".join(columns)})')
+        self._insert = f'INSERT INTO records VALUES ({", ".join("?" * len(columns))})'
+        self._batch = []
+
+    @staticmethod
+    def _value(value):
+        if value is None or isinstance(value, (str, float)):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool) and -SQLITE_MAX_INT <= value <= SQLITE_MAX_INT:
+            return value
+        return str(value)
+
+    def write(self, row, code, category):
+        self._batch.append((code,) + tuple(map(self._value, row)) + (category,))
+        if len(self._batch) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            with self._conn:
+                self._conn.executemany(self._insert, self._batch)
+            self._batch = []
+
+    def close(self):
+        self.flush()
+        with self._conn:
+            for column in ("generated_path", "code", "src_file"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_records_{column} ON records ({column})")
+        self._conn.close()
+
+
+class JsonlSink(Sink):
+    """Writes one JSON object per record. Values keep their native types:
+    integers stay integers, timestamps are ISO 8601 strings and fixed-layout
+    blobs and bookmarks are objects of their fields. Output is
+    optionally gzip compressed and always goes through a large buffer."""
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, path, header, compress=False):
+        super().__init__(header)
+        self.path = path
+        self._keys = list(header)
+
+        if compress:
+            raw = io.BufferedWriter(gzip.GzipFile(path, "wb", compresslevel=6), self.BUFFER_SIZE)
+            self._file = io.TextIOWrapper(raw, encoding="utf-8", newline="\n")
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="\n", buffering=self.BUFFER_SIZE)
+
+        self._encoder = json.JSONEncoder(ensure_ascii=False, default=self._default)
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        # Fixed-layout blobs and bookmarks keep their fields rather than the
+        # report text
+        if isinstance(value, (FixedValue, Bookmark)):
+            return value.as_dict()
+        return str(value)
+
+    def write(self, row, code, category):
+        record = {"code": code}
+        record.update(zip(self._keys, row))
+        record["category"] = category
+        self._file.write(self._encoder.encode(record))
+        self._file.write("\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,150 @@
+import collections
+import heapq
+import sys
+import threading
+import time
+
+# Phases in report order
+PHASES = (
+    ("discovery", "Finding .DS_Store files"),
+    ("open", "Opening and stat'ing files"),
+    ("header", "Buddy allocator and DSDB headers"),
+    ("traversal", "B-tree traversal"),
+    ("decode", "Codec and value decoding"),
+    ("write", "Report rows and output"),
+    ("other", "Everything else, e.g. waiting on workers"),
+)
+
+# Upper bounds of the per-file latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Stats:
+    """Wall time per scan phase, per-file latencies and the slowest stores.
+
+    Time is charged to the current phase until switch() names another one,
+    so interleaved phases, such as a B-tree generator feeding the report
+    writer, are each charged only their own time. Each switch costs one
+    perf_counter call.
+    """
+    def __init__(self, top=10):
+        self.top = top
+        self.phases = collections.Counter()
+        self.histogram = collections.Counter()
+        self.files = 0
+        self.slowest = []
+        self._lock = threading.Lock()
+        self.started = self._mark = time.perf_counter()
+        self._phase = "other"
+
+    def switch(self, phase):
+        """Charge the time since the last switch to the current phase and
+        make phase current. Returns the previous phase."""
+        now = time.perf_counter()
+        self.phases[self._phase] += now - self._mark
+        self._mark = now
+        previous, self._phase = self._phase, phase
+        return previous
+
+    def resume(self):
+        """Restart the clock without charging the time since the last
+        switch to any phase, e.g. a worker's idle time between tasks"""
+        self._mark = time.perf_counter()
+
+    def timed(self, iterable, phase):
+        """Iterate iterable, charging the time spent producing each item
+        to phase"""
+        iterator = iter(iterable)
+        while True:
+            previous = self.switch(phase)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.switch(previous)
+            yield item
+
+    def counted(self, iterable, phase):
+        """Like timed, for an iterable consumed by another thread, such as
+        a multiprocessing pool's task feeder. The time is added to phase
+        without touching the current phase."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                with self._lock:
+                    self.phases[phase] += time.perf_counter() - start
+            yield item
+
+    def add_file(self, path, seconds):
+        """Record the total parse time of one store"""
+        self.files += 1
+        milliseconds = seconds * 1000
+        for bound in LATENCY_BUCKETS:
+            if milliseconds < bound:
+                self.histogram[bound] += 1
+                break
+        else:
+            self.histogram[None] += 1
+
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, (seconds, path))
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, path))
+
+    def drain(self):
+        """Return and reset everything recorded so far, for a worker
+        process to hand to the report writer's Stats.merge"""
+        self.switch(self._phase)
+        drained = (dict(self.phases), dict(self.histogram), self.files, self.slowest)
+        self.phases = collections.Counter()
+        self.histogram = collections.Counter()
+        self.files = 0
+        self.slowest = []
+        return drained
+
+    def merge(self, drained):
+        phases, histogram, files, slowest = drained
+        with self._lock:
+            self.phases.update(phases)
+            self.histogram.update(histogram)
+            self.files += files
+            for item in slowest:
+                if len(self.slowest) < self.top:
+                    heapq.heappush(self.slowest, item)
+                elif item[0] > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, item)
+
+    def report(self, records, out=sys.stdout):
+        """Print phase totals, the latency histogram, the slowest stores and
+        the overall record rate"""
+        self.switch(self._phase)
+        elapsed = time.perf_counter() - self.started
+        total = sum(self.phases.values()) or 1
+
+        print("Phase Totals:", file=out)
+        for phase, description in PHASES:
+            seconds = self.phases.get(phase, 0)
+            print(f"  {description:<42} {seconds:10.3f} s {100 * seconds / total:6.1f}%", file=out)
+
+        print(f"Per-File Latency ({self.files} stores):", file=out)
+        lower = 0
+        for bound in LATENCY_BUCKETS + (None,):
+            count = self.histogram.get(bound, 0)
+            label = f"{lower}-{bound} ms" if bound is not None else f">= {lower} ms"
+            if count:
+                print(f"  {label:>14} {count:8d}", file=out)
+            lower = bound
+
+        if self.slowest:
+            print(f"Slowest {len(self.slowest)} Stores:", file=out)
+            for seconds, path in sorted(self.slowest, reverse=True):
+                print(f"  {seconds * 1000:10.2f} ms  {path}", file=out)
+
+        rate = records / elapsed if elapsed else 0
+        print(f"Elapsed: {elapsed:.3f} s, {rate:.0f} records/sec", file=out)
@@ -0,0 +1,45 @@
+import glob
+import json
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DSStoreParser  # noqa: E402
+from benchmarks import corpus  # noqa: E402
+
+# Columns that change between scans of the same files
+VOLATILE = ("src_acc_time",)
+
+
+def run_scan(source, outdir, *args, sort=True):
+    """Runs the command line tool with a JSON Lines report and returns its
+    records, each a dict without the volatile columns. With sort=False they
+    are in the order written"""
+    os.makedirs(outdir)
+    argv = ["DSStoreParser.py", "-s", str(source), "-o", str(outdir), "-f", "jsonl", *args]
+    with mock.patch.object(sys, "argv", argv):
+        DSStoreParser.main()
+
+    records = []
+    for report in glob.glob(os.path.join(outdir, "*.jsonl")):
+        with open(report, encoding="utf-8") as file_io:
+            for line in file_io:
+                record = json.loads(line)
+                for column in VOLATILE:
+                    record.pop(column, None)
+                records.append(record)
+    if sort:
+        records.sort(key=lambda r: json.dumps(r, sort_keys=True))
+    return records
+
+
+@pytest.fixture
+def store_tree(tmp_path):
+    """A directory tree of four small stores"""
+    root = tmp_path / "tree"
+    corpus.write_tree(str(root), 4, 5)
+    return root
@@ -0,0 +1,21 @@
+import logging
+
+from ds_store_parser import ListSink, RecordHandler, report_store
+
+from conftest import corpus
+
+
+def test_library_logs_instead_of_printing(capsys, caplog):
+    handler = RecordHandler(False, sink_factory=ListSink)
+    data = corpus.build_store([("a.txt", "zzzz", "bool", True)])
+
+    with caplog.at_level(logging.INFO, logger="ds_store_parser"):
+        report_store(data, handler, name="/evidence/.DS_Store")
+        report_store(data[:64], handler, name="/evidence/broken/.DS_Store")
+
+    assert capsys.readouterr().out == ""
+    messages = [(r.levelno, r.getMessage()) for r in caplog.records]
+    assert (logging.INFO, "DS_Store Found: /evidence/.DS_Store") in messages
+    assert any(level == logging.WARNING and "Code not accounted for" in text for level, text in messages)
+    assert any(level == logging.ERROR and "/evidence/broken/.DS_Store" in text for level, text in messages)
+    assert handler.context.errors == 1
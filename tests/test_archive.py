@@ -0,0 +1,77 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from ds_store_parser import archive
+
+from conftest import run_scan
+
+# Columns that hold the source location or times an archive does not keep
+SOURCE_COLUMNS = ("src_file", "src_create_time", "src_mod_time", "src_metadata_change_time")
+
+
+def make_tar(tree, path, mode="w:gz"):
+    with tarfile.open(path, mode) as tar_io:
+        tar_io.add(str(tree), arcname=tree.name)
+
+
+def make_zip(tree, path):
+    with zipfile.ZipFile(path, "w") as zip_io:
+        for directory, _, files in os.walk(tree):
+            for name in files:
+                full = os.path.join(directory, name)
+                zip_io.write(full, os.path.relpath(full, tree.parent))
+
+
+def strip_source(records):
+    return [{k: v for k, v in r.items() if k not in SOURCE_COLUMNS} for r in records]
+
+
+@pytest.mark.parametrize("name, make", [
+    ("tree.tar.gz", make_tar),
+    ("tree.tar", lambda tree, path: make_tar(tree, path, "w")),
+    ("tree.zip", make_zip),
+])
+def test_archive_scan_matches_directory_scan(tmp_path, store_tree, name, make):
+    path = tmp_path / name
+    make(store_tree, str(path))
+
+    from_dir = run_scan(store_tree, tmp_path / "dir")
+    from_archive = run_scan(path, tmp_path / "archive")
+
+    assert strip_source(from_archive) == strip_source(from_dir)
+    members = {r["src_file"] for r in from_archive}
+    assert members == {f"{path}, {os.path.relpath(r['src_file'], store_tree.parent)}" for r in from_dir}
+
+
+def test_find_ds_stores_filters_members(tmp_path, store_tree):
+    (store_tree / "notes.txt").write_text("not a store")
+    path = tmp_path / "tree.tar"
+    make_tar(store_tree, str(path), "w")
+
+    names = [name for name, _, _ in archive.find_ds_stores(str(path))]
+    assert names == ["tree/.DS_Store", "tree/d00001/.DS_Store", "tree/d00002/.DS_Store", "tree/d00003/.DS_Store"]
+
+    assert [name for name, _, _ in archive.find_ds_stores(str(path), max_depth=1)] == ["tree/.DS_Store"]
+    assert [name for name, _, _ in archive.find_ds_stores(str(path), excludes=["d0000[12]"])] == [
+        "tree/.DS_Store", "tree/d00003/.DS_Store"]
+
+
+def test_member_contents_and_stat(tmp_path, store_tree):
+    path = tmp_path / "tree.zip"
+    make_zip(store_tree, str(path))
+
+    for name, stat_result, data in archive.find_ds_stores(str(path)):
+        assert data == (store_tree.parent / name).read_bytes()
+        assert stat_result.st_size == len(data)
+
+
+def test_is_archive(tmp_path, store_tree):
+    path = tmp_path / "tree.zip"
+    make_zip(store_tree, str(path))
+
+    assert archive.is_archive(str(path))
+    assert not archive.is_archive(str(store_tree))
+    assert not archive.is_archive(str(store_tree / ".DS_Store"))
@@ -0,0 +1,99 @@
+import io
+import struct
+
+import pytest
+
+from benchmarks import corpus
+from ds_store_parser import batch, parse_store
+from ds_store_parser.ds_store import store
+
+CODES = ('Iloc', 'dilc', 'fwi0')
+
+
+@pytest.fixture
+def stores():
+    """Two stores with different values for every batched code"""
+    return [corpus.build_store(corpus.make_entries(30, seed=seed)) for seed in (1, 2)]
+
+
+def decoded(stores, code):
+    """(filename, source index, field values) of every record of code, as
+    decoded one at a time by its FixedCodec"""
+    return [
+        (record.filename, index, record.value.values)
+        for index, data in enumerate(stores)
+        for record in parse_store(data, sort=False)
+        if record.code == code
+    ]
+
+
+def collect(stores):
+    blob_batch = batch.BlobBatch()
+    for index, data in enumerate(stores):
+        blob_batch.add(data, name=f'store{index}')
+    return blob_batch
+
+
+def assert_matches(columns, expected, codec):
+    assert columns.filenames == [filename for filename, _, _ in expected]
+    assert list(columns.sources) == [index for _, index, _ in expected]
+    for i, name in enumerate(codec.FIELDS):
+        assert list(columns.fields[name]) == [values[i] for _, _, values in expected], name
+
+
+def test_numpy_columns_match_codec_decode(stores):
+    pytest.importorskip('numpy')
+    blob_batch = collect(stores)
+    columns = blob_batch.columns()
+
+    assert blob_batch.sources == ['store0', 'store1']
+    for code in CODES:
+        expected = decoded(stores, code)
+        assert expected
+        assert_matches(columns[code], expected, blob_batch.codecs[code])
+
+
+def test_columns_without_numpy_match_codec_decode(stores, monkeypatch):
+    monkeypatch.setattr(batch, 'numpy', None)
+    blob_batch = collect(stores)
+    columns = blob_batch.columns()
+
+    for code in CODES:
+        assert isinstance(columns[code].fields, dict)
+        assert_matches(columns[code], decoded(stores, code), blob_batch.codecs[code])
+
+
+def test_layout_dtype_matches_icvo_layout(stores):
+    numpy = pytest.importorskip('numpy')
+    codec = store.IcvoCodec
+    dtype = batch.layout_dtype(codec)
+    expected = decoded(stores, 'icvo')
+
+    with store.DSStore.open(io.BytesIO(stores[0]), 'rb') as ds_store:
+        blobs = b''.join(bytes(raw[:dtype.itemsize]) for _, _, raw in ds_store.fixed_blobs({'icvo'}))
+    fields = numpy.frombuffer(blobs, dtype=dtype)
+
+    assert dtype.itemsize == codec.LAYOUT.size
+    assert dtype.names == codec.FIELDS[:4]
+    assert fields.tolist() == [values[:4] for _, index, values in expected if index == 0]
+
+
+def test_short_blobs_are_left_out():
+    entries = [
+        ('a', 'Iloc', 'blob', struct.pack('>IIII', 1, 2, 3, 4)),
+        ('b', 'Iloc', 'blob', b'\0' * 8),
+        ('c', 'Iloc', 'blob', struct.pack('>IIII', 5, 6, 7, 8) + b'extra'),
+    ]
+    blob_batch = batch.BlobBatch(codes=('Iloc',))
+    blob_batch.add(corpus.build_store(entries, depth=1))
+    columns = blob_batch.columns()['Iloc']
+
+    assert columns.filenames == ['a', 'c']
+    assert list(columns.fields['horizontal']) == [1, 5]
+
+
+def test_codes_without_a_fixed_layout_are_refused():
+    with pytest.raises(ValueError, match='icvo blobs do not have a fixed layout'):
+        batch.BlobBatch(codes=('icvo',))
+    with pytest.raises(ValueError, match='bwsp blobs do not have a fixed layout'):
+        batch.BlobBatch(codes=('bwsp',))
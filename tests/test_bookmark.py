@@ -0,0 +1,143 @@
+import datetime
+import pickle
+import random
+import struct
+
+import pytest
+
+from ds_store_parser import manifest
+from ds_store_parser.ds_store import bookmark, store
+
+from conftest import corpus, run_scan
+
+
+def build_bookmark(items):
+    """A bookmark holding `items', key -> (kind, value) with kind one of
+    'str', 'date', 'url' or 'arr' (an array of strings)"""
+    body = bytearray(4)
+
+    def add(typecode, payload):
+        offset = len(body)
+        body.extend(struct.pack("<II", len(payload), typecode) + payload)
+        body.extend(b"\0" * (-len(body) % 4))
+        return offset
+
+    offsets = {}
+    for key, (kind, value) in items.items():
+        if kind == "str":
+            offsets[key] = add(bookmark.BMK_STRING | 1, value.encode())
+        elif kind == "date":
+            seconds = (value - bookmark.MAC_EPOCH).total_seconds()
+            offsets[key] = add(bookmark.BMK_DATE, struct.pack(">d", seconds))
+        elif kind == "url":
+            offsets[key] = add(bookmark.BMK_URL | bookmark.BMK_URL_ABSOLUTE, value.encode())
+        elif kind == "arr":
+            parts = [add(bookmark.BMK_STRING | 1, part.encode()) for part in value]
+            offsets[key] = add(bookmark.BMK_ARRAY | 1, struct.pack(f"<{len(parts)}I", *parts))
+
+    toc = len(body)
+    body.extend(struct.pack("<IIIII", 12 + 12 * len(offsets), bookmark.TOC_MAGIC, 1, 0, len(offsets)))
+    for key, offset in sorted(offsets.items()):
+        body.extend(struct.pack("<III", key, offset, 0))
+    struct.pack_into("<I", body, 0, toc)
+
+    base = 48
+    return struct.pack("<4sIII", b"book", base + len(body), 0x10040000, base) + bytes(32) + bytes(body)
+
+
+BACKGROUND = build_bookmark({
+    bookmark.kBookmarkPath: ("arr", ["Volumes", "Backup", "Pictures", "bg\nimg.png"]),
+    bookmark.kBookmarkFileCreationDate: ("date", datetime.datetime(2019, 5, 1, 12, 0)),
+    bookmark.kBookmarkVolumePath: ("str", "/Volumes/Backup"),
+    bookmark.kBookmarkVolumeURL: ("url", "file:///Volumes/Backup/"),
+    bookmark.kBookmarkVolumeName: ("str", "Backup"),
+    bookmark.kBookmarkVolumeCreationDate: ("date", datetime.datetime(2018, 1, 2, 3, 4, 5)),
+})
+
+
+def test_decodes_path_volume_and_dates():
+    value = store.BookmarkCodec.decode(memoryview(BACKGROUND))
+
+    assert value.as_dict() == {
+        "path": "/Volumes/Backup/Pictures/bg\nimg.png",
+        "volume_name": "Backup",
+        "volume_path": "/Volumes/Backup",
+        "volume_url": "file:///Volumes/Backup/",
+        "creation_date": datetime.datetime(2019, 5, 1, 12, 0),
+        "volume_creation_date": datetime.datetime(2018, 1, 2, 3, 4, 5),
+    }
+    assert str(value) == (
+        "Path: /Volumes/Backup/Pictures/bgimg.png, Volume: Backup, VolumePath: /Volumes/Backup, "
+        "VolumeURL: file:///Volumes/Backup/, Created: 2019-05-01 12:00:00, VolumeCreated: 2018-01-02 03:04:05"
+    )
+
+
+def test_repeated_bookmarks_share_one_decode():
+    value = store.BookmarkCodec.decode(BACKGROUND)
+
+    assert store.BookmarkCodec.decode(bytearray(BACKGROUND)) is value
+    assert pickle.loads(pickle.dumps(value)).path == value.path
+
+
+def test_missing_items_are_none():
+    value = store.BookmarkCodec.decode(build_bookmark({bookmark.kBookmarkVolumeName: ("str", "Data")}))
+
+    assert value.path is None and value.creation_date is None
+    assert str(value) == "Volume: Data"
+    assert str(store.BookmarkCodec.decode(build_bookmark({}))) == "Bookmark: no path"
+
+
+@pytest.mark.parametrize("data, error", [
+    (b"book", "Bookmark too short"),
+    (b"nope" + bytes(60), "Not a bookmark"),
+    (BACKGROUND[:60], "Bookmark header out of range"),
+])
+def test_malformed_bookmark_falls_back_to_error_and_hex(data, error):
+    value = store.BookmarkCodec.decode(data)
+
+    assert value.startswith(error) and value.endswith(f": {data.hex()}")
+
+
+def test_corrupted_bookmarks_never_raise():
+    rnd = random.Random(0)
+    for _ in range(500):
+        data = bytearray(BACKGROUND)
+        for _ in range(rnd.randrange(1, 6)):
+            data[rnd.randrange(len(data))] = rnd.randrange(256)
+        if rnd.random() < 0.3:
+            data = data[:rnd.randrange(len(data) + 1)]
+
+        value = store.BookmarkCodec.decode(bytes(data))
+        str(value)
+        if isinstance(value, bookmark.Bookmark):
+            value.as_dict()
+
+
+def test_manifest_round_trips_bookmarks():
+    value = store.BookmarkCodec.decode(BACKGROUND)
+    decoded = manifest._decode({"__bookmark__": manifest._encode(value)["__bookmark__"]})
+
+    assert bytes(decoded) == BACKGROUND
+    assert decoded.as_dict() == value.as_dict()
+
+
+def test_jsonl_report_and_manifest_keep_bookmark_fields(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    entries = sorted(corpus.make_entries(2) + [(".", "pBBk", "blob", BACKGROUND)], key=lambda e: (e[0].lower(), e[1]))
+    corpus.write_store(str(tree / ".DS_Store"), entries)
+    path = str(tmp_path / "manifest.db")
+
+    fresh = run_scan(tree, tmp_path / "first", "-m", path)
+    reused = run_scan(tree, tmp_path / "second", "-m", path)
+
+    assert reused == fresh
+    values = [r["record_data"] for r in fresh if r["code"] == "pBBk"]
+    assert values == [{
+        "path": "/Volumes/Backup/Pictures/bg\nimg.png",
+        "volume_name": "Backup",
+        "volume_path": "/Volumes/Backup",
+        "volume_url": "file:///Volumes/Backup/",
+        "creation_date": "2019-05-01T12:00:00",
+        "volume_creation_date": "2018-01-02T03:04:05",
+    }]
@@ -0,0 +1,48 @@
+import pytest
+
+from ds_store_parser.ds_store import buddy, store
+
+from conftest import corpus
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / ".DS_Store"
+    corpus.write_store(str(path), corpus.make_entries(20))
+    return str(path)
+
+
+def test_close_unmaps_store(store_path, monkeypatch):
+    monkeypatch.setattr(buddy, "MMAP_THRESHOLD", 0)
+    ds_store = store.DSStore.open(store_path, "rb", buffered=True)
+    mapping = ds_store._store._mmap
+    assert mapping is not None
+
+    entries = list(ds_store)
+    assert all(e.value is not None for e in entries)
+    ds_store.close()
+
+    assert mapping.closed
+    # Decoded values and their blobs no longer refer to the map
+    assert all(not isinstance(e.raw, memoryview) for e in entries)
+
+
+def test_close_reports_undecoded_views(store_path, monkeypatch):
+    monkeypatch.setattr(buddy, "MMAP_THRESHOLD", 0)
+    ds_store = store.DSStore.open(store_path, "rb", buffered=True)
+    entries = list(ds_store)
+
+    with pytest.raises(BufferError):
+        ds_store.close()
+
+    del entries
+    ds_store.close()
+    assert ds_store._store._mmap is None
+
+
+def test_close_read_buffer(store_path):
+    with store.DSStore.open(store_path, "rb", buffered=True) as ds_store:
+        entries = list(ds_store)
+
+    assert ds_store._store._file.closed
+    assert [e.value for e in entries if e.code == "Iloc"]
@@ -0,0 +1,58 @@
+import io
+import struct
+
+from ds_store_parser.ds_store import store
+
+from conftest import corpus
+
+DELETED = ("zzz deleted.txt", "cmmt", "ustr", "gone but not forgotten")
+
+
+def open_store(data, **options):
+    return store.DSStore.open(io.BytesIO(data), "rb", buffered=True, **options)
+
+
+def drop_last_record(entries):
+    """A single leaf store holding `entries' whose header no longer counts
+    the last one, leaving its bytes in the node's slack"""
+    data = corpus.build_store(entries, depth=1)
+    first = corpus.encode_entry(*entries[0])
+    header = struct.pack(">II", 0, len(entries)) + first
+    assert data.count(header) == 1
+    return data.replace(header, struct.pack(">II", 0, len(entries) - 1) + first)
+
+
+def test_carving_recovers_record_from_node_slack():
+    entries = corpus.make_entries(3) + [DELETED]
+    data = drop_last_record(entries)
+
+    assert DELETED[0] not in [e.filename for e in open_store(data)]
+
+    carved = [e for e in open_store(data, carve_slack=True) if e.filename == DELETED[0]]
+    assert [(e.code, e.value, e.node) for e in carved] == [("cmmt", DELETED[3], "unallocated")]
+
+
+def test_carving_recovers_record_from_gap_after_blocks():
+    data = corpus.build_store(corpus.make_entries(3), depth=1) + corpus.encode_entry(*DELETED)
+
+    carved = [e for e in open_store(data, carve_slack=True) if e.node == "unallocated"]
+    assert [(e.filename, e.value) for e in carved] == [(DELETED[0], DELETED[3])]
+
+
+def test_carving_keeps_live_records_allocated():
+    entries = corpus.make_entries(10)
+    data = corpus.build_store(entries, depth=3, fanout=3)
+
+    plain = [(e.filename, e.code, e.node) for e in open_store(data)]
+    carved = [(e.filename, e.code, e.node) for e in open_store(data, carve_slack=True)]
+    assert carved == plain
+    assert all(node.startswith("allocated ") for _, _, node in plain)
+
+
+def test_carving_honours_filter():
+    entries = corpus.make_entries(3) + [DELETED]
+    data = drop_last_record(entries)
+    entry_filter = store.EntryFilter(exclude_codes=["cmmt"])
+
+    carved = open_store(data, carve_slack=True, entry_filter=entry_filter)
+    assert [e for e in carved if e.filename == DELETED[0]] == []
@@ -0,0 +1,65 @@
+import json
+import struct
+
+import pytest
+
+from ds_store_parser import manifest
+from ds_store_parser.ds_store import store
+
+from conftest import run_scan
+
+# Blobs and the text the original string-building decoders gave for them
+LEGACY_TEXT = [
+    (store.IlocCodec, struct.pack(">IIII", 120, 340, 0xFFFFFFFF, 0xFFFF0000),
+     "Location: (120, 340), Selected Index: Null, Unknown: ffff0000"),
+    (store.IlocCodec, struct.pack(">IIII", 0xFFFFFFFF, 0xFFFFFFFF, 3, 0),
+     "Location: (Null, Null), Selected Index: 3, Unknown: 00000000"),
+    (store.IcvoCodec, b"icv4" + struct.pack(">H", 64) + b"none" + b"botm" + b"\0" * 12,
+     "Type: icv4, IconPixelSize: 64, GridAlign: none, GridAlignTo: botm, Unknown: 000000000000000000000000"),
+    (store.Fwi0Codec, struct.pack(">HHHH4sI", 10, 20, 300, 400, b"icnv", 0x10000),
+     "top: 10, left: 20, bottom: 300, right: 400, view_type: icnv, Unknown: 00010000"),
+    (store.DilcCodec, struct.pack(">IHHIIIIII", 1, 2, 3, 40, 0xFFFFFFFF - 25, 7, 8, 9, 10),
+     "Unk1: 00000001, GridQuadrant: 2, Unk2: 0003, IconPosFromLeft: 40, IconPosFromBottom: 25, "
+     "GridIconPosFromLeft: 7, GridIconPosFromTop: 8, Unk3: 00000009, Unk4: 0000000a"),
+]
+
+
+@pytest.mark.parametrize("codec, blob, text", LEGACY_TEXT)
+def test_fixed_codecs_keep_legacy_text(codec, blob, text):
+    value = codec.decode(memoryview(blob))
+
+    assert isinstance(value, store.FixedValue)
+    assert str(value) == text
+
+
+@pytest.mark.parametrize("codec", [store.IlocCodec, store.IcvoCodec, store.Fwi0Codec, store.DilcCodec])
+def test_short_blob_falls_back_to_hex(codec):
+    blob = b"\x01\x02\x03"
+    assert codec.decode(blob) == "010203"
+
+
+def test_as_dict_names_fields():
+    value = store.Fwi0Codec.decode(struct.pack(">HHHH4sI", 10, 20, 300, 400, b"icnv", 0))
+
+    assert value.as_dict() == {
+        "top": 10, "left": 20, "bottom": 300, "right": 400, "view_type": b"icnv", "unknown": 0,
+    }
+    assert store.IcvoCodec.decode(LEGACY_TEXT[2][1]).as_dict()["unknown"] == b"\0" * 12
+
+
+@pytest.mark.parametrize("codec, blob, text", LEGACY_TEXT)
+def test_manifest_round_trips_fixed_values(codec, blob, text):
+    value = codec.decode(blob)
+    decoded = json.loads(json.dumps([value], default=manifest._encode), object_hook=manifest._decode)
+
+    assert decoded == [value]
+    assert str(decoded[0]) == text
+
+
+def test_jsonl_report_holds_fixed_fields(store_tree, tmp_path):
+    records = run_scan(store_tree, tmp_path / "out")
+
+    iloc = [r["record_data"] for r in records if r["code"] == "Iloc"]
+    assert iloc and all(set(value) == set(store.IlocCodec.FIELDS) for value in iloc)
+    fwi0 = [r["record_data"] for r in records if r["code"] == "fwi0"]
+    assert fwi0 and fwi0[0]["view_type"] == b"icnv".hex()
@@ -0,0 +1,66 @@
+import os
+import shutil
+
+from ds_store_parser import RowCollector
+
+from conftest import run_scan
+
+
+def copy_tree(store_tree, copies):
+    """Copies the root store of store_tree into new directories"""
+    for n in range(copies):
+        directory = os.path.join(store_tree, f"copy{n}")
+        os.mkdir(directory)
+        shutil.copy(os.path.join(store_tree, ".DS_Store"), directory)
+
+
+def test_identical_stores_are_parsed_once(store_tree, tmp_path, capsys):
+    copy_tree(store_tree, 2)
+    run_scan(store_tree, tmp_path / "out", "--dedup")
+
+    assert "Stores Hashed: 6, Unique: 4, Duplicates: 2" in capsys.readouterr().out
+
+
+def test_duplicates_are_reported_at_their_own_path(store_tree, tmp_path):
+    copy_tree(store_tree, 2)
+    deduped = run_scan(store_tree, tmp_path / "dedup", "--dedup")
+
+    assert deduped == run_scan(store_tree, tmp_path / "plain")
+    copies = {r["src_file"] for r in deduped if "/copy" in r["src_file"]}
+    assert copies == {os.path.join(store_tree, f"copy{n}", ".DS_Store") for n in range(2)}
+
+
+def test_relocated_rows_check_file_existence_again(store_tree):
+    store = os.path.join(store_tree, ".DS_Store")
+    collector = RowCollector(True)
+    collector.write_row(
+        ("/tree/file00000.txt", "file00000.txt", "Iloc", "blob", "x", "[EXISTS] NONE") + ("",) * 6 + ("", store),
+        "Iloc"
+    )
+
+    row, _ = collector.relocate_rows(collector.rows, store, os.path.dirname(store), os.stat(store))[0]
+    assert row[collector.fields.index("file_exists")] == "[NOT EXISTS]"
+
+    (store_tree / "file00000.txt").write_text("")
+    collector = RowCollector(True)
+    row, _ = collector.relocate_rows([(row, "Iloc")], store, os.path.dirname(store), os.stat(store))[0]
+    assert row[collector.fields.index("file_exists")].startswith("{")
+
+
+def test_workers_share_one_dedup_cache(store_tree, tmp_path, capsys):
+    copy_tree(store_tree, 20)
+    deduped = run_scan(store_tree, tmp_path / "dedup", "--dedup", "-w", "3")
+
+    assert "Stores Hashed: 24, Unique: 4, Duplicates: 20" in capsys.readouterr().out
+    assert deduped == run_scan(store_tree, tmp_path / "plain")
+
+
+def test_copies_of_a_broken_store_are_each_parsed(store_tree, tmp_path, capsys):
+    root = os.path.join(store_tree, ".DS_Store")
+    with open(root, "r+b") as file_io:
+        file_io.truncate(64)
+    copy_tree(store_tree, 2)
+
+    deduped = run_scan(store_tree, tmp_path / "dedup", "--dedup", "-w", "2")
+    assert "Stores Hashed: 3, Unique: 3, Duplicates: 0" in capsys.readouterr().out
+    assert deduped == run_scan(store_tree, tmp_path / "plain")
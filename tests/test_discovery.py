@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from benchmarks import corpus
+from ds_store_parser import discovery
+
+# Modification times are set explicitly so polls do not depend on the
+# file system's timestamp granularity
+BEFORE = 1_600_000_000 * 10**9
+AFTER = BEFORE + 10**9
+
+
+def set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def write_store(path, records, mtime_ns=AFTER):
+    corpus.write_store(str(path), corpus.make_entries(records))
+    set_mtime(path, mtime_ns)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Four stores in nested directories, every mtime set to BEFORE"""
+    root = tmp_path / "tree"
+    corpus.write_tree(str(root), 4, 2)
+    for directory, _, files in os.walk(root):
+        for name in files:
+            set_mtime(os.path.join(directory, name), BEFORE)
+        set_mtime(directory, BEFORE)
+    return root
+
+
+def poll(watcher):
+    return sorted(os.path.relpath(path, watcher.source) for path, _ in watcher.poll())
+
+
+def test_first_poll_finds_every_store(tree):
+    watcher = discovery.Watcher(str(tree))
+
+    assert poll(watcher) == [
+        ".DS_Store", os.path.join("d00001", ".DS_Store"), os.path.join("d00002", ".DS_Store"),
+        os.path.join("d00003", ".DS_Store")
+    ]
+    assert poll(watcher) == []
+
+
+def test_replaced_store_is_reported(tree):
+    watcher = discovery.Watcher(str(tree), full_every=0)
+    poll(watcher)
+
+    write_store(tree / "d00001" / ".DS_Store.new", 3)
+    os.replace(tree / "d00001" / ".DS_Store.new", tree / "d00001" / ".DS_Store")
+    set_mtime(tree / "d00001", AFTER)
+
+    assert poll(watcher) == [os.path.join("d00001", ".DS_Store")]
+    assert poll(watcher) == []
+
+
+def test_store_rewritten_in_place_is_found_by_the_full_poll(tree):
+    watcher = discovery.Watcher(str(tree), full_every=3)
+    poll(watcher)
+
+    write_store(tree / ".DS_Store", 3)
+    set_mtime(tree, BEFORE)
+
+    assert poll(watcher) == []
+    assert poll(watcher) == [".DS_Store"]
+    assert poll(watcher) == []
+
+
+def test_new_store_is_reported(tree):
+    watcher = discovery.Watcher(str(tree))
+    poll(watcher)
+
+    write_store(tree / "d00002" / "._.DS_Store", 1)
+    set_mtime(tree / "d00002", AFTER)
+
+    assert poll(watcher) == [os.path.join("d00002", "._.DS_Store")]
+
+
+def test_deleted_store_is_forgotten(tree):
+    watcher = discovery.Watcher(str(tree))
+    poll(watcher)
+
+    store = tree / "d00003" / ".DS_Store"
+    os.remove(store)
+    set_mtime(store.parent, AFTER)
+
+    assert poll(watcher) == []
+    assert str(store) not in watcher.stores[str(store.parent)]
+
+    # The same file put back is new again
+    write_store(store, 2, BEFORE)
+    set_mtime(store.parent, AFTER + 10**9)
+    assert poll(watcher) == [os.path.join("d00003", ".DS_Store")]
+
+
+def test_new_nested_directories_are_walked(tree):
+    watcher = discovery.Watcher(str(tree))
+    poll(watcher)
+
+    nested = tree / "d00002" / "new" / "deeper"
+    nested.mkdir(parents=True)
+    write_store(nested / ".DS_Store", 1)
+    set_mtime(tree / "d00002", AFTER)
+
+    assert poll(watcher) == [os.path.join("d00002", "new", "deeper", ".DS_Store")]
+    assert str(nested) in watcher.directories
+
+
+def test_deleted_directory_is_forgotten(tree):
+    watcher = discovery.Watcher(str(tree))
+    poll(watcher)
+
+    directory = tree / "d00003"
+    os.remove(directory / ".DS_Store")
+    directory.rmdir()
+    set_mtime(tree, AFTER)
+
+    assert poll(watcher) == []
+    assert str(directory) not in watcher.directories
+    assert str(directory) not in watcher.stores
+
+
+def test_only_changed_directories_are_listed(tree, monkeypatch):
+    watcher = discovery.Watcher(str(tree), full_every=0)
+    poll(watcher)
+
+    listed = []
+    list_directory = discovery.list_directory
+
+    def counting(path, *args):
+        listed.append(path)
+        return list_directory(path, *args)
+
+    monkeypatch.setattr(discovery, "list_directory", counting)
+    assert poll(watcher) == []
+    assert listed == []
+
+    set_mtime(tree / "d00002", AFTER)
+    assert poll(watcher) == []
+    assert listed == [str(tree / "d00002")]
@@ -0,0 +1,81 @@
+import io
+import struct
+
+from ds_store_parser.ds_store import store
+
+from conftest import corpus
+
+FREED = [
+    ("aaa removed.txt", "cmmt", "ustr", "freed comment"),
+    ("aaa removed.txt", "vSrn", "long", 1),
+]
+
+
+def add_freed_node(data, entries):
+    """Append a leaf node holding `entries' to the store bytes `data' and
+    put its block on the allocator's free list.  Returns the new bytes,
+    the free list width and the block's allocator offset."""
+    node = struct.pack(">II", 0, len(entries)) + b"".join(corpus.encode_entry(*e) for e in entries)
+    width = max(5, (len(node) - 1).bit_length())
+    size = 1 << width
+    offset = (len(data) - 4 + size - 1) // size * size
+
+    data = bytearray(data)
+    data.extend(b"\0" * (offset + 4 + size - len(data)))
+    data[offset + 4:offset + 4 + len(node)] = node
+
+    # The free lists are the last 32 counts of the root block
+    root = struct.unpack_from(">I", data, 8)[0] + 4
+    count = struct.unpack_from(">I", data, root)[0]
+    padded = (count + 255) & ~255
+    toc = root + 8 + 4 * padded
+    toc_end = toc + 4
+    for _ in range(struct.unpack_from(">I", data, toc)[0]):
+        toc_end += 1 + data[toc_end] + 4
+    free_lists = [[] for _ in range(32)]
+    free_lists[width].append(offset)
+    packed = b"".join(struct.pack(f">I{len(f)}I", len(f), *f) for f in free_lists)
+    data[toc_end:toc_end + len(packed)] = packed
+    return bytes(data), width, offset
+
+
+def open_store(data, **options):
+    return store.DSStore.open(io.BytesIO(data), "rb", buffered=True, **options)
+
+
+def test_free_blocks_recovers_freed_node():
+    data, width, offset = add_freed_node(corpus.build_store(corpus.make_entries(5)), FREED)
+
+    assert [e for e in open_store(data) if e.filename == FREED[0][0]] == []
+
+    recovered = [e for e in open_store(data, free_blocks=True) if e.filename == FREED[0][0]]
+    origin = f"free list {width}, offset {offset:#x}"
+    assert [(e.code, e.value, e.node) for e in recovered] == [
+        ("cmmt", "freed comment", origin),
+        ("vSrn", 1, origin),
+    ]
+
+
+def test_free_blocks_drops_records_still_in_tree():
+    entries = corpus.make_entries(5)
+    data, _, _ = add_freed_node(corpus.build_store(entries), entries[:4])
+
+    plain = [(e.filename, e.code, e.node) for e in open_store(data)]
+    recovered = [(e.filename, e.code, e.node) for e in open_store(data, free_blocks=True)]
+    assert recovered == plain
+
+
+def test_free_list_tag_wins_over_carving():
+    data, width, _ = add_freed_node(corpus.build_store(corpus.make_entries(5)), FREED)
+
+    recovered = open_store(data, free_blocks=True, carve_slack=True)
+    nodes = {e.node for e in recovered if e.filename == FREED[0][0]}
+    assert len(nodes) == 1 and nodes.pop().startswith(f"free list {width}, ")
+
+
+def test_free_blocks_skips_blocks_that_are_not_nodes():
+    data = corpus.build_store(corpus.make_entries(5))
+    data, _, _ = add_freed_node(data, [])
+
+    plain = [(e.filename, e.code) for e in open_store(data)]
+    assert [(e.filename, e.code) for e in open_store(data, free_blocks=True)] == plain
@@ -0,0 +1,103 @@
+import os
+
+from conftest import run_scan
+
+
+def test_unchanged_stores_are_reused(store_tree, tmp_path, capsys):
+    manifest = str(tmp_path / "manifest.db")
+    first = run_scan(store_tree, tmp_path / "first", "-m", manifest)
+    second = run_scan(store_tree, tmp_path / "second", "-m", manifest)
+
+    assert "Stores Reused From Manifest: 4" in capsys.readouterr().out
+    assert second == first
+    assert first
+
+
+def test_reused_rows_match_a_fresh_scan(store_tree, tmp_path):
+    manifest = str(tmp_path / "manifest.db")
+    run_scan(store_tree, tmp_path / "first", "-m", manifest)
+    reused = run_scan(store_tree, tmp_path / "second", "-m", manifest)
+
+    assert reused == run_scan(store_tree, tmp_path / "fresh")
+
+
+def test_modified_store_is_parsed_again(store_tree, tmp_path, capsys):
+    manifest = str(tmp_path / "manifest.db")
+    run_scan(store_tree, tmp_path / "first", "-m", manifest)
+
+    changed = os.path.join(store_tree, ".DS_Store")
+    stat_result = os.stat(changed)
+    os.utime(changed, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+    capsys.readouterr()
+
+    run_scan(store_tree, tmp_path / "second", "-m", manifest)
+    assert "Stores Reused From Manifest: 3" in capsys.readouterr().out
+
+
+def test_different_filter_invalidates_manifest(store_tree, tmp_path, capsys):
+    manifest = str(tmp_path / "manifest.db")
+    run_scan(store_tree, tmp_path / "first", "-m", manifest)
+    capsys.readouterr()
+
+    records = run_scan(store_tree, tmp_path / "second", "-m", manifest, "--include-codes", "Iloc")
+    assert "Stores Reused From Manifest: 0" in capsys.readouterr().out
+    assert {r["code"] for r in records} == {"Iloc"}
+
+
+def test_empty_store_placeholder_survives_reuse(tmp_path):
+    empty = tmp_path / "tree" / "em" / "sub"
+    empty.mkdir(parents=True)
+    (empty / ".DS_Store").write_bytes(b"")
+    manifest = str(tmp_path / "manifest.db")
+
+    first = run_scan(tmp_path / "tree", tmp_path / "first", "-m", manifest)
+    second = run_scan(tmp_path / "tree", tmp_path / "second", "-m", manifest)
+
+    expected = f'EMPTY DS_STORE: {empty / ".DS_Store"}'
+    assert [r["generated_path"] for r in first] == [expected]
+    assert second == first
+
+
+def test_reused_rows_check_file_existence_again(store_tree, tmp_path):
+    manifest = str(tmp_path / "manifest.db")
+    args = ("-m", manifest, "--check-exists", "--include-codes", "Iloc")
+    run_scan(store_tree, tmp_path / "first", *args)
+
+    (store_tree / "file00000.txt").write_text("")
+    records = run_scan(store_tree, tmp_path / "second", *args)
+
+    root = os.path.join(store_tree, ".DS_Store")
+    exists = {r["record_filename"]: r["file_exists"] for r in records if r["src_file"] == root}
+    assert exists["file00000.txt"].startswith("{")
+    assert exists["file00001.txt"] == "[NOT EXISTS]"
+
+
+def test_unreadable_store_is_parsed_again(store_tree, tmp_path, capsys):
+    manifest = str(tmp_path / "manifest.db")
+    broken = store_tree / "d00001" / ".DS_Store"
+    good = broken.read_bytes()
+    broken.write_bytes(good[:64])
+
+    run_scan(store_tree, tmp_path / "first", "-m", manifest)
+    capsys.readouterr()
+    run_scan(store_tree, tmp_path / "second", "-m", manifest)
+    assert "Stores Reused From Manifest: 3" in capsys.readouterr().out
+
+    broken.write_bytes(good)
+    records = run_scan(store_tree, tmp_path / "third", "-m", manifest)
+    assert records == run_scan(store_tree, tmp_path / "fresh")
+
+
+def test_dangling_store_link_is_not_saved(store_tree, tmp_path, capsys):
+    manifest = str(tmp_path / "manifest.db")
+    linked = store_tree / "linked"
+    linked.mkdir()
+    (linked / ".DS_Store").symlink_to(tmp_path / "missing")
+
+    run_scan(store_tree, tmp_path / "first", "-m", manifest)
+    (tmp_path / "missing").write_bytes((store_tree / ".DS_Store").read_bytes())
+    capsys.readouterr()
+
+    records = run_scan(store_tree, tmp_path / "second", "-m", manifest)
+    assert "Stores Reused From Manifest: 4" in capsys.readouterr().out
+    assert any(r["src_file"] == str(linked / ".DS_Store") for r in records)
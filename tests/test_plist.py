@@ -0,0 +1,92 @@
+import plistlib
+from unittest import mock
+
+from ds_store_parser import manifest, parse_store
+from ds_store_parser.ds_store import store
+
+from conftest import corpus, run_scan
+
+SETTINGS = {"ShowSidebar": True, "ShowToolbar": False, "WindowBounds": "{{1, 2}, {3, 4}}"}
+
+
+def test_decodes_binary_and_xml_plists():
+    binary = plistlib.dumps(SETTINGS, fmt=plistlib.FMT_BINARY)
+    xml = plistlib.dumps(SETTINGS, fmt=plistlib.FMT_XML)
+
+    assert store.PlistCodec.decode(memoryview(binary)) == SETTINGS
+    assert store.PlistCodec.decode(xml) == SETTINGS
+
+
+def test_repeated_blobs_share_one_parse():
+    blob = plistlib.dumps({"ViewStyle": "icnv", "Unique": "repeated"}, fmt=plistlib.FMT_BINARY)
+
+    with mock.patch.object(store.plistlib, "loads", wraps=plistlib.loads) as loads:
+        first = store.PlistCodec.decode(blob)
+        second = store.PlistCodec.decode(bytearray(blob))
+
+    assert first is second
+    assert loads.call_count == 1
+
+
+def test_invalid_plist_falls_back_to_error_and_hex():
+    value = store.PlistCodec.decode(b"bplist00\xff\xff")
+
+    assert isinstance(value, str)
+    assert value.endswith(": 62706c6973743030ffff")
+
+
+def test_plist_keys_select_top_level_keys():
+    blob = plistlib.dumps(SETTINGS, fmt=plistlib.FMT_BINARY)
+    entry_filter = store.EntryFilter(plist_keys=["ShowSidebar", "Missing"])
+    codec = entry_filter.codec(b"bwsp")
+
+    assert codec.decode(blob) == {"ShowSidebar": True}
+    assert codec is store.PlistCodec.selecting(("ShowSidebar", "Missing"))
+    assert entry_filter.codec(b"Iloc") is store.IlocCodec
+    # The full value stays cached for other selections
+    assert store.PlistCodec.decode(blob) == SETTINGS
+
+
+def test_selecting_keeps_order_and_leaves_other_values_alone():
+    codec = store.PlistCodec.selecting(("WindowBounds", "ShowSidebar"))
+    columns = plistlib.dumps(["name", "size"], fmt=plistlib.FMT_BINARY)
+
+    assert list(codec.decode(plistlib.dumps(SETTINGS))) == ["WindowBounds", "ShowSidebar"]
+    assert store.PlistCodec.selecting(("Missing",)).decode(plistlib.dumps(SETTINGS)) == {}
+    # Only dictionaries have top-level keys to select
+    assert codec.decode(columns) == ["name", "size"]
+    assert codec.decode(b"not a plist").endswith(": 6e6f74206120706c697374")
+
+
+def test_plist_records_decode_in_parse_store():
+    blob = plistlib.dumps(SETTINGS, fmt=plistlib.FMT_BINARY)
+    data = corpus.build_store(
+        [(".", code, "blob", blob) for code in ("bwsp", "glvp", "icvp", "lsvp")] + [(".", "vstl", "type", "icnv")],
+        depth=1
+    )
+
+    values = {record.code: record.value for record in parse_store(data)}
+    assert values == {"bwsp": SETTINGS, "glvp": SETTINGS, "icvp": SETTINGS, "lsvp": SETTINGS, "vstl": "icnv"}
+    # One parse is shared by every record holding the same plist
+    assert values["bwsp"] is values["lsvp"]
+
+    entry_filter = store.EntryFilter(include_codes=["bwsp", "lsvp"], plist_keys=["ShowToolbar"])
+    selected = {record.code: record.value for record in parse_store(data, entry_filter=entry_filter)}
+    assert selected == {"bwsp": {"ShowToolbar": False}, "lsvp": {"ShowToolbar": False}}
+
+
+def test_plist_keys_in_report(store_tree, tmp_path):
+    records = run_scan(store_tree, tmp_path / "out", "--plist-keys", "ShowSidebar")
+
+    bwsp = [r["record_data"] for r in records if r["code"] == "bwsp"]
+    assert bwsp and all(value == {"ShowSidebar": True} for value in bwsp)
+
+
+def test_format_version_invalidates_manifest(store_tree, tmp_path, capsys):
+    path = str(tmp_path / "manifest.db")
+    run_scan(store_tree, tmp_path / "first", "-m", path)
+    capsys.readouterr()
+
+    with mock.patch.object(manifest, "FORMAT_VERSION", manifest.FORMAT_VERSION + 1):
+        run_scan(store_tree, tmp_path / "second", "-m", path)
+    assert "Stores Reused From Manifest: 0" in capsys.readouterr().out
@@ -0,0 +1,99 @@
+import os
+import struct
+
+from ds_store_parser import ListSink, RecordHandler, report_store
+
+from conftest import corpus
+
+_lstat = os.lstat
+_lexists = os.path.lexists
+
+
+def fold_case(path):
+    """path with its last part matched to a directory entry regardless of
+    case, as a case-insensitive file system resolves it"""
+    directory, name = os.path.split(path)
+    for entry in os.listdir(directory):
+        if entry.lower() == name.lower():
+            return os.path.join(directory, entry)
+    return path
+
+
+def test_case_sensitive_file_system_lists_exact_names(store_tree):
+    (store_tree / "file00000.txt").write_text("")
+    handler = RecordHandler(True, write_reports=False)
+    store = str(store_tree / ".DS_Store")
+
+    assert handler.file_exists(store, "file00000.txt").startswith("{")
+    assert handler.file_exists(store, "FILE00000.TXT") == "[NOT EXISTS]"
+
+
+def test_case_insensitive_file_system_finds_other_case(store_tree, monkeypatch):
+    (store_tree / "file00000.txt").write_text("")
+    monkeypatch.setattr(os, "lstat", lambda path, *args, **kwargs: _lstat(fold_case(path), *args, **kwargs))
+    monkeypatch.setattr(os.path, "lexists", lambda path: _lexists(fold_case(path)))
+    handler = RecordHandler(True, write_reports=False)
+    store = str(store_tree / ".DS_Store")
+
+    assert handler.file_exists(store, "FILE00000.TXT").startswith("{")
+    assert handler.file_exists(store, "File00001.txt") == "[NOT EXISTS]"
+
+
+def report_rows(data, name, **options):
+    handler = RecordHandler(False, sink_factory=ListSink)
+    report_store(data, handler, name=name, **options)
+    return handler.sink.rows
+
+
+def test_rows_follow_report_columns_without_tabs_or_newlines():
+    data = corpus.build_store([
+        ("tab\tname.txt", "cmmt", "ustr", "line\nbreak\r"),
+        ("a.txt", "Iloc", "blob", struct.pack(">IIII", 1, 2, 3, 4)),
+        (".", "vstl", "type", "icnv"),
+        ("b.txt", "zzzz", "bool", True),
+    ], depth=1)
+    rows = report_rows(data, "/evidence/Users/a/.DS_Store", root="/evidence")
+
+    blank_stats = ("", "", "", "", "", len(data))
+    tail = ("allocated 2", "/evidence/Users/a/.DS_Store")
+    assert [(row[:5], row[5:11], row[11:], code, category) for row, code, category in rows] == [
+        (("/evidence/Users/a/.", ".", "vstl (View Style Selected)", "type", "icnv: Icon View"),
+         blank_stats, tail, "vstl", "folder_access"),
+        (("/evidence/Users/a/a.txt", "a.txt", "Iloc (Icon Location)", "blob (IlocCodec)", rows[1][0][4]),
+         blank_stats, tail, "Iloc", "misc"),
+        (("/evidence/Users/a/b.txt", "b.txt", "zzzz (Unknown Code: zzzz)", "bool", True),
+         blank_stats, tail, "zzzz", None),
+        (("/evidence/Users/a/tabname.txt", "tabname.txt", "cmmt (Finder Comments)", "ustr", "linebreak"),
+         blank_stats, tail, "cmmt", "misc"),
+    ]
+    assert rows[1][0][4].as_dict() == {"horizontal": 1, "vertical": 2, "index": 3, "unknown": 4}
+
+
+def test_archive_members_name_the_archive_in_src_file(tmp_path):
+    archive = tmp_path / "image.tar"
+    archive.write_bytes(b"")
+    data = corpus.build_store([("a.txt", "cmmt", "ustr", "note")], depth=1)
+
+    (row, _, _), = report_rows(data, "Users/a/.DS_Store", root=str(archive))
+
+    assert row[0] == "/Users/a/a.txt"
+    assert row[-1] == f"{archive}, Users/a/.DS_Store"
+
+
+def test_each_store_gets_its_own_file_columns(store_tree):
+    handler = RecordHandler(False, sink_factory=ListSink)
+    stores = [str(store_tree / ".DS_Store"), str(store_tree / "d00001" / ".DS_Store")]
+    for path in stores:
+        report_store(path, handler, root=str(store_tree))
+
+    # Reading a store may update its access time, so it is left out
+    names = [name for name in handler.fields[5:11] if name != "src_acc_time"]
+    columns = {}
+    for row, _, _ in handler.sink.rows:
+        values = dict(zip(handler.fields, row))
+        columns.setdefault(row[-1], set()).add(tuple(values[name] for name in names))
+
+    assert sorted(columns) == sorted(stores)
+    for path in stores:
+        expected = handler.stat_columns(handler.get_stats(os.lstat(path)))
+        assert columns[path] == {tuple(expected[name] for name in names)}
@@ -0,0 +1,58 @@
+import pytest
+
+from benchmarks import corpus
+from conftest import run_scan
+
+
+def test_scans_in_one_process_share_no_state(store_tree, tmp_path):
+    run_scan(store_tree, tmp_path / "dedup", "--dedup")
+    records = run_scan(store_tree, tmp_path / "filtered", "--dedup", "--include-codes", "Iloc")
+
+    assert records
+    assert {r["code"] for r in records} == {"Iloc"}
+
+
+@pytest.fixture
+def wide_tree(tmp_path):
+    """Enough stores that workers finish out of discovery order"""
+    root = tmp_path / "wide"
+    corpus.write_tree(str(root), 24, 20)
+    return root
+
+
+def test_workers_write_the_same_records_as_a_serial_scan(wide_tree, tmp_path):
+    serial = run_scan(wide_tree, tmp_path / "serial")
+    parallel = run_scan(wide_tree, tmp_path / "parallel", "-w", "3")
+
+    assert len({r["src_file"] for r in serial}) == 24
+    assert parallel == serial
+
+
+def test_ordered_workers_write_in_discovery_order(wide_tree, tmp_path):
+    serial = run_scan(wide_tree, tmp_path / "serial", sort=False)
+    ordered = run_scan(wide_tree, tmp_path / "ordered", "-w", "3", "--ordered", sort=False)
+
+    assert ordered == serial
+
+
+def test_check_exists_adds_file_exists_column(store_tree, tmp_path):
+    (store_tree / "file00000.txt").write_text("")
+    records = run_scan(store_tree, tmp_path / "out", "--check-exists", "--include-codes", "Iloc")
+
+    exists = {r["record_filename"]: r["file_exists"] for r in records if r["src_file"].endswith("tree/.DS_Store")}
+    assert exists["file00001.txt"] == "[NOT EXISTS]"
+    assert exists["file00000.txt"].startswith("{")
+
+
+def test_code_lists_ignore_blanks(store_tree, tmp_path):
+    records = run_scan(store_tree, tmp_path / "out", "--include-codes", " Iloc, dilc ,")
+
+    assert {r["code"] for r in records} == {"Iloc", "dilc"}
+
+
+def test_invalid_filename_regex_is_a_usage_error(store_tree, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        run_scan(store_tree, tmp_path / "out", "--filename-regex", "(")
+
+    assert exit_info.value.code == 2
+    assert "invalid regular expression '('" in capsys.readouterr().err
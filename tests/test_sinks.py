@@ -0,0 +1,145 @@
+import datetime
+import functools
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import struct
+
+import pytest
+
+from ds_store_parser import RecordHandler, parse_store, report_store, sinks
+from ds_store_parser.ds_store import store
+
+from conftest import corpus, run_scan
+
+# 2001-01-01 00:00:00 as dutc (1/65536 seconds since 1904) and as the
+# little-endian double, seconds since 2001, of modD blobs
+DUTC_2001 = (2082844800 + 978307200) << 16
+MODD_2001_JAN_2 = struct.pack("<d", 86400.0)
+
+HEADER = ["generated_path", "value", "src_size", "src_file"]
+
+
+def read_sqlite(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = [dict(row) for row in conn.execute("SELECT * FROM records ORDER BY rowid")]
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    return rows, indexes
+
+
+def test_sqlite_sink_round_trips_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(sinks.SqliteSink, "BATCH_SIZE", 2)
+    path = str(tmp_path / "report.sqlite")
+    modified = datetime.datetime(2024, 5, 6, 7, 8, 9)
+
+    sink = sinks.SqliteSink(path, HEADER)
+    sink.write(("/a/one", "text", 10, "/a/.DS_Store"), "cmmt", sinks.MISC)
+    sink.write(("/a/two", 1 << 70, None, "/a/.DS_Store"), "logS", sinks.MISC)
+    sink.write(("/a/.", modified, 0, "/a/.DS_Store"), "vstl", sinks.FOLDER_ACCESS)
+    sink.write(("/a/three", True, 5, "/a/.DS_Store"), "xxxx", None)
+    sink.close()
+
+    rows, indexes = read_sqlite(path)
+    assert [{k: v for k, v in row.items() if k != "src_file"} for row in rows] == [
+        {"code": "cmmt", "generated_path": "/a/one", "value": "text", "src_size": 10, "category": "misc"},
+        # Integers past SQLite's range and other values are stored as text
+        {"code": "logS", "generated_path": "/a/two", "value": str(1 << 70), "src_size": None, "category": "misc"},
+        {"code": "vstl", "generated_path": "/a/.", "value": str(modified), "src_size": 0,
+         "category": "folder_access"},
+        {"code": "xxxx", "generated_path": "/a/three", "value": "True", "src_size": 5, "category": None},
+    ]
+    assert indexes == {"idx_records_generated_path", "idx_records_code", "idx_records_src_file"}
+
+
+def test_sqlite_report_holds_the_jsonl_records(store_tree, tmp_path):
+    expected = run_scan(store_tree, tmp_path / "jsonl")
+    run_scan(store_tree, tmp_path / "sqlite", "-f", "sqlite")
+
+    (path,) = glob.glob(os.path.join(tmp_path / "sqlite", "*.sqlite"))
+    rows, indexes = read_sqlite(path)
+
+    def key(record):
+        return record["src_file"], record["generated_path"], record["code"]
+
+    assert sorted(map(key, rows)) == sorted(map(key, expected))
+    assert {(r["code"], r["category"]) for r in rows} == {(r["code"], r["category"]) for r in expected}
+    assert indexes == {"idx_records_generated_path", "idx_records_code", "idx_records_src_file"}
+    logical_sizes = [r["record_data"] for r in rows if r["code"] == "logS"]
+    assert logical_sizes and all(isinstance(size, int) for size in logical_sizes)
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file_io:
+        return [json.loads(line) for line in file_io]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_jsonl_sink_round_trips_typed_values(tmp_path, compress):
+    path = str(tmp_path / ("report.jsonl.gz" if compress else "report.jsonl"))
+    iloc = store.IlocCodec.decode(struct.pack(">IIII", 120, 340, 0xFFFFFFFF, 0))
+
+    sink = sinks.JsonlSink(path, HEADER, compress=compress)
+    sink.write(("/a/one", 1 << 40, 10, "/a/.DS_Store"), "logS", sinks.MISC)
+    sink.write(("/a/one", datetime.datetime(2001, 1, 1), 10, "/a/.DS_Store"), "modD", sinks.MISC)
+    sink.write(("/a/one", b"\x01\xab", 10, "/a/.DS_Store"), "pict", sinks.FOLDER_ACCESS)
+    sink.write(("/a/one", iloc, 10, "/a/.DS_Store"), "Iloc", sinks.MISC)
+    sink.write(("/a/one", "tab\tand é", None, "/a/.DS_Store"), "cmmt", None)
+    sink.close()
+
+    records = read_jsonl(path)
+    assert [(r["code"], r["value"], r["category"]) for r in records] == [
+        ("logS", 1 << 40, "misc"),
+        ("modD", "2001-01-01T00:00:00", "misc"),
+        ("pict", "01ab", "folder_access"),
+        ("Iloc", {"horizontal": 120, "vertical": 340, "index": 0xFFFFFFFF, "unknown": 0}, "misc"),
+        ("cmmt", "tab\tand é", None),
+    ]
+    assert records[0] == {
+        "code": "logS", "generated_path": "/a/one", "value": 1 << 40, "src_size": 10, "src_file": "/a/.DS_Store",
+        "category": "misc",
+    }
+
+
+def test_gzip_report_matches_plain_report(store_tree, tmp_path):
+    expected = run_scan(store_tree, tmp_path / "plain")
+    run_scan(store_tree, tmp_path / "gzip", "-z")
+
+    (path,) = glob.glob(os.path.join(tmp_path / "gzip", "*.jsonl.gz"))
+    records = read_jsonl(path)
+    for record in records:
+        record.pop("src_acc_time")
+
+    assert sorted(records, key=lambda r: json.dumps(r, sort_keys=True)) == expected
+
+
+def test_dutc_values_are_datetimes_and_raw_blobs_hex(tmp_path):
+    data = corpus.build_store([
+        ("a.txt", "modD", "dutc", DUTC_2001),
+        ("a.txt", "moDD", "blob", MODD_2001_JAN_2),
+        ("a.txt", "pict", "blob", b"\x01\xab"),
+    ], depth=1)
+
+    values = {record.code: (record.type, record.value) for record in parse_store(data)}
+    assert values == {
+        "modD": ("dutc", datetime.datetime(2001, 1, 1)),
+        "moDD": ("blob", datetime.datetime(2001, 1, 2)),
+        "pict": ("blob", "01ab"),
+    }
+
+    path = str(tmp_path / "report.jsonl")
+    handler = RecordHandler(False, sink_factory=functools.partial(sinks.JsonlSink, path))
+    report_store(data, handler, name="/a/.DS_Store")
+    handler.sink.close()
+
+    assert {r["code"]: r["record_data"] for r in read_jsonl(path)} == {
+        "modD": "2001-01-01T00:00:00",
+        "moDD": "2001-01-02T00:00:00",
+        "pict": "01ab",
+    }
@@ -0,0 +1,24 @@
+import io
+
+from ds_store_parser.ds_store import store
+
+from conftest import corpus
+
+
+def open_store(entries, **options):
+    file_io = io.BytesIO(corpus.build_store(entries, depth=3, fanout=3))
+    return store.DSStore.open(file_io, "rb", buffered=True, **options)
+
+
+def test_traversal_streams_entries_in_key_order():
+    entries = corpus.make_entries(200)
+    ds_store = open_store(entries)
+
+    assert [(e.filename, e.code) for e in ds_store] == [(e[0], e[1]) for e in entries]
+
+
+def test_store_can_be_traversed_again():
+    ds_store = open_store(corpus.make_entries(50))
+
+    assert len(list(ds_store)) == len(list(ds_store)) > 0
+    assert ds_store.dict_list == {}